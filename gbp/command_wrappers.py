@@ -27,6 +27,7 @@ from contextlib import contextmanager
 from tempfile import TemporaryFile
 
 import gbp.log as log
+from gbp.profiler import PROFILER
 
 
 class CommandExecFailed(Exception):
@@ -138,6 +139,7 @@ class Command(object):
             stdout_arg = subprocess.PIPE if self.capture_stdout else stdout
             stderr_arg = subprocess.PIPE if self.capture_stderr else stderr
 
+            start = PROFILER.start()
             try:
                 popen = subprocess.Popen(cmd,
                                          cwd=self.cwd,
@@ -147,6 +149,8 @@ class Command(object):
                                          stdout=stdout_arg,
                                          stderr=stderr_arg)
                 (self.stdout, self.stderr) = popen.communicate()
+                PROFILER.stop(start, cmd, popen.returncode,
+                              bytes_out=len(self.stdout or b'') + len(self.stderr or b''))
                 if self.stdout is not None:
                     self.stdout = self.stdout.decode()
                 if self.stderr is not None:
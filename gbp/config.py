@@ -31,6 +31,8 @@ except ImportError:
     gbp_version = "[Unknown version]"
 import gbp.tristate
 import gbp.log
+import gbp.profiler
+from gbp.config_cache import ConfigCache
 from gbp.git import GitRepositoryError, GitRepository
 
 no_upstream_branch_msg = """
@@ -123,6 +125,7 @@ class GbpOptionParser(OptionParser):
                 'component': [],
                 'compression': 'auto',
                 'compression-level': '',
+                'compression-threads': '1',
                 'create-missing-branches': 'False',
                 'customizations': '',
                 'dch-opt': [],
@@ -147,7 +150,9 @@ class GbpOptionParser(OptionParser):
                 'ignore-new': 'False',
                 'ignore-regex': '',
                 'import-msg': 'New upstream version %(version)s',
+                'incremental-export': 'False',
                 'interactive': 'True',
+                'jobs': '1',
                 'keyid': '',
                 'merge': 'True',
                 'merge-mode': 'auto',
@@ -189,6 +194,8 @@ class GbpOptionParser(OptionParser):
                 'spawn-editor': 'release',
                 'submodules': 'False',
                 'symlink-orig': 'True',
+                'tarball-cache': 'False',
+                'tarball-cache-size': '1G',
                 'tarball-dir': '',
                 'upstream-signatures': 'auto',
                 'template-dir': '',
@@ -200,6 +207,7 @@ class GbpOptionParser(OptionParser):
                 'upstream-tree': 'TAG',
                 'upstream-vcs-tag': '',
                 'urgency': 'medium',
+                'verify-checksums': 'False',
                 }
     help = {
         'add-upstream-vcs':
@@ -364,6 +372,12 @@ class GbpOptionParser(OptionParser):
         'allow-unauthenticated':
             "Don't verify integrity of downloaded source, "
             "default is '%(allow-unauthenticated)s'",
+        'incremental-export':
+            "Only update changed files in the export dir instead of "
+            "exporting everything, default is '%(incremental-export)s'",
+        'tarball-cache':
+            "Reuse upstream tarballs generated by earlier runs, "
+            "default is '%(tarball-cache)s'",
         'symlink-orig':
             "Whether to create a symlink from the upstream tarball "
             "to the orig.tar.gz if needed, default is "
@@ -397,6 +411,9 @@ class GbpOptionParser(OptionParser):
         'upstream-vcs-tag':
             "Upstream VCS tag added to the merge commit, "
             "default is '%(upstream-vcs-tag)s'",
+        'verify-checksums':
+            "Verify the checksums of the files referenced by the dsc "
+            "before importing, default is '%(verify-checksums)s'",
     }
 
     short_opts = {
@@ -448,7 +465,12 @@ class GbpOptionParser(OptionParser):
         return files
 
     def _read_config_file(self, repo, filename):
-        """Read config file"""
+        """
+        Read config file
+
+        @return: the expanded file name or C{None} if it can't be expanded
+        @rtype: C{str}
+        """
         str_fields = {}
         if repo:
             str_fields['git_dir'] = repo.git_dir
@@ -458,12 +480,46 @@ class GbpOptionParser(OptionParser):
             filename = filename % str_fields
         except KeyError:
             # Skip if filename wasn't expanded, i.e. we're not in git repo
-            return
+            return None
         if (repo and
                 filename == os.path.join(repo.path, '.gbp.conf') and
                 os.path.exists(filename)):
             self._warn_old_gbp_conf(filename)
         self.config_parser.read(filename)
+        return filename
+
+    def _read_config_files(self, config_files):
+        """
+        Read all config files, using the L{ConfigCache} if possible
+        """
+        parser = self.config_parser
+        cache = ConfigCache(config_files) if ConfigCache.enabled() else None
+        entry = cache.load() if cache else None
+        if entry:
+            try:
+                parser.read_dict(dict(entry['sections'], DEFAULT=entry['defaults']))
+            except ValueError:
+                # Values with a stray '%' can be read from a file but not set
+                cache = None
+            else:
+                for filename in entry['warn']:
+                    self._warn_old_gbp_conf(filename)
+                return
+
+        try:
+            repo = GitRepository(".", toplevel=False)
+        except GitRepositoryError:
+            repo = None
+        files = []
+        for filename in config_files:
+            filename = self._read_config_file(repo, filename)
+            if filename:
+                files.append(filename)
+        if cache:
+            old_conf = os.path.join(repo.path, '.gbp.conf') if repo else None
+            warn = [f for f in files if f == old_conf and os.path.exists(f)]
+            cache.store(repo, files, warn, dict(parser.defaults()),
+                        dict((section, dict(values)) for section, values in parser._sections.items()))
 
     def _warn_old_config_section(self, oldcmd, cmd):
         if not os.getenv("GBP_DISABLE_SECTION_DEPRECATION"):
@@ -534,14 +590,8 @@ class GbpOptionParser(OptionParser):
         parser = self.config_parser
         # Fill in the built in values
         self.config = dict(self.__class__.defaults)
-        config_files = self.get_config_files()
-        try:
-            repo = GitRepository(".", toplevel=False)
-        except GitRepositoryError:
-            repo = None
         # Read all config files
-        for filename in config_files:
-            self._read_config_file(repo, filename)
+        self._read_config_files(self.get_config_files())
         # Update with the values from the defaults section. This is needed
         # in case the config file doesn't have a [<command>] section at all
         self.config.update(dict(parser.defaults()))
@@ -607,6 +657,31 @@ class GbpOptionParser(OptionParser):
                               prog="gbp %s" % self.command,
                               usage=usage, version='%s %s' % (self.command,
                                                               gbp_version))
+        OptionParser.add_option(self, "--%sprofile" % self.prefix,
+                                type="choice", choices=gbp.profiler.formats,
+                                action="callback", callback=self._enable_profiler,
+                                metavar="FORMAT",
+                                help="report the commands run and their resource usage "
+                                "at exit, FORMAT is one of %s, default is 'text'"
+                                % ", ".join(gbp.profiler.formats))
+
+    @staticmethod
+    def _enable_profiler(option, opt_str, value, parser):
+        gbp.profiler.PROFILER.enable(report=value)
+
+    def parse_args(self, args=None, values=None):
+        """
+        Parse the command line like L{OptionParser.parse_args} but allow
+        to leave out the profile option's format
+        """
+        args = sys.argv[1:] if args is None else list(args)
+        opt = "--%sprofile" % self.prefix
+        for i, arg in enumerate(args):
+            if arg == '--':
+                break
+            if arg == opt:
+                args[i] = "%s=text" % opt
+        return OptionParser.parse_args(self, args, values)
 
     def _is_boolean(self, dummy, *unused, **kwargs):
         """is option_name a boolean option"""
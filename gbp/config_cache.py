@@ -0,0 +1,180 @@
+# vim: set fileencoding=utf-8 :
+#
+# (C) 2026 The git-buildpackage developers
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, please see
+#    <http://www.gnu.org/licenses/>
+"""Cache the result of parsing gbp's configuration files"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+
+class ConfigCache(object):
+    """
+    Remembers the merged contents of all configuration files read from a
+    working directory together with the repository they were looked up
+    in.
+
+    An entry is valid as long as the configuration files, the I{.git} and
+    I{HEAD} files of the directories between the working directory and the
+    repository's toplevel (which determine which repository git finds)
+    and the relevant environment variables didn't change. Entries are kept
+    in memory and in per working directory files below
+    I{$XDG_CACHE_HOME/git-buildpackage/config}. Only the most recently
+    stored L{max_entries} files are kept.
+    """
+    version = 1
+    # Environment variables that influence which files get parsed
+    env_vars = ['GBP_CONF_FILES', 'HOME', 'GIT_DIR', 'GIT_WORK_TREE',
+                'GIT_COMMON_DIR', 'GIT_CEILING_DIRECTORIES',
+                'GIT_DISCOVERY_ACROSS_FILESYSTEM']
+    # Don't cache files modified that recently, changes within the
+    # file system's timestamp granularity would go unnoticed
+    _racy_slack = 2.0
+    # Number of cache files to keep
+    max_entries = 64
+    _memo = {}
+
+    def __init__(self, config_files, cache_dir=None):
+        """
+        @param config_files: the configuration files to parse (unexpanded)
+        @type config_files: C{list} of C{str}
+        @param cache_dir: where to store the cache files
+        @type cache_dir: C{str}
+        """
+        self.cwd = os.getcwd()
+        self.key = json.dumps([self.version, self.cwd, config_files] +
+                              [os.environ.get(var) for var in self.env_vars])
+        if cache_dir is None:
+            cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                                     os.path.expanduser('~/.cache'),
+                                     'git-buildpackage', 'config')
+        self.filename = os.path.join(cache_dir, "%s.json" %
+                                     hashlib.sha1(self.key.encode()).hexdigest())
+
+    @staticmethod
+    def enabled():
+        """Whether caching is enabled (i.e. I{GBP_CONFIG_CACHE} isn't 0)"""
+        return os.environ.get('GBP_CONFIG_CACHE', '1') not in ['0', 'false', 'no']
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+            return [st.st_mtime_ns, st.st_size, st.st_ino]
+        except OSError:
+            return None
+
+    def _lookup_files(self, top):
+        """Files that decide which repository git finds from cwd"""
+        files = []
+        path = self.cwd
+        while True:
+            files += [os.path.join(path, '.git'), os.path.join(path, 'HEAD')]
+            parent = os.path.dirname(path)
+            if path == top or parent == path:
+                return files
+            path = parent
+
+    def load(self):
+        """
+        Look up a valid entry
+
+        @return: the cached repository directories, files to warn about,
+            defaults and sections or C{None}
+        @rtype: C{dict}
+        """
+        entry = self._memo.get(self.key)
+        if entry is None:
+            try:
+                with open(self.filename) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                return None
+        if entry.get('key') != self.key:
+            return None
+        for path, stamp in entry['stamps']:
+            if self._stat(path) != stamp:
+                return None
+        self._memo[self.key] = entry
+        return entry
+
+    def store(self, repo, files, warn, defaults, sections):
+        """
+        Store a new entry
+
+        @param repo: the repository config files were looked up in
+        @type repo: L{gbp.git.GitRepository} or C{None}
+        @param files: the (expanded) configuration files
+        @type files: C{list} of C{str}
+        @param warn: files that deserve a deprecation warning
+        @type warn: C{list} of C{str}
+        @param defaults: the raw values of the I{DEFAULT} section
+        @type defaults: C{dict}
+        @param sections: the raw values of all other sections
+        @type sections: C{dict} of C{dict}
+        """
+        paths = self._lookup_files(repo.path if repo else None) + files
+        stamps = [(path, self._stat(path)) for path in paths]
+        newest = max([stamp[0] for _, stamp in stamps if stamp] or [0])
+        if newest / 1e9 >= time.time() - self._racy_slack:
+            return
+
+        entry = {'key': self.key,
+                 'stamps': stamps,
+                 'warn': warn,
+                 'defaults': defaults,
+                 'sections': sections}
+        self._memo[self.key] = json.loads(json.dumps(entry))
+        tmp = None
+        try:
+            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.filename))
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f, separators=(',', ':'))
+            os.replace(tmp, self.filename)
+            tmp = None
+            self._prune()
+        except OSError:
+            # Caching is best effort
+            if tmp:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+
+    def _prune(self):
+        """Remove the oldest cache files if there are too many"""
+        cache_dir = os.path.dirname(self.filename)
+        stamps = []
+        for name in os.listdir(cache_dir):
+            if name.endswith('.json'):
+                path = os.path.join(cache_dir, name)
+                try:
+                    stamps.append((os.stat(path).st_mtime_ns, path))
+                except OSError:
+                    pass
+        for _, path in sorted(stamps)[:-self.max_entries]:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    @classmethod
+    def clear(cls):
+        """Drop all in memory entries"""
+        cls._memo.clear()
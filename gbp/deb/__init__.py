@@ -22,10 +22,12 @@ import subprocess
 import gbp.command_wrappers as gbpc
 from gbp.errors import GbpError
 from gbp.git import GitRepositoryError
+from gbp.probe_cache import probe
 
 # Make sure these are available with 'import gbp.deb'
 from gbp.deb.changelog import ChangeLog, NoChangeLogError
 from gbp.deb.policy import DebianPkgPolicy                # noqa: F401
+from gbp.deb.version import DebianVersion, DebianVersionError  # noqa: F401
 
 
 Releases = ("buzz",
@@ -101,19 +103,31 @@ def parse_changelog_repo(repo, branch, filename):
 
 
 def get_arch():
-    pipe = subprocess.Popen(["dpkg", "--print-architecture"], shell=False, stdout=subprocess.PIPE)
-    arch = pipe.stdout.readline().strip()
-    return arch.decode('ascii')
+    def query():
+        pipe = subprocess.Popen(["dpkg", "--print-architecture"], shell=False, stdout=subprocess.PIPE)
+        arch = pipe.stdout.readline().strip()
+        return arch.decode('ascii')
+    return probe('dpkg', ['--print-architecture'], query)
 
 
 def compare_versions(version1, version2):
-    """compares to Debian version numbers suitable for sort()"""
-    return DpkgCompareVersions()(version1, version2)
+    """
+    compares to Debian version numbers suitable for sort()
+
+    >>> compare_versions('1.0-1', '1:0.9-1')
+    -1
+
+    @raises DebianVersionError: if dpkg would reject one of the versions
+    """
+    return DebianVersion.compare(version1, version2)
 
 
 def get_vendor():
-    pipe = subprocess.Popen(["dpkg-vendor", "--query", "Vendor"], shell=False, stdout=subprocess.PIPE)
-    vendor = pipe.stdout.readline().strip()
-    return vendor.decode('ascii')
+    def query():
+        pipe = subprocess.Popen(["dpkg-vendor", "--query", "Vendor"], shell=False, stdout=subprocess.PIPE)
+        vendor = pipe.stdout.readline().strip()
+        return vendor.decode('ascii')
+    return probe('dpkg-vendor', ['--query', 'Vendor'], query,
+                 files=['/etc/dpkg/origins/default'], env=['DEB_VENDOR'])
 
 # vim:et:ts=4:sw=4:et:sts=4:ai:set list listchars=tab\:»·,trail\:·:
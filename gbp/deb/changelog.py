@@ -16,8 +16,9 @@
 #    <http://www.gnu.org/licenses/>
 """A Debian Changelog"""
 
-import email
+import calendar
 import os
+import re
 import subprocess
 from gbp.command_wrappers import Command
 
@@ -32,6 +33,157 @@ class ParseChangeLogError(Exception):
     pass
 
 
+# The subset of dpkg's changelog syntax handled without dpkg-parsechangelog
+_header_re = re.compile(r'(?P<package>\w[-+0-9a-z.]*) \((?P<version>[^() \t]+)\)'
+                        r'(?P<distributions>(?:\s+[-+0-9a-z.]+)+);(?P<options>.*?)\s*$',
+                        re.ASCII | re.IGNORECASE)
+_trailer_re = re.compile(r' -- (?P<maintainer>.* <.*>)  ?'
+                         r'(?P<date>(?P<wday>\w+),\s*(?P<day>\d{1,2})\s+(?P<month>\w+)\s+'
+                         r'(?P<year>\d{4})\s+(?P<hour>\d{1,2}):(?P<min>\d\d):(?P<sec>\d\d)\s+'
+                         r'(?P<tz>[-+]\d{4}))\s*$', re.ASCII)
+_urgency_re = re.compile(r'urgency=\s*(?P<urgency>[-0-9a-z]+)(?:\s+.*)?$',
+                         re.ASCII | re.IGNORECASE)
+_closes_re = re.compile(r'closes:\s*(?:bug)?#?\s?\d+(?:,\s*(?:bug)?#?\s?\d+)*',
+                        re.ASCII | re.IGNORECASE)
+_change_re = re.compile(r'\s{2,}\S', re.ASCII)
+_nonblank_re = re.compile(r'\S', re.ASCII)
+_months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+           'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+_wdays = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+def _iter_lines(contents):
+    """
+    Iterate over the lines of I{contents} like I{contents.split('\\n')}
+    does without splitting it up front
+
+    >>> list(_iter_lines('a\\n\\nb\\n'))
+    ['a', '', 'b', '']
+    """
+    start = 0
+    while True:
+        end = contents.find('\n', start)
+        if end == -1:
+            yield contents[start:]
+            return
+        yield contents[start:end]
+        start = end + 1
+
+
+def _timestamp(m):
+    """
+    Seconds since the epoch of a changelog trailer's date
+
+    @return: the timestamp or C{None} if the date is invalid
+    @rtype: C{int}
+    """
+    if m.group('wday') not in _wdays or m.group('month') not in _months:
+        return None
+    try:
+        parts = [int(m.group(name)) for name in ['year', 'day', 'hour', 'min', 'sec']]
+        year, day, hour, minute, sec = parts
+        month = _months.index(m.group('month')) + 1
+        calendar.weekday(year, month, day)  # validates the date
+        if hour > 23 or minute > 59 or sec > 60:
+            return None
+    except ValueError:
+        return None
+    tz = m.group('tz')
+    offset = (int(tz[1:3]) * 60 + int(tz[3:5])) * 60 * (-1 if tz[0] == '-' else 1)
+    return calendar.timegm((year, month, day, hour, minute, sec)) - offset
+
+
+def _closes(changes):
+    """
+    Bug numbers closed in I{changes}
+
+    >>> _closes(['  * Fix foo (Closes: #12, bug#3)', '  * closes:#9'])
+    '3 9 12'
+    """
+    bugs = set()
+    for match in _closes_re.finditer('\n'.join(changes)):
+        bugs.update(int(bug) for bug in re.findall(r'#?\s?(\d+)', match.group(0)))
+    return ' '.join(str(bug) for bug in sorted(bugs))
+
+
+def parse_first_section(contents):
+    """
+    Parse the topmost section of a changelog the way
+    I{dpkg-parsechangelog} does without forking it
+
+    Only the lines up to the section's trailer are looked at. We only
+    handle the common, well formed cases: anything dpkg-parsechangelog
+    would warn about or that needs its more elaborate rules (like key
+    value options besides I{urgency}) makes us give up.
+
+    >>> fields = parse_first_section('''foo (1.0-1) unstable; urgency=Medium
+    ...
+    ...   * Initial release (Closes: #1)
+    ...
+    ...  -- Jane Doe <jd@example.com>  Mon, 17 Oct 2011 10:15:22 +0200
+    ... ''')
+    >>> fields[:5]
+    [('Source', 'foo'), ('Version', '1.0-1'), ('Distribution', 'unstable'), ('Urgency', 'medium'), ('Maintainer', 'Jane Doe <jd@example.com>')]
+    >>> fields[5:8]
+    [('Timestamp', '1318839322'), ('Date', 'Mon, 17 Oct 2011 10:15:22 +0200'), ('Closes', '1')]
+    >>> fields[8]
+    ('Changes', ' foo (1.0-1) unstable; urgency=Medium\\n .\\n   * Initial release (Closes: #1)')
+    >>> parse_first_section('foo (1.0-1) unstable; urgency=low\\n  * Change\\n')
+
+    @param contents: the changelog
+    @type contents: C{str}
+    @return: the fields as output by I{dpkg-parsechangelog} or C{None}
+    @rtype: C{list} of C{tuple} of C{str}
+    """
+    header = trailer = None
+    changes = []
+    blank = []
+    for line in _iter_lines(contents):
+        if header is None:
+            if _nonblank_re.search(line):
+                header = _header_re.match(line)
+                if not header:
+                    return None
+            continue
+        if not _nonblank_re.search(line):
+            if changes:
+                blank.append(line)
+        elif _change_re.match(line):
+            changes += blank + [line]
+            blank = []
+        else:
+            trailer = _trailer_re.match(line)
+            break
+    if not trailer:
+        return None
+
+    options = header.group('options').strip()
+    urgency = 'unknown'
+    if options:
+        m = _urgency_re.match(options)
+        if not m:
+            return None
+        urgency = m.group('urgency').lower()
+    timestamp = _timestamp(trailer)
+    if timestamp is None:
+        return None
+
+    fields = [('Source', header.group('package')),
+              ('Version', header.group('version')),
+              ('Distribution', ' '.join(header.group('distributions').split())),
+              ('Urgency', urgency),
+              ('Maintainer', trailer.group('maintainer').lstrip(' \t')),
+              ('Timestamp', str(timestamp)),
+              ('Date', trailer.group('date'))]
+    closes = _closes(changes)
+    if closes:
+        fields.append(('Closes', closes))
+    lines = [header.group(0).rstrip(), ''] + changes
+    fields.append(('Changes', '\n'.join(' ' + line.rstrip(' \t\r\n\f\v') if _nonblank_re.search(line) else ' .'
+                                        for line in lines)))
+    return fields
+
+
 class ChangeLogSection(object):
     """A section in the changelog describing one particular version"""
     def __init__(self, package, version):
@@ -102,11 +254,26 @@ class ChangeLog(object):
         return stdout.decode().replace('\0', '')
 
     def _parse(self):
-        """Parse a changelog based on the already read contents."""
-        output = self._run_parsechangelog()
-        # Parse the result of dpkg-parsechangelog (which looks like
-        # email headers)
-        cp = email.message_from_string(output)
+        """
+        Parse a changelog based on the already read contents.
+
+        Falls back to I{dpkg-parsechangelog} if the changelog's topmost
+        section isn't one L{parse_first_section} can handle.
+        """
+        import email
+        import email.message
+
+        fields = parse_first_section(self._contents.replace('\0', ''))
+        if fields:
+            output = None
+            cp = email.message.Message()
+            for name, value in fields:
+                cp[name] = value
+        else:
+            output = self._run_parsechangelog()
+            # Parse the result of dpkg-parsechangelog (which looks like
+            # email headers)
+            cp = email.message_from_string(output)
         try:
             if ':' in cp['Version']:
                 cp['Epoch'], cp['NoEpoch-Version'] = cp['Version'].split(':', 1)
@@ -215,9 +382,12 @@ class ChangeLog(object):
     def sections_iter(self):
         """
         Iterate over sections in the changelog
+
+        Sections are parsed as they are requested so looking at the
+        topmost ones of a long changelog is cheap.
         """
         section = ''
-        for line in self._contents.split('\n'):
+        for line in _iter_lines(self._contents):
             if line and line[0] not in [' ', '\t']:
                 section += line
             else:
@@ -350,6 +520,8 @@ class ChangeLog(object):
         def _unquote(q):
             return q.replace('##comma##', ',')
 
+        import email.utils
+
         name, mail = email.utils.parseaddr(_quote(maintainer or ''))
         return (_unquote(name), _unquote(mail))
 
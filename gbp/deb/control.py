@@ -16,7 +16,6 @@
 #    <http://www.gnu.org/licenses/>
 """A Debian Control file"""
 
-import email
 import os
 
 
@@ -44,6 +43,8 @@ class Control(object):
         @return: Control object
         @rtype: C{gbp.deb.conrol.Control} object
         """
+        import email
+
         if contents:
             control = email.message_from_string(contents)
         else:
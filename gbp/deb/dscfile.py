@@ -16,16 +16,48 @@
 #    <http://www.gnu.org/licenses/>
 """provides some debian source package related helpers"""
 
+import hashlib
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 
 from gbp.errors import GbpError
 from gbp.deb.upstreamsource import DebianUpstreamSource
 from gbp.deb.policy import DebianPkgPolicy
 
 
+def _hash_file(path, algo):
+    """
+    Hash the file at I{path}
+
+    Hashing large chunks lets hashlib release the GIL so several files
+    can be hashed in parallel.
+
+    @return: size and hex digest
+    @rtype: C{tuple}
+    """
+    h = hashlib.new(algo)
+    size = 0
+    buf = bytearray(4 * 1024 * 1024)
+    view = memoryview(buf)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+            size += n
+    return size, h.hexdigest()
+
+
 class DscFile(object):
     """Keeps data read from a dscfile"""
+    # Checksum fields and their hash algorithm, strongest first
+    checksum_fields = [('Checksums-Sha512', 'sha512'),
+                       ('Checksums-Sha256', 'sha256'),
+                       ('Checksums-Sha1', 'sha1'),
+                       ('Files', 'md5')]
+    field_re = re.compile(r'(?P<field>[^\s:]+):')
     compressions = r"(%s)" % '|'.join(DebianUpstreamSource.known_compressions())
     pkg_re = re.compile(r'Source:\s+(?P<pkg>.+)\s*')
     version_re = re.compile(r'Version:\s((?P<epoch>\d+)\:)?'
@@ -53,12 +85,25 @@ class DscFile(object):
         self.upstream_version = ""
         self.native = False
         self.dscfile = os.path.abspath(dscfile)
+        # Referenced files by path with their size and checksums
+        self.files = {}
         sigs = []
         add_tars = []
+        algos = dict(self.checksum_fields)
+        algo = None
 
         f = open(self.dscfile, encoding='utf-8')
         fromdir = os.path.dirname(os.path.abspath(dscfile))
         for line in f:
+            if not line[:1].isspace():
+                m = self.field_re.match(line)
+                algo = algos.get(m.group('field')) if m else None
+            elif algo:
+                entry = line.split()
+                if len(entry) == 3:
+                    path = os.path.join(fromdir, entry[2])
+                    checksums = self.files.setdefault(path, (int(entry[1]), {}))[1]
+                    checksums[algo] = entry[0].lower()
             m = self.version_re.match(line)
             if m and not self.upstream_version:
                 if '-' in m.group('version'):
@@ -132,6 +177,37 @@ class DscFile(object):
                 version += "%s" % self.upstream_version
         return version
 
+    def verify(self):
+        """
+        Verify the size and checksum of every file referenced by the dsc
+
+        Only the strongest checksum listed for a file is checked. The
+        files are hashed concurrently.
+
+        @raises GbpError: if a file is missing or doesn't match
+        """
+        if not self.files:
+            raise GbpError("No checksums found in '%s'" % self.dscfile)
+
+        def check(path):
+            size, checksums = self.files[path]
+            algo = [a for (_, a) in self.checksum_fields if a in checksums][0]
+            try:
+                actual_size, checksum = _hash_file(path, algo)
+            except OSError as err:
+                return "Can't read '%s': %s" % (path, err.strerror)
+            if actual_size != size:
+                return "Size of '%s' is %d, expected %d" % (path, actual_size, size)
+            if checksum != checksums[algo]:
+                return "%s checksum of '%s' doesn't match" % (algo.upper(), path)
+            return None
+
+        paths = sorted(self.files)
+        with ThreadPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as pool:
+            errors = [err for err in pool.map(check, paths) if err]
+        if errors:
+            raise GbpError("Failed to verify '%s': %s" % (self.dscfile, "; ".join(errors)))
+
     def __str__(self):
         return "<%s object %s>" % (self.__class__.__name__, self.dscfile)
 
@@ -341,7 +341,8 @@ class DebianGitRepository(PkgGitRepository):
         return True
 
     def create_upstream_tarball_via_git_archive(self, source, output_dir, treeish,
-                                                comp, with_submodules, component=None):
+                                                comp, with_submodules, component=None,
+                                                update_submodules=True, cache=None):
         """
         Create a compressed orig tarball in output_dir using git archive
 
@@ -357,6 +358,10 @@ class DebianGitRepository(PkgGitRepository):
         @type with_submodules: C{bool}
         @param component: component to add to tarball name
         @type component: C{str}
+        @param update_submodules: whether to update the submodules first
+        @type update_submodules: C{bool}
+        @param cache: reuse previously generated tarballs from this cache
+        @type cache: L{TarballCache}
 
         Raises GitRepositoryError in case of an error
         """
@@ -368,8 +373,26 @@ class DebianGitRepository(PkgGitRepository):
         try:
             if self.has_submodules() and with_submodules:
                 submodules = True
-                self.update_submodules()
+                if update_submodules:
+                    self.update_submodules()
+            key = None
+            if cache:
+                # git archive puts the commit id and time into the tarball so
+                # key on the commit. A bare tree gets the current time, its
+                # cached tarball is just as good as a new one but neither is
+                # reproducible.
+                try:
+                    obj = self.rev_parse('%s^{commit}' % treeish)
+                except GitRepositoryError:
+                    obj = self.rev_parse('%s^{tree}' % treeish)
+                key = cache.key(obj, self.get_submodules(obj) if submodules else [],
+                                prefix, comp)
+                if cache.fetch(key, output):
+                    gbp.log.info("Using cached %s" % os.path.basename(output))
+                    return True
             self.archive_comp(treeish, output, prefix, comp, submodules=submodules)
+            if key:
+                cache.store(key, output)
         except Exception as e:
             raise GitRepositoryError("Error creating %s: %s" % (output, e))
         return True
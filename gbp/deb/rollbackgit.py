@@ -112,10 +112,10 @@ class RollbackDebianGitRepository(DebianGitRepository):
         self.rrr_tag(name)
         return ret
 
-    def commit_dir(self, *args, **kwargs):
-        import_branch = kwargs['branch']
-        self.rrr_branch(import_branch)
-        return super(RollbackDebianGitRepository, self).commit_dir(*args, **kwargs)
+    def commit_tree_to_branch(self, tree, msg, branch, *args, **kwargs):
+        self.rrr_branch(branch)
+        return super(RollbackDebianGitRepository, self).commit_tree_to_branch(tree, msg, branch,
+                                                                              *args, **kwargs)
 
     def create_branch(self, *args, **kwargs):
         branch = kwargs['branch']
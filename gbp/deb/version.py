@@ -0,0 +1,203 @@
+# vim: set fileencoding=utf-8 :
+#
+# (C) 2026 The git-buildpackage developers
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, please see
+#    <http://www.gnu.org/licenses/>
+"""Compare Debian version numbers the way dpkg does"""
+
+import re
+
+from gbp.errors import GbpError
+
+
+class DebianVersionError(GbpError):
+    """Version number dpkg would reject"""
+    pass
+
+
+# Terminates the list of parts of a version string, see L{_part_key}
+_END = ((0,), 0)
+_EPOCH_MAX = 2 ** 31 - 1
+
+
+def _order(byte):
+    """
+    The weight of a non digit character as used by dpkg's I{verrevcmp}
+
+    Letters sort before other characters and the tilde sorts even before
+    the end of a part.
+    """
+    if 0x41 <= byte <= 0x5a or 0x61 <= byte <= 0x7a:
+        return byte
+    elif byte == 0x7e:
+        return -1
+    # dpkg works on (signed) chars
+    return (byte if byte < 0x80 else byte - 0x100) + 256
+
+
+def _part_key(part):
+    """
+    A sort key for the upstream version or revision I{part}
+
+    The string is split into alternating runs of non digits and digits.
+    Non digits compare character by character using L{_order} where a
+    shorter run is padded with zeros (hence the trailing 0), digits
+    compare numerically.
+
+    >>> _part_key('1.0~rc1')
+    (((0,), 1), ((302, 0), 0), ((-1, 114, 99, 0), 1), ((0,), 0))
+    """
+    data = part.encode('utf-8', 'surrogateescape')
+    key = []
+    pos, end = 0, len(data)
+    while True:
+        start = pos
+        while pos < end and not 0x30 <= data[pos] <= 0x39:
+            pos += 1
+        chars = tuple(_order(byte) for byte in data[start:pos]) + (0,)
+        start = pos
+        while pos < end and 0x30 <= data[pos] <= 0x39:
+            pos += 1
+        key.append((chars, int(data[start:pos] or 0)))
+        if pos == end:
+            break
+    key.append(_END)
+    return tuple(key)
+
+
+class DebianVersion(object):
+    """
+    A Debian version number
+
+    Instances compare like I{dpkg --compare-versions} does via a sort key
+    computed once so sorting lots of versions is cheap.
+
+    >>> DebianVersion('1:2.0-1').epoch
+    1
+    >>> DebianVersion('2.0-1') < DebianVersion('2.0-1.1') < DebianVersion('2.0.1~rc1-1')
+    True
+    >>> DebianVersion('1.0~rc1') < DebianVersion('1.0')
+    True
+    >>> DebianVersion('0:1.0-0') == DebianVersion('1.0')
+    True
+    >>> sorted(['1:0.9', '1.0', '1.0-1', '1.0+dfsg'], key=DebianVersion)
+    ['1.0', '1.0-1', '1.0+dfsg', '1:0.9']
+    >>> DebianVersion('1.0 1')
+    Traceback (most recent call last):
+    ...
+    gbp.deb.version.DebianVersionError: Version '1.0 1' has bad syntax: version string has embedded spaces
+    """
+    __slots__ = ('version', 'epoch', 'upstream', 'revision', 'key')
+
+    def __init__(self, version):
+        """
+        @param version: the version string
+        @type version: C{str}
+        @raises DebianVersionError: if dpkg would reject the version
+        """
+        self.version = version
+        if version in ['', '<unknown>']:
+            # dpkg --compare-versions treats these as lower than any version
+            self.epoch, self.upstream, self.revision = 0, '', ''
+            self.key = (-1,)
+            return
+        self.epoch, self.upstream, self.revision = self._parse(version)
+        self.key = (self.epoch, _part_key(self.upstream), _part_key(self.revision))
+
+    def _error(self, msg):
+        raise DebianVersionError("Version '%s' has bad syntax: %s" % (self.version, msg))
+
+    def _parse(self, version):
+        """
+        Split I{version} into epoch, upstream version and revision
+
+        Only versions dpkg refuses to handle raise an error, versions it
+        merely warns about (like invalid characters) are accepted.
+        """
+        version = version.strip(' \t')
+        if re.search('[ \t]', version):
+            self._error("version string has embedded spaces")
+
+        epoch = 0
+        if ':' in version:
+            epoch_str, version = version.split(':', 1)
+            m = re.match(r'[+-]?[0-9]+', epoch_str)
+            if not m:
+                self._error("epoch in version is empty")
+            if m.end() != len(epoch_str):
+                self._error("epoch in version is not number")
+            epoch = int(epoch_str)
+            if epoch < 0:
+                self._error("epoch in version is negative")
+            if epoch > _EPOCH_MAX:
+                self._error("epoch in version is too big")
+            if not version:
+                self._error("nothing after colon in version number")
+
+        upstream, sep, revision = version.rpartition('-')
+        if not sep:
+            upstream, revision = revision, ''
+        elif not revision:
+            self._error("revision number is empty")
+        if not upstream:
+            self._error("version number is empty")
+        return epoch, upstream, revision
+
+    @classmethod
+    def compare(cls, version1, version2):
+        """
+        Compare two version strings
+
+        >>> DebianVersion.compare('1.0', '1.0-0')
+        0
+        >>> DebianVersion.compare('1.0a', '1.0+')
+        -1
+
+        @return: -1 if I{version1} is lower than I{version2}, 1 if it's
+            higher and 0 if both are equal
+        @rtype: C{int}
+        """
+        key1, key2 = cls(version1).key, cls(version2).key
+        return (key1 > key2) - (key1 < key2)
+
+    def __str__(self):
+        return self.version
+
+    def __repr__(self):
+        return "<DebianVersion '%s'>" % self.version
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        if not isinstance(other, DebianVersion):
+            return NotImplemented
+        return self.key == other.key
+
+    def __ne__(self, other):
+        if not isinstance(other, DebianVersion):
+            return NotImplemented
+        return self.key != other.key
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+    def __le__(self, other):
+        return self.key <= other.key
+
+    def __gt__(self, other):
+        return self.key > other.key
+
+    def __ge__(self, other):
+        return self.key >= other.key
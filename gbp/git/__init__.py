@@ -16,9 +16,6 @@
 #    <http://www.gnu.org/licenses/>
 """Accessing Git from python"""
 
-import calendar
-import dateutil.parser
-
 from gbp.git.modifier import GitModifier   # noqa: F401
 from gbp.git.commit import GitCommit       # noqa: F401
 from gbp.git.errors import GitError        # noqa: F401
@@ -41,6 +38,9 @@ def rfc822_date_to_git(rfc822_date, fuzzy=False):
     >>> rfc822_date_to_git('So, 26 Feb 1998 8:50:00 +0100', fuzzy=True)
     '888479400 +0100'
     """
+    import calendar
+    import dateutil.parser
+
     d = dateutil.parser.parse(rfc822_date, fuzzy=fuzzy)
     seconds = calendar.timegm(d.utctimetuple())
     tz = d.strftime("%z")
@@ -0,0 +1,160 @@
+# vim: set fileencoding=utf-8 :
+#
+# (C) 2026 The git-buildpackage developers
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, please see
+#    <http://www.gnu.org/licenses/>
+"""Read git objects through a long running git cat-file process"""
+
+import subprocess
+import threading
+
+import gbp.log as log
+from gbp.git.errors import GitError
+from gbp.paths import to_bin
+from gbp.profiler import PROFILER
+
+
+class GitCatFile(object):
+    """
+    Look up objects using a single I{git cat-file --batch} (or
+    I{--batch-check}) process instead of forking git for every object.
+
+    The process is started on first use and restarted if it went away.
+    """
+
+    def __init__(self, repo, check=False):
+        """
+        @param repo: the git repository L{GitCatFile} acts on
+        @type repo: L{GitRepository}
+        @param check: only look up object information, not the contents
+        @type check: C{bool}
+        """
+        self._repo = repo
+        self._check = check
+        self._proc = None
+        self._lock = threading.Lock()
+        self._cmd = ['git', 'cat-file', '--batch-check' if check else '--batch']
+        self._profile = None
+        self._bytes_in = self._bytes_out = 0
+
+    @property
+    def running(self):
+        """Whether the cat-file process is up"""
+        return self._proc is not None and self._proc.poll() is None
+
+    def _start(self):
+        log.debug(self._cmd)
+        self._profile = PROFILER.start()
+        self._bytes_in = self._bytes_out = 0
+        try:
+            self._proc = subprocess.Popen(self._cmd,
+                                          stdin=subprocess.PIPE,
+                                          stdout=subprocess.PIPE,
+                                          close_fds=True,
+                                          cwd=self._repo.path)
+        except OSError as err:
+            raise GitError("Error spawning git cat-file: %s" % err)
+
+    def _query(self, obj):
+        if not self.running:
+            self.close()
+            self._start()
+
+        stdin, stdout = self._proc.stdin, self._proc.stdout
+        stdin.write(obj + b'\n')
+        stdin.flush()
+        header = stdout.readline()
+        self._bytes_in += len(obj) + 1
+        self._bytes_out += len(header)
+        if not header.endswith(b'\n'):
+            raise GitError("git cat-file exited unexpectedly")
+        if header.endswith((b' missing\n', b' ambiguous\n')):
+            return None
+
+        fields = header.split()
+        if len(fields) != 3:
+            raise GitError("Unexpected git cat-file output '%s'" % header.decode().strip())
+        sha1, type_, size = fields[0].decode(), fields[1].decode(), int(fields[2])
+        if self._check:
+            return sha1, type_, size
+
+        data = stdout.read(size)
+        self._bytes_out += len(data) + 1
+        if len(data) != size or stdout.read(1) != b'\n':
+            raise GitError("Short read from git cat-file for '%s'" % obj.decode())
+        return sha1, type_, data
+
+    def _request(self, obj):
+        obj = to_bin(obj)
+        if b'\n' in obj:
+            raise GitError("Can't look up object names containing newlines")
+
+        with self._lock:
+            try:
+                return self._query(obj)
+            except (OSError, GitError) as err:
+                # The process might have died underneath us, retry once
+                log.debug("git cat-file failed: %s, restarting" % err)
+                self.close()
+            try:
+                return self._query(obj)
+            except OSError as err:
+                self.close()
+                raise GitError("Error talking to git cat-file: %s" % err)
+
+    def info(self, obj):
+        """
+        Look up type and size of an object
+
+        @param obj: the object name (anything git rev-parse understands)
+        @type obj: C{str}
+        @return: sha1, type and size of the object or C{None}
+            if it doesn't exist
+        @rtype: C{tuple} of C{str}, C{str}, C{int}
+        """
+        if not self._check:
+            raise GitError("Object info requires a --batch-check process")
+        return self._request(obj)
+
+    def contents(self, obj):
+        """
+        Look up type and contents of an object
+
+        @param obj: the object name (anything git rev-parse understands)
+        @type obj: C{str}
+        @return: sha1, type and content of the object or C{None}
+            if it doesn't exist
+        @rtype: C{tuple} of C{str}, C{str}, C{bytestr}
+        """
+        if self._check:
+            raise GitError("Object contents require a --batch process")
+        return self._request(obj)
+
+    def close(self):
+        """
+        Terminate the cat-file process
+        """
+        proc, self._proc = self._proc, None
+        if proc:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+            proc.wait()
+            proc.stdout.close()
+            PROFILER.stop(self._profile, self._cmd, proc.returncode,
+                          bytes_in=self._bytes_in, bytes_out=self._bytes_out)
+
+    def __del__(self):
+        self.close()
@@ -17,6 +17,7 @@
 #    <http://www.gnu.org/licenses/>
 """Git fast import class"""
 
+import os
 import subprocess
 import time
 from gbp.errors import GbpError
@@ -26,21 +27,28 @@ from gbp.paths import to_bin
 
 class FastImport(object):
     """Add data to a git repository using I{git fast-import}"""
-    _bufsize = 1024
+    _bufsize = 65536
 
     m_regular = 644
     m_exec = 755
     m_symlink = 120000
 
-    def __init__(self, repo):
+    def __init__(self, repo, export_marks=None):
         """
         @param repo: the git repository L{FastImport} acts on
         @type repo: L{GitRepository}
+        @param export_marks: file to write the marks to on L{close}
+        @type export_marks: C{str}
         """
         self._repo = repo
+        self._mark = 0
+        self._checkpoints = 0
+        cmd = ['git', 'fast-import', '--quiet']
+        if export_marks:
+            cmd.append('--export-marks=%s' % export_marks)
         try:
-            self._fi = subprocess.Popen(['git', 'fast-import', '--quiet'],
-                                        stdin=subprocess.PIPE, cwd=repo.path)
+            self._fi = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        cwd=repo.path)
             self._out = self._fi.stdin
         except OSError as err:
             raise GbpError("Error spawning git fast-import: %s" % err)
@@ -77,6 +85,39 @@ class FastImport(object):
         """
         self._do_file(filename, mode, fd, size)
 
+    def add_blob(self, fd, size):
+        """
+        Add a blob that can be referenced by its mark later on
+
+        @param fd: stream to read data from
+        @type fd: C{File} like object
+        @param size: size of the blob
+        @type size: C{int}
+        @return: the blob's mark
+        @rtype: C{int}
+        """
+        self._mark += 1
+        self._out.write(format_b(b"blob\nmark :%d\n", self._mark))
+        self._do_data(fd, size)
+        return self._mark
+
+    @staticmethod
+    def read_marks(filename):
+        """
+        Read a marks file as written by I{--export-marks}
+
+        @param filename: the marks file
+        @type filename: C{str}
+        @return: the object names by mark
+        @rtype: C{dict} of C{int} to C{str}
+        """
+        marks = {}
+        with open(filename) as f:
+            for line in f:
+                mark, sha1 = line.split()
+                marks[int(mark[1:])] = sha1
+        return marks
+
     def add_symlink(self, linkname, linktarget):
         """
         Add a symlink
@@ -131,14 +172,110 @@ data %(length)s
         """
         self._out.write(b"deleteall\n")
 
+    @staticmethod
+    def _dataref(ref):
+        """A mark (C{int}) or an object name"""
+        return b":%d" % ref if isinstance(ref, int) else ref.encode()
+
+    @staticmethod
+    def _path(path):
+        """Quote I{path} if fast-import would misparse it"""
+        path = os.fsencode(path)
+        if path.startswith(b'"'):
+            path = b'"%s"' % path.replace(b'\\', b'\\\\').replace(b'"', b'\\"')
+        return path
+
+    @staticmethod
+    def _ident(who, modifier):
+        return b"%s %s <%s> %s\n" % (who, modifier.name.encode(),
+                                     modifier.email.encode(), modifier.date.encode())
+
+    def add_commit(self, ref, tree, msg, committer, author=None, parents=None):
+        """
+        Add a commit that replaces the whole tree
+
+        @param ref: the ref to commit to, e.g. I{refs/heads/master}
+        @type ref: C{str}
+        @param tree: the tree's entries as (mode, mark or object name, path)
+            or the object name of an existing tree
+        @type tree: C{list} of C{tuple} or C{str}
+        @param msg: the commit message
+        @type msg: C{str}
+        @param committer: the committer, name, email and date must be set
+        @type committer: L{GitModifier}
+        @param author: the author, defaults to the committer
+        @type author: L{GitModifier}
+        @param parents: the parents as marks or object names, the ref's
+            current value isn't used as parent implicitly
+        @type parents: C{list}
+        @return: the commit's mark
+        @rtype: C{int}
+        """
+        self._mark += 1
+        msg = msg.encode()
+        out = [b"commit %s\nmark :%d\n" % (ref.encode(), self._mark)]
+        if author:
+            out.append(self._ident(b'author', author))
+        out.append(self._ident(b'committer', committer))
+        out.append(b"data %d\n%s\n" % (len(msg), msg))
+        for i, parent in enumerate(parents or []):
+            out.append(b"%s %s\n" % (b"merge" if i else b"from", self._dataref(parent)))
+        out.append(b"deleteall\n")
+        if isinstance(tree, str):
+            out.append(b'M 040000 %s ""\n' % tree.encode())
+        else:
+            out += [b"M %s %s %s\n" % (str(mode).encode(), self._dataref(dataref), self._path(path))
+                    for mode, dataref, path in tree]
+        out.append(b"\n")
+        self._out.write(b"".join(out))
+        return self._mark
+
+    def add_tag(self, name, commit, tagger, msg):
+        """
+        Add an annotated tag
+
+        @param name: the tag's name
+        @type name: C{str}
+        @param commit: the commit to tag as mark or object name
+        @type commit: C{int} or C{str}
+        @param tagger: the tagger, name, email and date must be set
+        @type tagger: L{GitModifier}
+        @param msg: the tag message
+        @type msg: C{str}
+        """
+        msg = msg.encode()
+        self._out.write(b"tag %s\nfrom %s\n%sdata %d\n%s\n" %
+                        (name.encode(), self._dataref(commit),
+                         self._ident(b'tagger', tagger), len(msg), msg))
+
+    def checkpoint(self):
+        """
+        Make fast-import write out everything it got so far and update
+        the refs and the marks file. Returns when that's done.
+        """
+        self._checkpoints += 1
+        progress = b"gbp checkpoint %d" % self._checkpoints
+        self._out.write(b"checkpoint\n\nprogress %s\n\n" % progress)
+        self._out.flush()
+        # fast-import handles commands in order so once it reports
+        # progress the checkpoint is done
+        line = self._fi.stdout.readline()
+        if line != b"progress %s\n" % progress:
+            raise GbpError("git fast-import failed to checkpoint")
+
     def close(self):
         """
         Close fast-import issuing all pending actions
+
+        @return: fast-import's exit status
+        @rtype: C{int}
         """
         if self._out:
             self._out.close()
         if self._fi:
-            self._fi.wait()
+            ret = self._fi.wait()
+            self._fi.stdout.close()
+            return ret
 
     def __del__(self):
         self.close()
@@ -0,0 +1,470 @@
+# vim: set fileencoding=utf-8 :
+#
+# (C) 2026 The git-buildpackage developers
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, please see
+#    <http://www.gnu.org/licenses/>
+"""Parse mail style patch headers like I{git mailinfo -k} does"""
+
+import binascii
+import re
+
+from gbp.git.errors import GitError
+
+# What C's isspace() considers whitespace
+_SPACE = b' \t\n\v\f\r'
+_space_re = re.compile(rb'[ \t\n\v\f\r]+')
+_rfc2822_header_re = re.compile(rb'[\x21-\x39\x3b-\x7e]*:')
+_q_re = re.compile(rb'=([0-9A-Fa-f]{2})|=(?:\n|\Z)|_')
+_b64_garbage_re = re.compile(rb'[^A-Za-z0-9+/]')
+_separator_re = re.compile(rb'From [0-9a-f]{40} Mon Sep 17 00:00:00 2001\n\Z')
+_lines_re = re.compile(rb'[^\n]*\n|[^\n]+')
+# Charsets Python decodes the same way iconv does
+_charset_re = re.compile(rb'(?:(?:us-)?ascii|iso-8859-(?:[1-9]|1[0-6]))\Z', re.I)
+
+
+class MailInfoError(GitError):
+    """The message needs to be handled by I{git mailinfo} itself"""
+    pass
+
+
+def _cleanup_space(value):
+    """
+    Collapse whitespace
+
+    >>> _cleanup_space(b' a \\t b\\n')
+    b' a b '
+    """
+    return _space_re.sub(b' ', value)
+
+
+def _is_rfc2822_header(line):
+    """
+    >>> _is_rfc2822_header(b'Bug-Debian: 1'), _is_rfc2822_header(b'a b: c')
+    (True, False)
+    >>> _is_rfc2822_header(b'From 0123 Mon Sep 17 00:00:00 2001')
+    True
+    """
+    return (line.startswith((b'From ', b'>From ')) or
+            _rfc2822_header_re.match(line) is not None)
+
+
+def _skip_header(line, name):
+    """
+    Get the value of header I{name} if I{line} is one
+
+    >>> _skip_header(b'subject:  foo', b'Subject')
+    b'foo'
+    >>> _skip_header(b'Subjects: foo', b'Subject')
+    """
+    if (line[:len(name)].lower() != name.lower() or
+            line[len(name):len(name) + 1] != b':'):
+        return None
+    return line[len(name) + 1:].lstrip(_SPACE)
+
+
+def _attr(value, name):
+    """
+    Get attribute I{name} of a header's I{value}
+
+    >>> _attr(b'text/plain; charset="utf-8"', b'charset=')
+    b'utf-8'
+    >>> _attr(b'text/plain; Charset=utf-8; format=fixed', b'charset=')
+    b'utf-8'
+    """
+    pos = value.lower().find(name)
+    if pos < 0:
+        return None
+    value = value[pos + len(name):]
+    if value.startswith(b'"'):
+        return value[1:].split(b'"', 1)[0]
+    return re.split(rb'[; \t]', value, 1)[0]
+
+
+def _decode_q(data, rfc2047=False):
+    """
+    Decode quoted-printable I{data}
+
+    >>> _decode_q(b'a=3Db=\\n'), _decode_q(b'a_=C3=A4', True)
+    (b'a=b', b'a \\xc3\\xa4')
+    """
+    out = []
+    pos = 0
+    for m in _q_re.finditer(data):
+        out.append(data[pos:m.start()])
+        pos = m.end()
+        if m.group(1):
+            out.append(bytes([int(m.group(1), 16)]))
+        elif m.group(0) == b'_':
+            out.append(b' ' if rfc2047 else b'_')
+        else:
+            # soft line break
+            return b''.join(out)
+    out.append(data[pos:])
+    return b''.join(out)
+
+
+def _decode_b(data):
+    """
+    Decode base64 I{data} skipping garbage
+
+    >>> _decode_b(b'Zm9v\\n'), _decode_b(b'Zm9vYg')
+    (b'foo', b'foob')
+    """
+    data = _b64_garbage_re.sub(b'', data)
+    if len(data) % 4 == 1:
+        data = data[:-1]
+    return binascii.a2b_base64(data + b'=' * (-len(data) % 4))
+
+
+def _to_utf8(data, charset):
+    """
+    Convert I{data} from I{charset} to UTF-8
+    """
+    if not charset or re.match(rb'utf-?8\Z', charset, re.I):
+        return data
+    if not _charset_re.match(charset):
+        raise MailInfoError("Unsupported charset '%s'" % charset.decode('ascii', 'replace'))
+    try:
+        return data.decode(charset.decode('ascii')).encode('utf-8')
+    except UnicodeDecodeError as err:
+        raise MailInfoError("Can't convert from '%s': %s" % (charset.decode('ascii'), err))
+
+
+def _decode_header(value):
+    """
+    Decode RFC 2047 encoded words in a header's I{value}
+
+    >>> _decode_header(b'=?utf-8?q?B=C3=A4r?= =?ISO-8859-1?B?5A==?= x')
+    b'B\\xc3\\xa4r\\xc3\\xa4 x'
+    """
+    out = []
+    start = 0
+    while True:
+        ep = value.find(b'=?', start)
+        if ep < 0:
+            break
+        if ep != start and (value[start:ep].strip(_SPACE) or start == 0):
+            out.append(value[start:ep])
+        cp = value.find(b'?', ep + 2)
+        end = value.find(b'?=', cp + 3)
+        if cp < 0 or value[cp + 2:cp + 3] != b'?' or end < 0:
+            raise MailInfoError("Malformed encoded word in '%s'" %
+                                value.decode('utf-8', 'replace'))
+        encoding = value[cp + 1:cp + 2].lower()
+        if encoding == b'b':
+            decoded = _decode_b(value[cp + 3:end])
+        elif encoding == b'q':
+            decoded = _decode_q(value[cp + 3:end], True)
+        else:
+            raise MailInfoError("Unknown encoding in '%s'" %
+                                value.decode('utf-8', 'replace'))
+        out.append(_to_utf8(decoded, value[ep + 2:cp]))
+        start = end + 2
+    out.append(value[start:])
+    return b''.join(out)
+
+
+def _unquote_quoted_pair(value):
+    """
+    Remove quotes and escapes from an address
+
+    >>> _unquote_quoted_pair(b'"Doe, \\\\"J\\\\"" <j@d> (a (\\\\b))')
+    b'Doe, "J" <j@d> (a (b))'
+    """
+    out = bytearray()
+    pos = 0
+    while pos < len(value):
+        c = value[pos:pos + 1]
+        pos += 1
+        if c == b'"':
+            ends, depth = b'"', 0
+        elif c == b'(':
+            out += c
+            ends, depth = b')', 1
+        else:
+            out += c
+            continue
+        literally = False
+        while pos < len(value):
+            c = value[pos:pos + 1]
+            pos += 1
+            if literally:
+                literally = False
+            elif c == b'\\':
+                literally = True
+                continue
+            elif depth and c == b'(':
+                depth += 1
+            elif c == ends:
+                if depth:
+                    out += c
+                    depth -= 1
+                if not depth:
+                    break
+                continue
+            out += c
+    return bytes(out)
+
+
+def _sane_name(name, email):
+    if not name or len(name) > 60 or re.search(rb'[@<>]', name):
+        return email
+    return name
+
+
+def _parse_from(value):
+    """
+    Split a I{From:} header into name and email
+
+    >>> _parse_from(b'Foo Bar <foo@example.com>')
+    (b'Foo Bar', b'foo@example.com')
+    >>> _parse_from(b'foo@example.com (Foo Bar)')
+    (b'Foo Bar', b'foo@example.com')
+    >>> _parse_from(b'Foo <foo>')
+    (b'Foo', b'foo')
+    """
+    f = _unquote_quoted_pair(value)
+    at = f.find(b'@')
+    if at < 0:
+        # no real address, try "John Doe <johndoe>"
+        bra = value.find(b'<')
+        ket = value.find(b'>', bra)
+        if bra < 0 or ket < 0:
+            return b'', b''
+        email = value[bra + 1:ket]
+        return _sane_name(value[:bra].strip(_SPACE), email), email
+
+    while at > 0:
+        c = f[at - 1:at]
+        if c in _SPACE:
+            break
+        if c == b'<':
+            f = f[:at - 1] + b' ' + f[at:]
+            break
+        at -= 1
+    end = at + len(re.match(rb'[^ \n\t\r\v\f>]*', f[at:]).group(0))
+    email = f[at:end]
+    f = f[:at] + f[end + 1:]
+    name = _cleanup_space(f).strip(_SPACE)
+    if name.startswith(b'(') and name.endswith(b')') and len(name) > 1:
+        name = name[1:-1]
+    return _sane_name(name, email), email
+
+
+def _patchbreak(line):
+    """
+    Check if I{line} starts the patch
+
+    >>> [_patchbreak(l) for l in [b'diff -u a b\\n', b'--- a/foo\\n', b'--- \\n', b'----\\n']]
+    [True, True, True, False]
+    """
+    if line.startswith((b'diff -', b'Index: ')):
+        return True
+    if len(line) < 4 or not line.startswith(b'---'):
+        return False
+    if line[3:4] == b' ' and (not line[4:5] or line[4:5] not in _SPACE):
+        return True
+    return line[3:].lstrip(b' \t\v\f\r').startswith(b'\n')
+
+
+class _MailInfo(object):
+    """The state I{git mailinfo} keeps while parsing a message"""
+
+    headers = [b'From', b'Subject', b'Date']
+
+    def __init__(self):
+        self.p_hdr = {}
+        self.s_hdr = {}
+        self.charset = b''
+        self.transfer_encoding = None
+        self.header_stage = True
+        self.inbody_accum = b''
+        self.log = []
+        self.patch_lines = 0
+
+    def check_header(self, line, hdr, overwrite):
+        for name in self.headers:
+            if overwrite or name not in hdr:
+                value = _skip_header(line, name)
+                if value is not None:
+                    hdr[name] = _decode_header(value)
+                    return True
+        value = _skip_header(line, b'Content-Type')
+        if value is not None:
+            value = _decode_header(value)
+            if (_attr(value, b'format=') or b'').lower() == b'flowed':
+                raise MailInfoError("format=flowed isn't supported")
+            if _attr(value, b'boundary=') is not None:
+                raise MailInfoError("Multipart messages aren't supported")
+            self.charset = _attr(value, b'charset=') or b''
+            return True
+        value = _skip_header(line, b'Content-Transfer-Encoding')
+        if value is not None:
+            value = _decode_header(value).lower()
+            if b'base64' in value:
+                self.transfer_encoding = _decode_b
+            elif b'quoted-printable' in value:
+                self.transfer_encoding = _decode_q
+            else:
+                self.transfer_encoding = None
+            return True
+        value = _skip_header(line, b'Message-ID')
+        if value is not None:
+            _decode_header(value)
+            return True
+        return False
+
+    def flush_inbody_header(self):
+        if self.inbody_accum:
+            self.check_header(self.inbody_accum, self.s_hdr, False)
+            self.inbody_accum = b''
+
+    def check_inbody_header(self, line):
+        if self.inbody_accum and line[:1] in (b' ', b'\t'):
+            if self.inbody_accum.endswith(b'\n'):
+                self.inbody_accum = self.inbody_accum[:-1]
+            self.inbody_accum += line
+            return True
+
+        self.flush_inbody_header()
+        if line.startswith(b'>From') and line[5:6] and line[5:6] in _SPACE:
+            return _separator_re.match(line[1:]) is not None
+        if line.startswith(b'[PATCH]') and line[7:8] and line[7:8] in _SPACE:
+            self.s_hdr[b'Subject'] = line
+            return True
+        for name in self.headers:
+            if name not in self.s_hdr and _skip_header(line, name) is not None:
+                self.inbody_accum += line
+                return True
+        return False
+
+    def commit_msg(self, line):
+        """
+        Add I{line} to the commit message
+
+        @return: whether the patch starts at I{line}
+        """
+        if self.header_stage:
+            if line in (b'', b'\n'):
+                if self.inbody_accum:
+                    self.flush_inbody_header()
+                    self.header_stage = False
+                return False
+            self.header_stage = self.check_inbody_header(line)
+            if self.header_stage:
+                return False
+
+        line = _to_utf8(line, self.charset)
+        if _patchbreak(line):
+            return True
+        self.log.append(line)
+        return False
+
+    def parse(self, data):
+        lines = _lines_re.findall(data.lstrip(_SPACE))
+        if not lines:
+            raise MailInfoError("Empty patch")
+
+        # The mail header, like git we keep the last header line as
+        # body if the message ends within the header
+        pos = 0
+        while pos < len(lines):
+            line = lines[pos].rstrip(b'\n').rstrip(_SPACE)
+            pos += 1
+            if not line or not _is_rfc2822_header(line):
+                line += b'\n'
+                break
+            while pos < len(lines) and lines[pos][:1] in (b' ', b'\t'):
+                line += (b' ' + lines[pos][1:].rstrip(b'\n')).rstrip(_SPACE)
+                pos += 1
+            self.check_header(line, self.p_hdr, True)
+
+        # The body up to the patch
+        partial = b''
+        for line in [line] + lines[pos:]:
+            if self.transfer_encoding:
+                decoded = _lines_re.findall(partial + self.transfer_encoding(line))
+                partial = b''
+                if decoded and not decoded[-1].endswith(b'\n'):
+                    partial = decoded.pop()
+            else:
+                decoded = [line]
+            if self.body(decoded):
+                return
+        if not self.body([partial] if partial else []):
+            self.flush_inbody_header()
+
+    def body(self, lines):
+        """
+        Add I{lines} to the commit message
+
+        @return: whether the patch started
+        """
+        for line in lines:
+            if self.commit_msg(line):
+                self.patch_lines += 1
+                return True
+        return False
+
+    def info(self):
+        """The header information as printed by I{git mailinfo}"""
+        out = []
+        for name in self.headers:
+            if self.patch_lines and name in self.s_hdr:
+                value = self.s_hdr[name]
+            elif name in self.p_hdr:
+                value = self.p_hdr[name]
+            else:
+                continue
+            if b'\0' in value:
+                raise MailInfoError("NUL byte in '%s'" % name.decode())
+            if name == b'Subject':
+                out += [b'Subject: %s\n' % line for line in value.split(b'\n')]
+            elif name == b'From':
+                out.append(b'Author: %s\nEmail: %s\n' % _parse_from(_cleanup_space(value)))
+            else:
+                out.append(b'%s: %s\n' % (name, _cleanup_space(value)))
+        out.append(b'\n')
+        return b''.join(out)
+
+
+def mailinfo(data):
+    """
+    Parse patch header I{data} natively giving the same result as
+    I{git mailinfo -k} but without forking git for every patch.
+
+    >>> info, msg = mailinfo(b'From: foo <foo@example.com>\\n'
+    ...                      b'Subject: =?utf-8?q?Fix_b=C3=A4r?=\\n\\n'
+    ...                      b'Long\\ndescription\\n---\\n')
+    >>> print(info.decode(), end='')
+    Author: foo
+    Email: foo@example.com
+    Subject: Fix bär
+    <BLANKLINE>
+    >>> msg
+    b'Long\\ndescription\\n'
+
+    @param data: the patch header
+    @type data: C{bytes}
+    @return: the header information and the commit message in
+        I{git mailinfo}'s output format
+    @rtype: C{tuple} of C{bytes}
+    @raises MailInfoError: if the header needs to be parsed by
+        I{git mailinfo} itself e.g. because of unsupported encodings
+    """
+    if b'\0' in data:
+        raise MailInfoError("NUL bytes aren't supported")
+    parser = _MailInfo()
+    parser.parse(data)
+    return parser.info(), b''.join(parser.log)
@@ -0,0 +1,188 @@
+# vim: set fileencoding=utf-8 :
+#
+# (C) 2026 The git-buildpackage developers
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, please see
+#    <http://www.gnu.org/licenses/>
+"""An in memory snapshot of a git repository's refs"""
+
+import os
+import re
+import time
+from collections import namedtuple
+
+from gbp.git.errors import GitError
+
+GitRef = namedtuple('GitRef', ['sha1', 'type', 'peeled', 'peeled_type'])
+GitRef.__doc__ = """A ref: its object and what the object peels to (for tags)"""
+
+
+class GitRefSnapshot(object):
+    """
+    All refs of a repository as read by a single I{git for-each-ref}
+    call.
+
+    The snapshot is dropped whenever the ref storage on disk changes. If
+    refs changed too recently to tell further changes apart by their
+    timestamps the snapshot is only used for a single lookup.
+    """
+    # How git rev-parse expands ref names (see gitrevisions(7))
+    rev_parse_rules = ['%s', 'refs/%s', 'refs/tags/%s', 'refs/heads/%s',
+                       'refs/remotes/%s', 'refs/remotes/%s/HEAD']
+    # Names we don't try to resolve on our own
+    _complex_name_re = re.compile(r'(^-|^[0-9a-f]{40}$|[\s~^:?*\[\\@{}]|\.\.|^/|/$)')
+    # Timestamp granularity of the file system we're willing to handle
+    _racy_slack = 1.0
+
+    def __init__(self, repo):
+        """
+        @param repo: the repository to take the snapshot of
+        @type repo: L{GitRepository}
+        """
+        self._repo = repo
+        self._refs = None
+        self._dirs = []
+        self._stamp = None
+        self._racy = False
+
+    @property
+    def _common_dir(self):
+        git_dir = self._repo.git_dir
+        try:
+            with open(os.path.join(git_dir, 'commondir')) as f:
+                return os.path.normpath(os.path.join(git_dir, f.read().strip()))
+        except OSError:
+            return git_dir
+
+    def _fingerprint(self):
+        stamp = []
+        for path in self._dirs:
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_ino, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return stamp
+
+    def _load(self):
+        start = time.time()
+        out, err, ret = self._repo._git_inout(
+            'for-each-ref',
+            ['--format=%(objectname)%00%(objecttype)%00%(*objectname)%00%(*objecttype)%00%(refname)'],
+            capture_stderr=True)
+        if ret:
+            raise GitError("Failed to list refs: %s" % err.decode().strip())
+
+        refs = {}
+        dirs = set(['refs'])
+        for line in out.split(b'\n'):
+            if not line:
+                continue
+            sha1, type_, peeled, peeled_type, name = line.decode().split('\0', 4)
+            refs[name] = GitRef(sha1, type_, peeled or None, peeled_type or None)
+            parent = os.path.dirname(name)
+            while parent not in dirs:
+                dirs.add(parent)
+                parent = os.path.dirname(parent)
+
+        common_dir = self._common_dir
+        self._dirs = [os.path.join(common_dir, name) for name in
+                      ['packed-refs', 'reftable', os.path.join('reftable', 'tables.list')] + sorted(dirs)]
+        self._stamp = self._fingerprint()
+        self._refs = refs
+        # Changes during or right after listing the refs might not be
+        # visible in the (coarse) timestamps so only use such a snapshot once
+        newest = max([s[0] for s in self._stamp if s] or [0])
+        self._racy = newest / 1e9 >= start - self._racy_slack
+
+    def invalidate(self):
+        """Drop the snapshot, it will be reloaded on next use"""
+        self._refs = None
+
+    def _snapshot(self):
+        if (self._refs is None or self._racy or
+                self._fingerprint() != self._stamp):
+            self._load()
+        return self._refs
+
+    def get(self, refname):
+        """
+        Look up a fully qualified ref
+
+        @param refname: the ref's full name, e.g. I{refs/heads/master}
+        @type refname: C{str}
+        @return: the ref or C{None} if it doesn't exist
+        @rtype: L{GitRef}
+        """
+        return self._snapshot().get(refname)
+
+    def list(self, prefix, short=False):
+        """
+        List refs below I{prefix}
+
+        @param prefix: prefix like I{refs/tags/}
+        @type prefix: C{str}
+        @param short: shorten ref names unambiguously like git
+            for-each-ref's I{%(refname:short)}
+        @type short: C{bool}
+        @return: ref names sorted by full name
+        @rtype: C{list} of C{str}
+        """
+        refs = self._snapshot()
+        names = sorted(name for name in refs if name.startswith(prefix))
+        if short:
+            names = [self._shorten(refs, name) for name in names]
+        return names
+
+    def _pseudo_ref_exists(self, name):
+        return os.path.isfile(os.path.join(self._repo.git_dir, name))
+
+    def _exists(self, refs, name):
+        if name.startswith('refs/'):
+            return name in refs
+        return self._pseudo_ref_exists(name)
+
+    def dwim(self, name):
+        """
+        Resolve I{name} like git rev-parse would
+
+        @param name: a ref name like I{master} or I{upstream/1.0}
+        @type name: C{str}
+        @return: full name and ref or C{None} if we can't tell without
+            asking git (e.g. because I{name} isn't a plain ref name)
+        @rtype: C{tuple} of C{str} and L{GitRef}
+        """
+        if not name or self._complex_name_re.search(name):
+            return None
+        if not name.startswith('refs/') and self._pseudo_ref_exists(name):
+            return None
+
+        refs = self._snapshot()
+        for rule in self.rev_parse_rules:
+            refname = rule % name
+            if refname in refs:
+                return refname, refs[refname]
+        return None
+
+    def _shorten(self, refs, refname):
+        # Like git we don't shorten to the last rule (remotes HEAD)
+        rules = self.rev_parse_rules
+        for i in range(len(rules) - 2, 0, -1):
+            prefix = rules[i][:-2]
+            if not refname.startswith(prefix) or len(refname) == len(prefix):
+                continue
+            short = refname[len(prefix):]
+            if not any(self._exists(refs, rule % short)
+                       for j, rule in enumerate(rules) if j != i):
+                return short
+        return refname
@@ -16,20 +16,28 @@
 #    <http://www.gnu.org/licenses/>
 """A Git repository"""
 
+import fnmatch
 import subprocess
 import os.path
 import re
+import stat
 import sys
+import tempfile
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 import gbp.log as log
+from gbp.profiler import PROFILER
 from gbp.errors import GbpError
 from gbp.format import format_b
 from gbp.git.modifier import GitModifier
 from gbp.git.commit import GitCommit
 from gbp.git.errors import GitError
 from gbp.git.args import GitArgs
+from gbp.git.catfile import GitCatFile
+from gbp.git.refs import GitRefSnapshot
 from gbp.paths import to_bin
+from gbp.probe_cache import probe
 
 
 class GitRepositoryError(GitError):
@@ -37,6 +45,16 @@ class GitRepositoryError(GitError):
     pass
 
 
+class GitStreamError(GitRepositoryError):
+    """Exception thrown by L{GitRepository.git_stream} if git failed"""
+    def __init__(self, command, returncode, stderr):
+        self.command = command
+        self.returncode = returncode
+        self.stderr = stderr
+        super(GitStreamError, self).__init__("Error running git %s: %s" %
+                                             (command, stderr.decode().strip()))
+
+
 class GitRemote(object):
     """Class representing a remote repository"""
     def __init__(self, name, fetch_url, push_urls):
@@ -78,6 +96,20 @@ class GitRepository(object):
     @raises GitRepositoryError: on git errors GitRepositoryError is raised by
         all methods.
     """
+    # Git commands that never modify refs
+    _ref_safe_commands = frozenset(['archive', 'cat-file', 'config', 'describe',
+                                    'diff', 'diff-tree', 'for-each-ref',
+                                    'format-patch', 'hash-object', 'help', 'log',
+                                    'ls-files', 'ls-tree', 'merge-base', 'mktree',
+                                    'rev-list', 'rev-parse', 'show', 'show-ref',
+                                    'status', 'update-index', 'write-tree'])
+    # Chunk size when streaming git's output
+    _stream_bufsize = 65536
+    # Number of parallel git hash-object processes in commit_dir, None
+    # means one per CPU
+    _hash_jobs = None
+    # Minimum number of files per hash-object process
+    _hash_min_files = 1000
 
     def _check_bare(self):
         """Check whether this is a bare repository"""
@@ -117,18 +149,83 @@ class GitRepository(object):
             raise GitRepositoryError("No Git repository at '%s'" % path)
         return ret
 
-    def __init__(self, path, toplevel=True):
+    def __init__(self, path, toplevel=True, batch_objects=True, cache_refs=True):
         """
         @param path: path to git repo (or subdir)
         @type path: C{str}
         @param toplevel: whether path points to the toplevel dir of
             git repository
         @type toplevel: C{bool}
+        @param batch_objects: whether to read objects through long running
+            git cat-file processes instead of forking git for each object
+        @type batch_objects: C{bool}
+        @param cache_refs: whether to answer ref queries from an in memory
+            snapshot of all refs
+        @type cache_refs: C{bool}
         """
         self._bare = False
+        self._cat_file_batch = None
+        self._cat_file_check = None
+        self._refs = None
         self._path = self._check_repo(path, toplevel)
         self._check_bare()
         self._get_git_dir()
+        if batch_objects:
+            self._cat_file_batch = GitCatFile(self)
+            self._cat_file_check = GitCatFile(self, check=True)
+        if cache_refs:
+            self._refs = GitRefSnapshot(self)
+
+    def close(self):
+        """
+        Terminate any helper processes kept running by this repository.
+        They're restarted on demand so the repository can still be used
+        afterwards.
+        """
+        for catfile in (self._cat_file_batch, self._cat_file_check):
+            if catfile:
+                catfile.close()
+
+    def _use_cat_file(self, obj):
+        """Whether I{obj} can be looked up via git cat-file --batch"""
+        return self._cat_file_batch is not None and '\n' not in obj
+
+    def _cat_file(self, obj, contents=False):
+        """
+        Look up I{obj} using the repository's git cat-file processes
+
+        @param obj: the object to look up
+        @type obj: C{str}
+        @param contents: whether to fetch the object's content too
+        @type contents: C{bool}
+        @return: sha1, type and size (or content) of the object, C{None}
+            if there's no such object
+        @rtype: C{tuple}
+        """
+        try:
+            if contents:
+                return self._cat_file_batch.contents(obj)
+            else:
+                return self._cat_file_check.info(obj)
+        except GitError as err:
+            raise GitRepositoryError("Can't look up %s: %s" % (obj, err))
+
+    def _refs_changed(self, command):
+        """Drop the ref snapshot if git I{command} might have changed refs"""
+        if self._refs is not None and command not in self._ref_safe_commands:
+            self._refs.invalidate()
+
+    def _cached_ref(self, refname):
+        """
+        Look up a fully qualified ref in the ref snapshot
+
+        @return: the ref or C{None} if it doesn't exist
+        @rtype: L{gbp.git.refs.GitRef}
+        """
+        try:
+            return self._refs.get(refname)
+        except GitError as err:
+            raise GitRepositoryError(str(err))
 
     @staticmethod
     def __build_env(extra_env):
@@ -164,10 +261,14 @@ class GitRepository(object):
         env = self.__build_env(extra_env)
         cmd = ['git', command] + args
         log.debug(cmd)
+        start = PROFILER.start()
         popen = subprocess.Popen(cmd, stdout=subprocess.PIPE, env=env, cwd=cwd)
-        while popen.poll() is None:
-            output += popen.stdout.readlines()
-        output += popen.stdout.readlines()
+        with popen.stdout:
+            output = popen.stdout.readlines()
+        popen.wait()
+        PROFILER.stop(start, cmd, popen.returncode,
+                      bytes_out=sum(len(line) for line in output))
+        self._refs_changed(command)
         return output, popen.returncode
 
     def _git_inout(self, command, args, input=None, extra_env=None, cwd=None,
@@ -192,7 +293,9 @@ class GitRepository(object):
         """
         if not cwd:
             cwd = self.path
-        return self.git_inout(command, args, input, extra_env, cwd, capture_stderr, config_args)
+        ret = self.git_inout(command, args, input, extra_env, cwd, capture_stderr, config_args)
+        self._refs_changed(command)
+        return ret
 
     @classmethod
     def git_inout(cls, command, args, input, extra_env, cwd, capture_stderr, config_args=None):
@@ -210,6 +313,7 @@ class GitRepository(object):
         stdin_arg = subprocess.PIPE if input is not None else None
 
         log.debug(cmd)
+        start = PROFILER.start()
         popen = subprocess.Popen(cmd,
                                  stdin=stdin_arg,
                                  stdout=subprocess.PIPE,
@@ -218,8 +322,99 @@ class GitRepository(object):
                                  close_fds=True,
                                  cwd=cwd)
         (stdout, stderr) = popen.communicate(input)
+        PROFILER.stop(start, cmd, popen.returncode,
+                      bytes_in=len(input or b''),
+                      bytes_out=len(stdout or b'') + len(stderr or b''))
         return stdout, stderr, popen.returncode
 
+    def _git_stream(self, command, args, sep=b'\0', extra_env=None, cwd=None,
+                    capture_stderr=False, config_args=None):
+        """
+        Run a git command and yield its output record by record
+
+        @param command: git command to run
+        @type command: C{str}
+        @param args: list of arguments
+        @type args: C{list}
+        @param sep: record separator, C{None} to get the output in chunks
+        @type sep: C{bytestr}
+        @param extra_env: extra environment variables to pass
+        @type extra_env: C{dict}
+        @param cwd: directory to switch to when running the command, defaults to I{self.path}
+        @type cwd: C{str}
+        @param capture_stderr: whether to capture stderr
+        @type capture_stderr: C{bool}
+        @return: the records without the separator
+        @rtype: generator of C{bytestr}
+        @raises GitStreamError: if git fails (after all output got consumed)
+        """
+        if not cwd:
+            cwd = self.path
+        yield from self.git_stream(command, args, extra_env, cwd, sep,
+                                   capture_stderr, config_args)
+        self._refs_changed(command)
+
+    @classmethod
+    def git_stream(cls, command, args, extra_env, cwd, sep=b'\0',
+                   capture_stderr=False, config_args=None):
+        """
+        As _git_stream but can be used without an instance.
+
+        Output is read in chunks of L{_stream_bufsize} so memory use only
+        depends on the size of the records, not on the size of the whole
+        output. If the consumer stops early, git is terminated. If I{sep}
+        is C{None} the chunks are passed on as is.
+        """
+        config_opts = []
+        for arg in config_args or []:
+            config_opts.extend(['-c', arg])
+
+        cmd = ['git'] + config_opts + [command] + args
+        env = cls.__build_env(extra_env)
+        stderr = tempfile.TemporaryFile() if capture_stderr else None
+
+        log.debug(cmd)
+        start = PROFILER.start()
+        popen = subprocess.Popen(cmd,
+                                 stdout=subprocess.PIPE,
+                                 stderr=stderr,
+                                 env=env,
+                                 close_fds=True,
+                                 cwd=cwd)
+        done = False
+        read = 0
+        try:
+            pending = b''
+            while True:
+                chunk = popen.stdout.read(cls._stream_bufsize)
+                if not chunk:
+                    break
+                read += len(chunk)
+                if sep is None:
+                    yield chunk
+                    continue
+                records = (pending + chunk).split(sep)
+                pending = records.pop()
+                for record in records:
+                    yield record
+            if pending:
+                yield pending
+            done = True
+        finally:
+            if not done:
+                popen.kill()
+            popen.stdout.close()
+            popen.wait()
+            PROFILER.stop(start, cmd, popen.returncode, bytes_out=read)
+            if stderr:
+                stderr.seek(0)
+                err = stderr.read()
+                stderr.close()
+            else:
+                err = b''
+        if popen.returncode:
+            raise GitStreamError(command, popen.returncode, err)
+
     def _git_command(self, command, args=[], extra_env=None):
         """
         Execute git command with arguments args and environment env
@@ -246,7 +441,8 @@ class GitRepository(object):
 
     def _cmd_has_feature(self, command, feature):
         """
-        Check if the git command has certain feature enabled.
+        Check if the git command has certain feature enabled. The result
+        is cached in the L{gbp.probe_cache.ProbeCache}.
 
         @param command: git command
         @type command: C{str}
@@ -255,6 +451,14 @@ class GitRepository(object):
         @return: True if feature is supported
         @rtype: C{bool}
         """
+        return probe('git', ['help', '-m', command, feature],
+                     lambda: self._parse_cmd_features(command, feature),
+                     env=['GIT_EXEC_PATH', 'MANPATH'])
+
+    def _parse_cmd_features(self, command, feature):
+        """
+        Check I{command}'s man page for I{feature}, see L{_cmd_has_feature}
+        """
         args = GitArgs(command, '-m')
         help, stderr, ret = self._git_inout('help',
                                             args.args,
@@ -386,6 +590,8 @@ class GitRepository(object):
         ref = out.decode().split('\n')[0]
 
         # Check if ref really exists
+        if self._refs is not None:
+            return ref[11:] if self._cached_ref(ref) else None
         try:
             self._git_command('show-ref', [ref])
             branch = ref[11:]  # strip /refs/heads
@@ -406,6 +612,8 @@ class GitRepository(object):
         args = GitArgs('--verify')
 
         branch_pattern = 'refs/remotes/%s' if remote else 'refs/heads/%s'
+        if self._refs is not None:
+            return self._cached_ref(branch_pattern % branch) is not None
         args.add(branch_pattern % branch)
         try:
             self._git_command('show-ref', args.args)
@@ -537,8 +745,13 @@ class GitRepository(object):
         @return: local or remote branches
         @rtype: C{list}
         """
-        args = ['--format=%(refname:short)']
-        args += ['refs/remotes/'] if remote else ['refs/heads/']
+        prefix = 'refs/remotes/' if remote else 'refs/heads/'
+        if self._refs is not None:
+            try:
+                return self._refs.list(prefix, short=True)
+            except GitError as err:
+                raise GitRepositoryError(str(err))
+        args = ['--format=%(refname:short)', prefix]
         out = self._git_getoutput('for-each-ref', args)[0]
         return [ref.decode().strip() for ref in out]
 
@@ -717,6 +930,8 @@ class GitRepository(object):
         @return: C{True} if the repository has that tag, C{False} otherwise
         @rtype: C{bool}
         """
+        if self._refs is not None and not re.search(r'[*?[\\]', tag):
+            return self._cached_ref('refs/tags/%s' % tag) is not None
         out, ret = self._git_getoutput('tag', ['-l', tag])
         return [False, True][len(out)]
 
@@ -802,6 +1017,15 @@ class GitRepository(object):
         @return: tags
         @rtype: C{list} of C{str}
         """
+        # Leave character classes and escapes to git's wildmatch
+        if self._refs is not None and not (pattern and any(c in pattern for c in '[\\')):
+            try:
+                tags = [name[10:] for name in self._refs.list('refs/tags/')]
+            except GitError as err:
+                raise GitRepositoryError(str(err))
+            if pattern:
+                tags = [tag for tag in tags if fnmatch.fnmatchcase(tag, pattern)]
+            return tags
         args = ['-l', pattern] if pattern else []
         return [line.decode().strip() for line in self._git_getoutput('tag', args)[0]]
 
@@ -923,22 +1147,22 @@ class GitRepository(object):
             for path in pathlist:
                 options.add(path)
 
-        out, err, ret = self._git_inout('status', options.args,
-                                        extra_env={'LC_ALL': 'C'})
-        if ret:
-            raise GitRepositoryError("Can't get repository status: %s" % err)
-
-        elements = out.split(b'\x00')
         result = defaultdict(list)
-
-        while elements[0] != b'':
-            element = elements.pop(0)
-            status = element[:2].decode()
-            filepath = element[3:]
-            # Expect to have two filenames for renames and copies
-            if status[0] in ['R', 'C']:
-                filepath = elements.pop(0) + b'\x00' + filepath
-            result[status].append(filepath)
+        elements = self._git_stream('status', options.args,
+                                    extra_env={'LC_ALL': 'C'},
+                                    capture_stderr=True)
+        try:
+            for element in elements:
+                if not element:
+                    continue
+                status = element[:2].decode()
+                filepath = element[3:]
+                # Expect to have two filenames for renames and copies
+                if status[0] in ['R', 'C']:
+                    filepath = next(elements, b'') + b'\x00' + filepath
+                result[status].append(filepath)
+        except GitStreamError as err:
+            raise GitRepositoryError("Can't get repository status: %s" % err.stderr.decode().strip())
 
         return result
 
@@ -964,6 +1188,10 @@ class GitRepository(object):
         @return: the name's sha1
         @rtype: C{str}
         """
+        if not short:
+            sha = self._rev_parse_cached(name)
+            if sha:
+                return sha
         args = GitArgs("--quiet", "--verify")
         args.add_cond(short, '--short=%d' % short)
         args.add(name)
@@ -972,6 +1200,33 @@ class GitRepository(object):
             raise GitRepositoryError("revision '%s' not found" % name)
         return self.strip_sha1(sha[0].decode(), short)
 
+    def _rev_parse_cached(self, name):
+        """
+        Resolve I{name} using the ref snapshot
+
+        @return: the name's sha1 or C{None} if it can't be resolved that way
+        @rtype: C{str}
+        """
+        if self._refs is None:
+            return None
+        peel = False
+        for suffix in ['^0', '^{commit}']:
+            if name.endswith(suffix):
+                name, peel = name[:-len(suffix)], True
+                break
+        try:
+            found = self._refs.dwim(name)
+        except GitError as err:
+            raise GitRepositoryError(str(err))
+        if not found:
+            return None
+        ref = found[1]
+        if not peel or ref.type == 'commit':
+            return ref.sha1
+        elif ref.peeled_type == 'commit':
+            return ref.peeled
+        return None
+
     @staticmethod
     def strip_sha1(sha1, length=0):
         """
@@ -1022,6 +1277,8 @@ class GitRepository(object):
         @return: C{True} if the repository has that tree, C{False} otherwise
         @rtype: C{bool}
         """
+        if self._use_cat_file(treeish):
+            return self._cat_file('%s^{tree}' % treeish) is not None
         _out, _err, ret = self._git_inout('ls-tree', [treeish],
                                           capture_stderr=True)
         return [True, False][ret != 0]
@@ -1078,6 +1335,11 @@ class GitRepository(object):
         @return: type of the repository object
         @rtype: C{str}
         """
+        if self._use_cat_file(obj):
+            info = self._cat_file(obj)
+            if info is None:
+                raise GitRepositoryError("Not a Git repository object: '%s'" % obj)
+            return info[1]
         out, ret = self._git_getoutput('cat-file', args=['-t', obj])
         if ret:
             raise GitRepositoryError("Not a Git repository object: '%s'" % obj)
@@ -1105,23 +1367,22 @@ class GitRepository(object):
         args.add("--")
         args.add_cond(paths, paths)
 
-        out, err, ret = self._git_inout('ls-tree', args.args, capture_stderr=True)
-        if ret:
-            raise GitRepositoryError("Failed to ls-tree '%s': '%s'" % (treeish, err.decode().strip()))
-
-        for line in out.split(b'\0'):
-            if line:
-                parts = line.split(None, 4 if sizes else 3)
-                # decode everything but the file name
-                filename = parts.pop()
-                if sizes:
-                    mode, type, sha1, size = (part.decode() for part in parts)
-                    # Git submodules report '-' instead of a size
-                    size = size if size != '-' else 0
-                    yield mode, type, sha1, int(size), filename
-                else:
-                    mode, type, sha1 = (part.decode() for part in parts)
-                    yield mode, type, sha1, filename
+        try:
+            for line in self._git_stream('ls-tree', args.args, capture_stderr=True):
+                if line:
+                    parts = line.split(None, 4 if sizes else 3)
+                    # decode everything but the file name
+                    filename = parts.pop()
+                    if sizes:
+                        mode, type, sha1, size = (part.decode() for part in parts)
+                        # Git submodules report '-' instead of a size
+                        size = size if size != '-' else 0
+                        yield mode, type, sha1, int(size), filename
+                    else:
+                        mode, type, sha1 = (part.decode() for part in parts)
+                        yield mode, type, sha1, filename
+        except GitStreamError as err:
+            raise GitRepositoryError("Failed to ls-tree '%s': '%s'" % (treeish, err.stderr.decode().strip()))
 
 #}
 
@@ -1181,6 +1442,24 @@ class GitRepository(object):
         name = os.getenv("GIT_AUTHOR_NAME", name)
         return GitModifier(name, email)
 
+    def get_ident(self, who='committer'):
+        """
+        Get the identity git uses for new commits, tags, etc. from git's
+        config and environment variables.
+
+        @param who: I{author} or I{committer}
+        @type who: C{str}
+        @return: name, email and date
+        @rtype: L{GitModifier}
+        """
+        out, err, ret = self._git_inout('var', ['GIT_%s_IDENT' % who.upper()],
+                                        capture_stderr=True)
+        m = re.match(r'(?P<name>.*) <(?P<email>.*)> (?P<date>[0-9]+ [+-][0-9]{4})$',
+                     out.decode().strip())
+        if ret or not m:
+            raise GitRepositoryError("Failed to get %s identity: %s" % (who, err.decode().strip()))
+        return GitModifier(m.group('name'), m.group('email'), m.group('date'))
+
 #{ Remote Repositories
 
     def get_remotes(self):
@@ -1394,6 +1673,25 @@ class GitRepository(object):
 
         self._git_command("add", args + paths, extra_env)
 
+    def add_index_entries(self, entries, index_file=None):
+        """
+        Add entries for existing objects to the index
+
+        @param entries: mode, sha1 and path of each entry
+        @type entries: C{list} of C{tuple} of C{str}, C{str}, C{str}
+        @param index_file: alternative index file to use
+        @type index_file: C{str}
+        """
+        extra_env = {'GIT_INDEX_FILE': index_file} if index_file else None
+        index_info = b''.join(b'%s %s\t%s\0' % (mode.encode(), sha1.encode(), os.fsencode(path))
+                              for mode, sha1, path in entries)
+        _, err, ret = self._git_inout('update-index', ['-z', '--index-info'],
+                                      index_info,
+                                      extra_env=extra_env,
+                                      capture_stderr=True)
+        if ret:
+            raise GitRepositoryError("Failed to update index: %s" % err.decode().strip())
+
     def remove_files(self, paths, verbose=False):
         """
         Remove files from the repository
@@ -1541,15 +1839,53 @@ class GitRepository(object):
         @type create_missing_branch: C{bool}
         """
 
+        tree = self.write_dir_tree(unpack_dir)
+        return self.commit_tree_to_branch(tree, msg, branch, other_parents,
+                                          author, committer, create_missing_branch)
+
+    def write_dir_tree(self, unpack_dir):
+        """
+        Write the contents of I{unpack_dir} to the object database
+
+        @param unpack_dir: content to add
+        @type unpack_dir: C{str}
+        @return: the sha1 of the tree
+        @rtype: C{str}
+        """
         git_index_file = os.path.join(self.path, self._git_dir, 'gbp_index')
         try:
             os.unlink(git_index_file)
         except OSError:
             pass
-        self.add_files('.', force=True, index_file=git_index_file,
-                       work_tree=unpack_dir)
-        tree = self.write_tree(git_index_file)
+        if not self._index_dir(unpack_dir, git_index_file):
+            self.add_files('.', force=True, index_file=git_index_file,
+                           work_tree=unpack_dir)
+        return self.write_tree(git_index_file)
 
+    def commit_tree_to_branch(self, tree, msg, branch, other_parents=None,
+                              author={}, committer={}, create_missing_branch=False):
+        """
+        Replace the current tip of branch I{branch} with I{tree}
+
+        @param tree: the tree to commit
+        @type tree: C{str}
+        @param msg: commit message to use
+        @type msg: C{str}
+        @param branch: branch to commit I{tree} to
+        @type branch: C{str}
+        @param other_parents: additional parents of this commit
+        @type other_parents: C{list} of C{str}
+        @param author: author information to use for commit
+        @type author: C{dict} with keys I{name}, I{email}, I{date}
+        @param committer: committer information to use for commit
+        @type committer: C{dict} with keys I{name}, I{email}, I{date}
+            or L{GitModifier}
+        @param create_missing_branch: create I{branch} as detached branch if it
+            doesn't already exist.
+        @type create_missing_branch: C{bool}
+        @return: the new commit
+        @rtype: C{str}
+        """
         if branch:
             try:
                 cur = self.rev_parse(branch)
@@ -1586,6 +1922,118 @@ class GitRepository(object):
                         msg="gbp: %s" % msg.split('\n')[0])
         return commit
 
+    @staticmethod
+    def _scan_dir(top):
+        """
+        List the files below I{top} as git add would add them
+
+        @return: regular files and symlinks as (relative path, mode, size)
+            or C{None} if the tree contains things we leave to git add
+            like nested repositories or special files
+        @rtype: C{list} of C{tuple}
+        """
+        files = []
+        dirs = ['']
+        while dirs:
+            reldir = dirs.pop()
+            with os.scandir(os.path.join(top, reldir)) as entries:
+                for entry in entries:
+                    name = os.path.join(reldir, entry.name)
+                    # hash-object --stdin-paths C-unquotes lines starting with '"'
+                    if entry.name == '.git' or '\n' in name or name.startswith('"'):
+                        return None
+                    st = entry.stat(follow_symlinks=False)
+                    if stat.S_ISLNK(st.st_mode):
+                        files.append((name, '120000', st.st_size))
+                    elif stat.S_ISDIR(st.st_mode):
+                        dirs.append(name)
+                    elif stat.S_ISREG(st.st_mode):
+                        mode = '100755' if st.st_mode & stat.S_IXUSR else '100644'
+                        files.append((name, mode, st.st_size))
+                    else:
+                        return None
+        return files
+
+    def _hash_objects(self, top, paths, filters=True):
+        """
+        Write the files I{paths} relative to I{top} as blobs
+
+        @return: the blobs' sha1s
+        @rtype: C{list} of C{str}
+        """
+        args = ['-w', '--stdin-paths'] + ([] if filters else ['--no-filters'])
+        extra_env = {'GIT_DIR': self.git_dir, 'GIT_WORK_TREE': top}
+        out, err, ret = self._git_inout('hash-object', args,
+                                        b''.join(os.fsencode(path) + b'\n' for path in paths),
+                                        extra_env=extra_env,
+                                        cwd=top,
+                                        capture_stderr=True)
+        if ret:
+            raise GitRepositoryError("Failed to hash objects: %s" % err.decode().strip())
+        sha1s = out.decode().split()
+        if len(sha1s) != len(paths):
+            raise GitRepositoryError("Failed to hash objects: got %d objects for %d files"
+                                     % (len(sha1s), len(paths)))
+        return sha1s
+
+    def _hash_symlinks(self, top, links):
+        """Write the targets of the symlinks I{links} as blobs"""
+        with tempfile.TemporaryDirectory(dir=self.git_dir) as tmpdir:
+            paths = []
+            for i, link in enumerate(links):
+                path = os.path.join(tmpdir, str(i))
+                with open(path, 'wb') as f:
+                    f.write(os.readlink(os.fsencode(os.path.join(top, link))))
+                paths.append(path)
+            return self._hash_objects(tmpdir, paths, filters=False)
+
+    def _index_dir(self, top, index_file, jobs=None):
+        """
+        Fill I{index_file} with the contents of I{top} like I{git add -f .}
+        would but hash the files with several git hash-object processes in
+        parallel and feed the result to git update-index --index-info.
+
+        @param top: directory to add
+        @type top: C{str}
+        @param index_file: the index file to fill
+        @type index_file: C{str}
+        @param jobs: number of parallel hash-object processes
+        @type jobs: C{int}
+        @return: C{False} if the directory must be added with git add instead
+        @rtype: C{bool}
+        """
+        # hash-object runs in top so relative paths would resolve wrongly
+        top = os.path.abspath(top)
+        files = self._scan_dir(top)
+        if files is None:
+            return False
+
+        regular = [f for f in files if f[1] != '120000']
+        links = [f[0] for f in files if f[1] == '120000']
+        jobs = jobs or self._hash_jobs or os.cpu_count() or 1
+        jobs = max(1, min(jobs, len(regular) // self._hash_min_files))
+
+        # Balance shards by size plus some per file overhead
+        shards = [[] for _ in range(jobs)]
+        total = sum(f[2] + 4096 for f in regular)
+        done = 0
+        for f in regular:
+            shards[min(done * jobs // total, jobs - 1)].append(f)
+            done += f[2] + 4096
+
+        with ThreadPoolExecutor(max_workers=jobs + 1) as executor:
+            hashed = [executor.submit(self._hash_objects, top, [f[0] for f in shard])
+                      for shard in shards if shard]
+            linked = executor.submit(self._hash_symlinks, top, links) if links else None
+            sha1s = [sha1 for result in hashed for sha1 in result.result()]
+            link_sha1s = linked.result() if linked else []
+
+        entries = [(mode, sha1, path) for (path, mode, _), sha1 in
+                   zip([f for shard in shards for f in shard], sha1s)]
+        entries += [('120000', sha1, path) for path, sha1 in zip(links, link_sha1s)]
+        self.add_index_entries(entries, index_file)
+        return True
+
     def commit_tree(self, tree, msg, parents, author={}, committer={}):
         """
         Commit a tree with commit msg I{msg} and parents I{parents}
@@ -1653,12 +2101,13 @@ class GitRepository(object):
             paths = [paths]
         args.add_cond(paths, paths)
 
-        commits, ret = self._git_getoutput('log', args.args)
-        if ret:
+        try:
+            return [commit.decode().strip() for commit in
+                    self._git_stream('log', args.args, sep=b'\n')]
+        except GitStreamError:
             where = " on %s" % paths if paths else ""
             raise GitRepositoryError("Error getting commits %s..%s%s" %
                                      (since, until, where))
-        return [commit.decode().strip() for commit in commits]
 
     def show(self, id):
         """
@@ -1666,6 +2115,12 @@ class GitRepository(object):
 
         @rtype: C{bytestr}
         """
+        if self._use_cat_file(id):
+            # Blobs are shown verbatim, anything else needs formatting
+            # (and missing objects a proper error message) from git show
+            found = self._cat_file(id, contents=True)
+            if found and found[1] == 'blob':
+                return found[2]
         obj, stderr, ret = self._git_inout('show', ["--pretty=medium", id],
                                            capture_stderr=True)
         if ret:
@@ -1688,15 +2143,14 @@ class GitRepository(object):
         args.add_true(since, since)
         args.add('--')
 
-        stdout, stderr, ret = self._git_inout('log', args.args,
-                                              capture_stderr=True)
-        if ret:
+        try:
+            commits = [commit.decode().strip() for commit in
+                       self._git_stream('log', args.args, sep=b'\n',
+                                        capture_stderr=True)]
+        except GitStreamError as err:
             raise GitRepositoryError("Error grepping log for %s: %s" %
-                                     (regex, stderr.decode().strip()))
-        if stdout:
-            return [commit.strip() for commit in stdout.decode().split('\n')[::-1]]
-        else:
-            return []
+                                     (regex, err.stderr.decode().strip()))
+        return commits[::-1]
 
     def get_subject(self, commit):
         """
@@ -1756,6 +2210,90 @@ class GitRepository(object):
                 'body': fields[8].decode(),
                 'files': files}
 
+    _commit_info_format = ('--pretty=format:%H%x00%an%x00%ae%x00%ad%x00%cn%x00%ce%x00%cd%x00'
+                           '%s%x00%f%x00%b%x00')
+    _sha1_re = re.compile(rb'^[0-9a-f]{40}([0-9a-f]{24})?$')
+
+    def iter_commit_info(self, since=None, until=None, paths=None, num=0,
+                         first_parent=False, options=None, reverse=False):
+        """
+        Look up data of all commits from since to until touching paths
+        using a single git log call. Commits are yielded as they're read,
+        newest first unless I{reverse} is given.
+
+        @param since: commit to start from
+        @type since: C{str}
+        @param until: last commit to get
+        @type until: C{str}
+        @param paths: only list commits touching paths
+        @type paths: C{list} of C{str}
+        @param num: maximum number of commits to fetch
+        @type num: C{int}
+        @param first_parent: only follow first parent when seeing a
+                             merge commit
+        @type first_parent: C{bool}
+        @param options: list of additional options passed to git log
+        @type  options: C{list} of C{str}ings
+        @param reverse: yield the oldest commit first
+        @type reverse: C{bool}
+        @return: commit info like L{get_commit_info} with I{id} being the
+            commit's sha1
+        @rtype: generator of C{dict}
+        """
+        args = GitArgs(self._commit_info_format, '-z', '--date=raw',
+                       '--no-renames', '--name-status', '--cc',
+                       '--no-show-signature')
+        args.add_true(num, '-%d' % num)
+        args.add_true(first_parent, '--first-parent')
+        args.add_true(reverse, '--reverse')
+        if since:
+            args.add("%s..%s" % (since, until or 'HEAD'))
+        elif until:
+            args.add(until)
+        args.add_cond(options, options)
+        args.add("--")
+        if isinstance(paths, str):
+            paths = [paths]
+        args.add_cond(paths, paths)
+
+        def commit_info(fields):
+            author = GitModifier(fields[1].decode().strip(),
+                                 fields[2].decode().strip(),
+                                 fields[3].decode().strip())
+            committer = GitModifier(fields[4].decode().strip(),
+                                    fields[5].decode().strip(),
+                                    fields[6].decode().strip())
+            return {'id': fields[0].decode(),
+                    'author': author,
+                    'committer': committer,
+                    'subject': fields[7].decode(),
+                    'patchname': fields[8].decode(),
+                    'body': fields[9].decode(),
+                    'files': defaultdict(list)}
+
+        fields = self._git_stream('log', args.args)
+        try:
+            info = None
+            for field in fields:
+                if info is None or self._sha1_re.match(field):
+                    # Start of the next commit
+                    if info:
+                        yield info
+                    info = commit_info([field] + [next(fields, b'') for _ in range(9)])
+                    continue
+                # Name status of the files changed, git adds an empty
+                # field after the body of merge commits and a newline
+                # before the first file of regular commits
+                status = field.decode().strip()
+                if status:
+                    info['files'][status].append(next(fields, b''))
+            if info:
+                yield info
+        except GitStreamError:
+            where = " on %s" % paths if paths else ""
+            raise GitRepositoryError("Error getting commits %s..%s%s" %
+                                     (since, until, where))
+
 #{ Patches
     def format_patches(self, start, end, output_dir,
                        signature=True,
@@ -1871,6 +2409,33 @@ class GitRepository(object):
             result[status].append(filepath)
 
         return result
+
+    def diff_tree(self, obj1, obj2):
+        """
+        Get the changed files between two trees recursively. Yields
+        tuples that match the raw 'diff-tree' output: (old mode, new
+        mode, old sha1, new sha1, status, path). Renames are reported as
+        a deletion and an addition.
+
+        @param obj1: first tree
+        @type obj1: C{str}
+        @param obj2: second tree
+        @type obj2: C{str}
+        @return: the changes
+        @rtype: generator of C{tuple}
+        """
+        args = GitArgs('-r', '-z', '--no-renames', '--no-ext-diff', obj1, obj2)
+        try:
+            records = self._git_stream('diff-tree', args.args, capture_stderr=True)
+            for info in records:
+                if not info:
+                    continue
+                path = next(records)
+                old_mode, new_mode, old_sha1, new_sha1, status = info.lstrip(b':').decode().split()
+                yield old_mode, new_mode, old_sha1, new_sha1, status, path
+        except GitStreamError as err:
+            raise GitRepositoryError("Failed to diff-tree '%s' '%s': '%s'" %
+                                     (obj1, obj2, err.stderr.decode().strip()))
 #}
 
     def archive(self, format, prefix, output, treeish, cwd=None):
@@ -1896,6 +2461,31 @@ class GitRepository(object):
         if ret:
             raise GitRepositoryError("Unable to archive %s: %s" % (treeish, err.decode().strip()))
 
+    def archive_stream(self, format, prefix, treeish, cwd=None):
+        """
+        Create an archive from a treeish without writing it to disk
+
+        @param format: the type of archive to create, e.g. 'tar'
+        @type format: C{str}
+        @param prefix: prefix to prepend to each filename in the archive
+        @type prefix: C{str}
+        @param treeish: the treeish to create the archive from
+        @type treeish: C{str}
+        @param cwd: The directory to run in. Defaults to the repository's path
+        @type cwd: C{str}
+        @return: the archive's contents
+        @rtype: generator of C{bytes} chunks
+        """
+        args = ['--format=%s' % format,
+                '--prefix=%s' % prefix,
+                treeish]
+        try:
+            yield from self._git_stream('archive', args, sep=None, cwd=cwd,
+                                        capture_stderr=True)
+        except GitStreamError as err:
+            raise GitRepositoryError("Unable to archive %s: %s" %
+                                     (treeish, err.stderr.decode().strip()))
+
     def collect_garbage(self, auto=False, prune=False, aggressive=False):
         """
         Cleanup unnecessary files and optimize the local repository
@@ -1925,8 +2515,11 @@ class GitRepository(object):
         @rtype: C{bool}
         """
         if treeish:
+            name = '%s:.gitmodules' % treeish
+            if self._use_cat_file(name):
+                return self._cat_file(name) is not None
             try:
-                self.show('%s:.gitmodules' % treeish)
+                self.show(name)
             except GitRepositoryError:
                 return False
             return True
@@ -1979,31 +2572,32 @@ class GitRepository(object):
         if path is None:
             path = self.path
 
-        args = [treeish]
+        args = ['-z', treeish]
         if recursive:
             args += ['-r']
 
-        out, err, ret = self._git_inout('ls-tree',
-                                        args,
-                                        cwd=path,
-                                        capture_stderr=True)
-        if ret:
+        found = []
+        try:
+            for line in self._git_stream('ls-tree', args, cwd=path,
+                                         capture_stderr=True):
+                if not line:
+                    continue
+                mode, objtype, commit, name = line.decode().split(None, 3)
+                # A submodules is shown as "commit" object in ls-tree:
+                if objtype == "commit":
+                    found.append((name, commit))
+        except GitStreamError as err:
             raise GitRepositoryError("Failed to list submodules of %s: %s" %
-                                     (treeish, err.decode().strip()))
-        for line in out.split(b'\n'):
-            if not line:
-                continue
-            mode, objtype, commit, name = line.decode().split(None, 3)
-
-            # A submodules is shown as "commit" object in ls-tree:
-            if objtype == "commit":
-                nextpath = os.path.join(path, name)
-                if nextpath.startswith(self.path):
-                    nextpath = nextpath[len(self.path):].lstrip('/')
-                submodules.append((nextpath, commit))
-                if recursive:
-                    submodules += self.get_submodules(commit, path=nextpath,
-                                                      recursive=recursive)
+                                     (treeish, err.stderr.decode().strip()))
+
+        for name, commit in found:
+            nextpath = os.path.join(path, name)
+            if nextpath.startswith(self.path):
+                nextpath = nextpath[len(self.path):].lstrip('/')
+            submodules.append((nextpath, commit))
+            if recursive:
+                submodules += self.get_submodules(commit, path=nextpath,
+                                                  recursive=recursive)
         return submodules
 
 #{ Repository Creation
@@ -17,38 +17,205 @@
 """Make blobs in a git repository accessible as file like objects"""
 
 import io
+import subprocess
+
+import gbp.log as log
 from gbp.git.repository import GitRepositoryError
 
 
 class GitVfs(object):
+    # Blobs up to this size are read at once, larger ones are streamed
+    _inline_size = 1 << 20
+
+    class _Blob(io.RawIOBase):
+        """
+        A seekable raw stream over a blob's content
+
+        Small blobs are served from memory through a C{memoryview} so
+        reads only copy the requested range. Large blobs are read from a
+        I{git cat-file blob} process on demand, seeking backwards
+        restarts it.
+        """
+        def __init__(self, repo, sha1=None, size=None, data=None):
+            self._repo = repo
+            self._sha1 = sha1
+            self._pos = 0
+            self._proc = None
+            self._proc_pos = 0
+            if data is not None:
+                self._view = memoryview(data).toreadonly()
+                self._size = len(data)
+            else:
+                self._view = None
+                self._size = size
+
+        def readable(self):
+            return True
+
+        def seekable(self):
+            return True
+
+        def tell(self):
+            return self._pos
+
+        def seek(self, offset, whence=io.SEEK_SET):
+            if whence == io.SEEK_SET:
+                pos = offset
+            elif whence == io.SEEK_CUR:
+                pos = self._pos + offset
+            elif whence == io.SEEK_END:
+                pos = self._size + offset
+            else:
+                raise ValueError("Invalid whence (%s)" % whence)
+            if pos < 0:
+                raise ValueError("Negative seek position %d" % pos)
+            self._pos = pos
+            return pos
+
+        def getbuffer(self):
+            """
+            The blob's content as read only C{memoryview}
+
+            Streamed blobs are loaded into memory by this.
+            """
+            if self._view is None:
+                self._stop()
+                self._view = memoryview(self._repo.show(self._sha1)).toreadonly()
+            return self._view
+
+        def _start(self):
+            cmd = ['git', 'cat-file', 'blob', self._sha1]
+            log.debug(cmd)
+            self._proc = subprocess.Popen(cmd,
+                                          stdout=subprocess.PIPE,
+                                          close_fds=True,
+                                          cwd=self._repo.path)
+            self._proc_pos = 0
+
+        def _stop(self):
+            proc, self._proc = self._proc, None
+            if proc:
+                if proc.poll() is None:
+                    proc.kill()
+                proc.stdout.close()
+                proc.wait()
+
+        def _readinto_stream(self, b):
+            if self._proc is None or self._proc_pos > self._pos:
+                self._stop()
+                self._start()
+            stdout = self._proc.stdout
+            while self._proc_pos < self._pos:
+                skipped = stdout.read(min(self._pos - self._proc_pos, io.DEFAULT_BUFFER_SIZE))
+                if not skipped:
+                    return 0
+                self._proc_pos += len(skipped)
+            n = stdout.readinto(b)
+            self._proc_pos += n
+            return n
+
+        def readinto(self, b):
+            if self._pos >= self._size:
+                return 0
+            if self._view is None:
+                n = self._readinto_stream(b)
+            else:
+                n = min(len(b), self._size - self._pos)
+                b[:n] = self._view[self._pos:self._pos + n]
+            self._pos += n
+            return n
+
+        def close(self):
+            self._stop()
+            self._view = None
+            super(GitVfs._Blob, self).close()
 
     class _File(object):
         """
         A file like object representing a file in git
 
-        @todo: We don't support any byte ranges yet.
+        Text is decoded lazily as UTF-8, switching to ISO-8859-1 for the
+        rest of the file once undecodable content shows up.
         """
-        def __init__(self, content, binary=False):
-            self._iter = iter
-            if binary:
-                self._data = io.BytesIO(content)
+        def __init__(self, blob, binary=False):
+            self._blob = blob
+            self._binary = binary
+            self._data = io.BufferedReader(blob)
+            if not binary:
+                self._offset = 0
+                self._text(self._data, 'utf-8')
+
+        def _text(self, buffered, encoding):
+            self._encoding = encoding
+            self._data = io.TextIOWrapper(buffered, encoding=encoding, newline='\n')
+
+        def _decoded(self, text):
+            """Track the byte offset of the text handed out so far"""
+            if self._encoding == 'utf-8':
+                self._offset += len(text.encode('utf-8'))
             else:
-                try:
-                    self._data = io.StringIO(content.decode())
-                except UnicodeDecodeError:
-                    self._data = io.StringIO(content.decode("iso-8859-1"))
+                self._offset += len(text)
+            return text
+
+        def _read(self, method, *args):
+            if self._binary:
+                return getattr(self._data, method)(*args)
+            try:
+                return getattr(self._data, method)(*args)
+            except UnicodeDecodeError:
+                if self._encoding != 'utf-8':
+                    raise
+                buffered = self._data.detach()
+                buffered.seek(self._offset)
+                self._text(buffered, 'iso-8859-1')
+                return getattr(self._data, method)(*args)
 
         def readline(self):
-            return self._data.readline()
+            line = self._read('readline')
+            return line if self._binary else self._decoded(line)
 
         def readlines(self):
-            return self._data.readlines()
+            lines = []
+            while True:
+                line = self.readline()
+                if not line:
+                    return lines
+                lines.append(line)
 
         def read(self, size=None):
-            return self._data.read(size)
+            data = self._read('read', size)
+            return data if self._binary else self._decoded(data)
+
+        def seek(self, offset, whence=io.SEEK_SET):
+            """
+            Seek to a byte offset (binary mode only)
+            """
+            if not self._binary:
+                raise io.UnsupportedOperation("Can only seek in binary mode")
+            return self._data.seek(offset, whence)
+
+        def tell(self):
+            """
+            Current byte offset (binary mode only)
+            """
+            if not self._binary:
+                raise io.UnsupportedOperation("Can only tell in binary mode")
+            return self._data.tell()
+
+        def getbuffer(self):
+            """
+            Get the whole content as read only C{memoryview} (binary mode only)
+            """
+            if not self._binary:
+                raise io.UnsupportedOperation("Buffers are only available in binary mode")
+            return self._blob.getbuffer()
 
         def close(self):
-            return self._data.close()
+            self._data.close()
+            self._blob.close()
+
+        def __iter__(self):
+            return iter(self.readline, b'' if self._binary else '')
 
         def __enter__(self):
             return self
@@ -64,6 +231,21 @@ class GitVfs(object):
         self._repo = repo
         self._committish = committish or 'HEAD'
 
+    def _blob(self, path):
+        obj = "%s:%s" % (self._committish, path)
+        if self._repo._use_cat_file(obj):
+            info = self._repo._cat_file(obj)
+            if info is not None:
+                sha1, type_, size = info
+                if type_ == 'blob' and size > self._inline_size:
+                    return GitVfs._Blob(self._repo, sha1=sha1, size=size)
+                if type_ == 'blob':
+                    found = self._repo._cat_file(sha1, contents=True)
+                    if found is not None:
+                        return GitVfs._Blob(self._repo, data=found[2])
+        # Let git show handle everything else including proper error messages
+        return GitVfs._Blob(self._repo, data=self._repo.show(obj))
+
     def open(self, path, flags=None):
         flags = flags or 'r'
 
@@ -71,8 +253,6 @@ class GitVfs(object):
             if flag not in ['r', 't', 'b']:
                 raise NotImplementedError("Flag '%s' unsupported so far" % flag)
         try:
-            return GitVfs._File(self._repo.show(
-                "%s:%s" % (self._committish, path)),
-                True if 'b' in flags else False)
+            return GitVfs._File(self._blob(path), True if 'b' in flags else False)
         except GitRepositoryError as e:
             raise OSError(e)
@@ -17,10 +17,15 @@
 """Handle Patches and Patch Series"""
 
 import collections
+import io
 import os
 import re
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import gbp.log
 from gbp.errors import GbpError
+from gbp.git.mailinfo import mailinfo, MailInfoError
 from gbp.git.repository import GitRepository
 
 VALID_DEP3_ENDS = re.compile(r'(?:---|\*\*\*|Index:)[ \t][^ \t]|^diff -|^---')
@@ -59,54 +64,80 @@ class Patch(object):
         return repr
 
     def _read_info(self):
-        self._read_git_mailinfo()
+        self._read_mailinfo(self._read_header())
 
-    def _read_git_mailinfo(self):
+    def _read_header(self):
         """
-        Read patch information into a structured form
+        Read the patch header up to the patch separator
 
-        using I{git mailinfo}
+        @return: the header or C{None} if there's no patch yet
+        @rtype: C{bytes}
         """
-        self.info = {}
-        self.long_desc = ''
-
-        body = tempfile.NamedTemporaryFile(prefix='gbp_')
-
         # No patch yet, file name information only
         if not os.path.exists(self.path):
-            return
+            return None
         # The patch description might contain UTF-8 while the actual patch is ascii.
         # To unconfuse git-mailinfo stop at the patch separator
         toparse = []
-        for line in open(self.path, 'rb'):
-            if line == b'---\n':
-                break
-            toparse.append(line)
+        with open(self.path, 'rb') as patch:
+            for line in patch:
+                if line == b'---\n':
+                    break
+                toparse.append(line)
+        return b''.join(toparse)
+
+    def _read_mailinfo(self, header):
+        """
+        Read patch information into a structured form
+
+        The header is parsed natively the same way I{git mailinfo}
+        does, only unusual encodings are left to I{git mailinfo} itself.
 
-        input = b''.join(toparse)
-        if input.strip():
+        @param header: the patch header
+        @type header: C{bytes}
+        """
+        self.info = {}
+        self.long_desc = ''
+
+        if header is None or not header.strip():
+            return
+
+        try:
+            out, body = mailinfo(header)
+        except MailInfoError as err:
+            gbp.log.debug("Using git mailinfo for '%s': %s" % (self.path, err))
+            out, body = self._read_git_mailinfo(header)
+
+        # Header
+        for line in out.decode().split('\n'):
+            if ':' in line:
+                rfc_header, value = line.split(" ", 1)
+                self.info[rfc_header[:-1].lower()] = value.strip()
+        # Body
+        self.long_desc = body.decode("utf-8", "backslashreplace")
+
+    def _read_git_mailinfo(self, header):
+        """
+        Read patch information using I{git mailinfo}
+
+        @param header: the patch header
+        @type header: C{bytes}
+        @return: the header information and the commit message
+        @rtype: C{tuple} of C{bytes}
+        """
+        body = tempfile.NamedTemporaryFile(prefix='gbp_')
+        try:
             out, err, ret = GitRepository.git_inout(command='mailinfo',
                                                     args=['-k', body.name, '/dev/null'],
-                                                    input=input,
+                                                    input=header,
                                                     extra_env=None,
                                                     cwd=None,
                                                     capture_stderr=True)
             if ret != 0:
                 raise GbpError("Failed to read patch header of '%s': %s" %
                                (self.path, err))
-        else:
-            out = b''
-
-        # Header
-        for line in out.decode().split('\n'):
-            if ':' in line:
-                rfc_header, value = line.split(" ", 1)
-                header = rfc_header[:-1].lower()
-                self.info[header] = value.strip()
-        # Body
-        try:
-            self.long_desc = "".join([li.decode("utf-8", "backslashreplace") for li in body])
-        except (IOError, UnicodeDecodeError) as msg:
+            return out, body.read()
+        except IOError as msg:
             raise GbpError("Failed to read patch header of '%s': %s" %
                            (self.path, msg))
         finally:
@@ -193,8 +224,9 @@ class Patch(object):
 
 class Dep3Patch(Patch):
     def _read_info(self):
-        super(Dep3Patch, self)._read_info()
-        self._check_dep3()
+        header = self._read_header()
+        self._read_mailinfo(header)
+        self._check_dep3(header)
 
     def _dep3_get_value(self, lines):
         value = []
@@ -273,11 +305,14 @@ class Dep3Patch(Patch):
                               ('\n' if pseudo_headers else '') +
                               long_desc + self.long_desc)
 
-    def _check_dep3(self):
+    def _check_dep3(self, header):
         """
         Read DEP3 patch information into a structured form
+
+        @param header: the patch header
+        @type header: C{bytes}
         """
-        if not os.path.exists(self.path):
+        if header is None:
             return
 
         # patch_header logic from quilt plus any line starting with ---
@@ -285,7 +320,7 @@ class Dep3Patch(Patch):
         # header and diff stat
         headers = collections.OrderedDict()
         current = 'long_desc'
-        with open(self.path, errors='replace') as file:
+        with io.TextIOWrapper(io.BytesIO(header), errors='replace') as file:
             for line in file:
                 if VALID_DEP3_ENDS.search(line):
                     break
@@ -325,8 +360,29 @@ class PatchSeries(list):
 
         queue = cls._read_series(s, patch_dir)
         s.close()
+        cls._read_headers(queue)
         return queue
 
+    @staticmethod
+    def _read_headers(queue):
+        """
+        Parse the headers of all patches in I{queue} concurrently so
+        reading them doesn't slow down applying a long series. Errors
+        are reported once a patch gets used.
+
+        @param queue: the patches
+        @type queue: L{PatchSeries}
+        """
+        def read(patch):
+            try:
+                patch._read_info()
+            except GbpError:
+                patch.info = patch.long_desc = None
+
+        if queue:
+            with ThreadPoolExecutor(max_workers=min(len(queue), os.cpu_count() or 1)) as pool:
+                list(pool.map(read, queue))
+
     @classmethod
     def _read_series(cls, series, patch_dir):
         """
@@ -14,6 +14,23 @@
 #    You should have received a copy of the GNU General Public License
 #    along with this program; if not, please see
 #    <http://www.gnu.org/licenses/>
+"""Compress archives, possibly using several threads"""
+
+import collections
+import os
+import shutil
+import struct
+import subprocess
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from gbp.errors import GbpError
+from gbp.profiler import PROFILER
+
+
+class CompressorError(GbpError):
+    """Compressing failed"""
+    pass
 
 
 class Compressor(object):
@@ -31,9 +48,26 @@ class Compressor(object):
             'lzma': 'lzma',
             'xz': 'xz'}
 
-    def __init__(self, type_, level=None):
+    # Parallel implementations of compressors that can't use
+    # threads on their own
+    Parallel = {'gzip': 'pigz',
+                'bzip2': 'pbzip2'}
+
+    def __init__(self, type_, level=None, threads=None):
+        """
+        @param type_: the compression type
+        @type type_: C{str}
+        @param level: the compression level, C{None} for the default
+        @type level: C{int}
+        @param threads: number of threads to use, 0 for one per CPU
+        @type threads: C{int}
+        """
         self._type = type_
         self._level = int(level) if level not in [None, ''] else None
+        threads = int(threads) if threads not in [None, ''] else 1
+        if threads == 0:
+            threads = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+        self._threads = max(threads or 1, 1)
 
     def is_known(self):
         return self.type in self.Opts.keys()
@@ -46,6 +80,10 @@ class Compressor(object):
     def level(self):
         return self._level
 
+    @property
+    def threads(self):
+        return self._threads
+
     @property
     def _level_opt(self):
         return '-%d' % self.level if self.level is not None else ''
@@ -54,6 +92,52 @@ class Compressor(object):
     def _more_opts(self):
         return self.Opts.get(self._type, '')
 
+    def _program(self):
+        """
+        The program to compress with, C{None} if we compress in process
+        """
+        if self.threads > 1 and self.type in self.Parallel:
+            if shutil.which(self.Parallel[self.type]):
+                return self.Parallel[self.type]
+            if self.type == 'gzip':
+                return None
+        return self.type
+
+    def _thread_opts(self, program):
+        if self.threads <= 1:
+            return []
+        elif program == 'xz':
+            return ['-T%d' % self.threads]
+        elif program == 'pigz':
+            return ['-p', str(self.threads)]
+        elif program == 'pbzip2':
+            return ['-p%d' % self.threads]
+        return []
+
+    def command(self, stdout=True):
+        """
+        The command to compress with
+
+        >>> Compressor('xz', level=6, threads=4).command()
+        ['xz', '-6', '-T4', '-c']
+        >>> Compressor('gzip').command(stdout=False)
+        ['gzip', '-n']
+
+        @return: the command's arguments or C{None} if there's only an
+            in process implementation
+        @rtype: C{list} of C{str}
+        """
+        program = self._program()
+        if program is None:
+            return None
+        args = [program]
+        if self.level is not None:
+            args.append(self._level_opt)
+        args += self._more_opts.split() + self._thread_opts(program)
+        if stdout:
+            args.append('-c')
+        return args
+
     def cmdline(self, stdout=True):
         """
         >>> Compressor('gzip', level=9).cmdline()
@@ -61,9 +145,27 @@ class Compressor(object):
         >>> Compressor('gzip').cmdline(True)
         'gzip  -n -c'
         """
+        if self.threads > 1 and self._program():
+            return ' '.join(self.command(stdout))
         return "%s %s %s %s" % (self.type, self._level_opt, self._more_opts,
                                 "-c" if stdout else '')
 
+    def open(self, out):
+        """
+        Compress everything written to the returned object into I{out}
+
+        The returned object must be closed (or used as context manager)
+        to finish compression.
+
+        @param out: where to write the compressed data to
+        @type out: binary file object
+        @return: a writable object
+        """
+        cmd = self.command()
+        if cmd is None:
+            return ParallelGzipWriter(out, self.level, self.threads)
+        return ProcessWriter(cmd, out)
+
     def __repr__(self):
         """
         >>> Compressor('gzip').__repr__()
@@ -72,4 +174,160 @@ class Compressor(object):
         "<compressor type='gzip' level=9>"
         """
         level_str = "level=%s" % self.level if self.level is not None else ''
+        if self.threads > 1:
+            level_str += " threads=%d" % self.threads
         return "<compressor type='%s' %s>" % (self.type, level_str)
+
+
+class ProcessWriter(object):
+    """Compress by piping into an external compressor"""
+    def __init__(self, cmd, out):
+        """
+        @param cmd: the compressor's command line
+        @type cmd: C{list} of C{str}
+        @param out: where to write the compressed data to
+        @type out: binary file object
+        """
+        self._cmd = cmd
+        self._start = PROFILER.start()
+        self._written = 0
+        try:
+            self._popen = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=out)
+        except OSError as err:
+            raise CompressorError("Failed to run %s: %s" % (cmd[0], err))
+
+    def write(self, data):
+        try:
+            self._popen.stdin.write(data)
+        except BrokenPipeError:
+            self.close()
+            raise CompressorError("%s terminated early" % self._cmd[0])
+        self._written += len(data)
+        return len(data)
+
+    def close(self, abort=False):
+        """
+        Wait for the compressor to finish
+
+        @param abort: kill the compressor instead
+        @type abort: C{bool}
+        """
+        if self._popen.stdin.closed:
+            return
+        try:
+            self._popen.stdin.close()
+        except BrokenPipeError:
+            pass
+        if abort:
+            self._popen.kill()
+        ret = self._popen.wait()
+        PROFILER.stop(self._start, self._cmd, ret, bytes_in=self._written)
+        if ret and not abort:
+            raise CompressorError("%s failed with exit status %d" % (self._cmd[0], ret))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(abort=exc_type is not None)
+
+
+class ParallelGzipWriter(object):
+    """
+    Compress into gzip format using several threads
+
+    Like I{pigz} the input is split into blocks that get compressed
+    independently, using the end of the preceding block as dictionary.
+    The output hence only depends on the compression level and not on
+    the number of threads. The gzip header matches the one of I{gzip -n}.
+
+    >>> import gzip, io
+    >>> data = b''.join(b'%d\\n' % i for i in range(100000))
+    >>> outs = []
+    >>> for threads in [1, 4]:
+    ...     out = io.BytesIO()
+    ...     with ParallelGzipWriter(out, level=9, threads=threads) as gz:
+    ...         _ = gz.write(data[:1000])
+    ...         _ = gz.write(data[1000:])
+    ...     outs.append(out.getvalue())
+    >>> outs[0] == outs[1]
+    True
+    >>> gzip.decompress(outs[0]) == data
+    True
+    >>> outs[0][:10]
+    b'\\x1f\\x8b\\x08\\x00\\x00\\x00\\x00\\x00\\x02\\x03'
+    """
+    blocksize = 128 * 1024
+    _dictsize = 32 * 1024
+
+    def __init__(self, out, level=None, threads=1):
+        """
+        @param out: where to write the compressed data to
+        @type out: binary file object
+        @param level: the compression level, C{None} for gzip's default
+        @type level: C{int}
+        @param threads: number of threads to use
+        @type threads: C{int}
+        """
+        self._out = out
+        self._level = 6 if level is None else level
+        self._threads = max(threads or 1, 1)
+        self._pool = ThreadPoolExecutor(max_workers=self._threads)
+        self._pending = collections.deque()
+        self._buf = bytearray()
+        self._dict = b''
+        self._crc = 0
+        self._size = 0
+        self._closed = False
+        xfl = {9: 2, 1: 4}.get(self._level, 0)
+        out.write(b'\x1f\x8b\x08\x00\x00\x00\x00\x00' + bytes([xfl, 3]))
+
+    def _compress(self, data, zdict, last):
+        if zdict:
+            comp = zlib.compressobj(self._level, zlib.DEFLATED, -zlib.MAX_WBITS,
+                                    zlib.DEF_MEM_LEVEL, zlib.Z_DEFAULT_STRATEGY, zdict)
+        else:
+            comp = zlib.compressobj(self._level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        return comp.compress(data) + comp.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+    def _submit(self, block, last):
+        self._pending.append(self._pool.submit(self._compress, block, self._dict, last))
+        self._dict = block[-self._dictsize:]
+        # Bound memory use by only keeping a few blocks in flight
+        while len(self._pending) > 2 * self._threads or (last and self._pending):
+            self._out.write(self._pending.popleft().result())
+
+    def write(self, data):
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        self._buf += data
+        # Keep the last block around so it can be finished on close
+        while len(self._buf) > self.blocksize:
+            block = bytes(self._buf[:self.blocksize])
+            del self._buf[:self.blocksize]
+            self._submit(block, False)
+        return len(data)
+
+    def close(self, abort=False):
+        """
+        Write the remaining data and the gzip trailer
+
+        @param abort: just stop compressing
+        @type abort: C{bool}
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if not abort:
+                self._submit(bytes(self._buf), True)
+                self._out.write(struct.pack('<II', self._crc & 0xffffffff,
+                                            self._size & 0xffffffff))
+        finally:
+            self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(abort=exc_type is not None)
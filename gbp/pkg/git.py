@@ -17,13 +17,13 @@
 """A Git Repository that keeps a Distro Package"""
 
 import os
-import pipes
 import shutil
 import tempfile
 
-from gbp.command_wrappers import (CatenateTarArchive, CatenateZipArchive)
+from gbp.command_wrappers import CatenateZipArchive
 from gbp.git import GitRepository, GitRepositoryError
 from gbp.deb.pristinetar import DebianPristineTar
+from gbp.pkg.tarstream import TarConcatenator
 
 
 import gbp.log
@@ -66,11 +66,57 @@ class PkgGitRepository(GitRepository):
         """
         Create a compressed source tree archive with submodules.
 
-        Concatenates the archives generated by git-archive into one and compresses
-        the end result.
+        The tar streams generated by git-archive are concatenated on the fly
+        and fed straight into the compressor.
 
         Exception handling is left to the caller.
         """
+        if format != 'tar':
+            return self._archive_comp_submodules_tmp(treeish, output, prefix, comp, format)
+
+        prefix = self.sanitize_prefix(prefix)
+        archives = [(treeish, prefix, None)]
+        for (subdir, commit) in self.get_submodules(treeish):
+            tarpath = [subdir, subdir[2:]][subdir.startswith("./")]
+            archives.append((commit, '%s%s/' % (prefix, tarpath), subdir))
+
+        def write(out):
+            with TarConcatenator(out) as tar:
+                for commit, tar_prefix, subdir in archives:
+                    if subdir:
+                        gbp.log.debug("Processing submodule %s (%s)" % (subdir, commit[0:8]))
+                    cwd = os.path.join(self.path, subdir) if subdir else None
+                    tar.add(self.archive_stream('tar', tar_prefix, commit, cwd=cwd))
+        self._write_compressed(output, comp, write)
+
+    @staticmethod
+    def _write_compressed(output, comp, write):
+        """
+        Call I{write} with a file object that compresses into I{output}
+
+        I{output} is removed if anything fails. An existing I{output} is
+        replaced rather than overwritten in place since it might be
+        hardlinked elsewhere.
+        """
+        if os.path.lexists(output):
+            os.unlink(output)
+        try:
+            with open(output, 'wb') as out:
+                if comp and comp.type:
+                    with comp.open(out) as compressed:
+                        write(compressed)
+                else:
+                    write(out)
+        except Exception:
+            if os.path.exists(output):
+                os.unlink(output)
+            raise
+
+    def _archive_comp_submodules_tmp(self, treeish, output, prefix, comp, format):
+        """
+        Create a compressed source tree archive with submodules using
+        temporary files for formats we can't concatenate on the fly.
+        """
         prefix = self.sanitize_prefix(prefix)
         tempdir = tempfile.mkdtemp()
         main_archive = os.path.join(tempdir, "main.%s" % format)
@@ -87,10 +133,7 @@ class PkgGitRepository(GitRepository):
                 gbp.log.debug("Processing submodule %s (%s)" % (subdir, commit[0:8]))
                 self.archive(format=format, prefix='%s%s/' % (prefix, tarpath),
                              output=submodule_archive, treeish=commit, cwd=subdir)
-                if format == 'tar':
-                    CatenateTarArchive(main_archive)(submodule_archive)
-                elif format == 'zip':
-                    CatenateZipArchive(main_archive)(submodule_archive)
+                CatenateZipArchive(main_archive)(submodule_archive)
 
             # compress the output
             if comp and comp.type:
@@ -107,16 +150,12 @@ class PkgGitRepository(GitRepository):
     def _archive_comp_single(self, treeish, output, prefix, comp, format='tar'):
         """
         Create a compressed source tree archive without submodules
-
-        We have this as a special case since it avoids a temporary file
         """
         prefix = self.sanitize_prefix(prefix)
-        pipe = pipes.Template()
-        pipe.prepend("git archive --format=%s --prefix=%s %s" % (format, prefix, treeish), '.-')
-        if comp and comp.type:
-            pipe.append(comp.cmdline(), '--')
-        ret = pipe.copy('', output)
-        if ret:
-            raise GitRepositoryError("Error creating %s: %d" % (output, ret))
+
+        def write(out):
+            for chunk in self.archive_stream(format, prefix, treeish):
+                out.write(chunk)
+        self._write_compressed(output, comp, write)
 
 # vim:et:ts=4:sw=4:et:sts=4:ai:set list listchars=tab\:»·,trail\:·:
@@ -16,10 +16,301 @@
 #    <http://www.gnu.org/licenses/>
 """Handle checkin and checkout of archives from the pristine-tar branch"""
 
+import hashlib
+import json
 import re
 import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import gbp.log
 from gbp.command_wrappers import Command
+from gbp.git import GitRepositoryError
+from gbp.pkg.archive import Archive
+from gbp.probe_cache import probe
+
+
+def bre_to_re(regexp):
+    r"""
+    Convert a POSIX basic regular expression (as used by I{git log
+    --grep}) to a Python one
+
+    >>> bre_to_re(r'foo_1\.0\.orig\.tar\.\w\+')
+    'foo_1\\.0\\.orig\\.tar\\.\\w+'
+    >>> bre_to_re('libfoo++_1.0')
+    'libfoo\\+\\+_1.0'
+    """
+    special = '+?|(){}'
+    out = []
+    pos = 0
+    while pos < len(regexp):
+        char = regexp[pos]
+        if char == '\\' and pos + 1 < len(regexp):
+            nxt = regexp[pos + 1]
+            out.append(nxt if nxt in special else char + nxt)
+            pos += 2
+            continue
+        out.append('\\' + char if char in special else char)
+        pos += 1
+    return ''.join(out)
+
+
+def bre_escape(name):
+    r"""
+    Escape I{name} for use in a POSIX basic regular expression
+
+    >>> bre_escape('foo_1.0.orig.tar.gz')
+    'foo_1\\.0\\.orig\\.tar\\.gz'
+    >>> bre_escape('libfoo++_1.0~rc1')
+    'libfoo++_1\\.0~rc1'
+    """
+    return re.sub(r'([\\.\[\]*^$])', r'\\\1', name)
+
+
+def _store_json(filename, data):
+    """
+    Atomically replace I{filename} by I{data} using a temporary file of
+    its own so concurrent writers don't clobber each other
+
+    @raises OSError: if the file can't be written
+    """
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(filename))
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, filename)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class PristineTarIndex(object):
+    """
+    An index of the commits on a pristine-tar branch
+
+    Looking up tarballs by grepping the branch's log gets slow with many
+    upstream releases so we keep the message, the changed files and the
+    compression of each commit in a file below the git dir. The index is
+    updated incrementally from the last commit indexed when the branch
+    moves ahead and rebuilt if it got rewritten.
+    """
+    version = 1
+
+    def __init__(self, repo, branch):
+        """
+        @param repo: the git repository
+        @type repo: L{GitRepository}
+        @param branch: the pristine-tar branch
+        @type branch: C{str}
+        """
+        self.repo = repo
+        self.branch = branch
+        self.filename = os.path.join(repo.git_dir, 'gbp-pristine-tar',
+                                     '%s.json' % branch.replace('/', '_'))
+        self._head = None
+        self._entries = []
+
+    def _load(self):
+        try:
+            with open(self.filename) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == self.version and data.get('branch') == self.branch:
+            self._head, self._entries = data['head'], data['entries']
+
+    def _save(self):
+        data = {'version': self.version,
+                'branch': self.branch,
+                'head': self._head,
+                'entries': self._entries}
+        try:
+            _store_json(self.filename, data)
+        except OSError as err:
+            gbp.log.debug("Can't store pristine-tar index: %s" % err)
+
+    def _read_commits(self, revs):
+        """Message, files and compression of the non merge commits in I{revs}"""
+        args = ['--no-merges', '--reverse', '--name-only', '--no-show-signature',
+                '--format=%x00%H%x00%B%x00'] + revs + ['--']
+        out, err, ret = self.repo._git_inout('log', args, capture_stderr=True,
+                                             config_args=['core.quotepath=off'])
+        if ret:
+            raise GitRepositoryError("Error indexing %s: %s" % (self.branch, err.decode().strip()))
+        fields = out.decode('utf-8', 'replace').split('\0')[1:]
+        entries = []
+        for commit, msg, files in zip(fields[0::3], fields[1::3], fields[2::3]):
+            subject = msg.split('\n', 1)[0]
+            entries.append({'commit': commit,
+                            'message': msg.rstrip('\n'),
+                            'files': files.split(),
+                            'compression': Archive.parse_filename(subject)[2]})
+        return entries
+
+    def _extends(self, head):
+        """Whether I{head} descends from the last indexed commit"""
+        if not self._head:
+            return False
+        try:
+            return self.repo.get_merge_base(self._head, head) == self._head
+        except GitRepositoryError:
+            return False
+
+    def update(self):
+        """
+        Bring the index up to date with the branch
+
+        @return: C{False} if the branch doesn't exist
+        @rtype: C{bool}
+        """
+        try:
+            head = self.repo.rev_parse('%s^{commit}' % self.branch)
+        except GitRepositoryError:
+            self._head, self._entries = None, []
+            return False
+        if self._head is None:
+            self._load()
+        if head == self._head:
+            return True
+
+        if self._extends(head):
+            gbp.log.debug("Updating pristine-tar index from %s" % self._head)
+            self._entries += self._read_commits(['%s..%s' % (self._head, head)])
+        else:
+            gbp.log.debug("Creating pristine-tar index of %s" % self.branch)
+            self._entries = self._read_commits([head])
+        self._head = head
+        self._save()
+        return True
+
+    def find(self, regexp):
+        """
+        Find the newest commit whose message matches I{regexp}
+
+        @param regexp: the regular expression to match as understood by
+            I{git log --grep}
+        @type regexp: C{str}
+        @return: the entry of the commit or C{None}
+        @rtype: C{dict}
+        """
+        if not self.update():
+            return None
+        cregex = re.compile(bre_to_re(regexp))
+        for entry in reversed(self._entries):
+            if any(cregex.search(line) for line in entry['message'].split('\n')):
+                return entry
+        return None
+
+    @property
+    def newest(self):
+        """The entry of the branch's newest commit (if indexed)"""
+        if self.update() and self._entries:
+            return self._entries[-1]
+        return None
+
+
+class PristineTarManifest(object):
+    """
+    Checksums of tarballs generated or verified by pristine-tar
+
+    I{pristine-tar verify} regenerates a tarball from its delta to compare
+    it with the file at hand which is expensive for large tarballs. Once a
+    tarball was generated or verified we record its checksum, size and the
+    pristine-tar commit it stems from so later verifications only need to
+    hash the file. Entries are considered stale when the pristine-tar
+    commit of the tarball changes.
+    """
+    version = 1
+    # Parallel tarball creation uses separate repository objects, the lock
+    # keeps their updates of the manifest from getting lost
+    _lock = threading.Lock()
+
+    def __init__(self, repo):
+        """
+        @param repo: the git repository
+        @type repo: L{GitRepository}
+        """
+        self.filename = os.path.join(repo.git_dir, 'gbp-pristine-tar',
+                                     'manifest.json')
+
+    @staticmethod
+    def checksum(path):
+        """
+        The SHA-256 checksum of the file at I{path}
+
+        @rtype: C{str}
+        """
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    def _load(self):
+        try:
+            with open(self.filename) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != self.version:
+            return {}
+        return data['tarballs']
+
+    def record(self, path, commit):
+        """
+        Record the checksum of the tarball at I{path}
+
+        @param path: the generated or verified tarball
+        @type path: C{str}
+        @param commit: the pristine-tar commit of the tarball
+        @type commit: C{str}
+        """
+        try:
+            entry = {'sha256': self.checksum(path),
+                     'size': os.path.getsize(path),
+                     'commit': commit}
+            with self._lock:
+                tarballs = self._load()
+                tarballs[os.path.basename(path)] = entry
+                _store_json(self.filename, {'version': self.version, 'tarballs': tarballs})
+        except OSError as err:
+            gbp.log.debug("Can't record checksum of %s: %s" % (path, err))
+
+    def matches(self, paths, commits):
+        """
+        Check tarballs against the manifest
+
+        The files are hashed concurrently.
+
+        @param paths: the tarballs to check
+        @type paths: C{list} of C{str}
+        @param commits: the current pristine-tar commit of each tarball
+        @type commits: C{list} of C{str}
+        @return: whether each tarball matches its recorded checksum
+        @rtype: C{list} of C{bool}
+        """
+        tarballs = self._load()
+
+        def match(path, commit):
+            entry = tarballs.get(os.path.basename(path))
+            if not entry or not commit or entry['commit'] != commit:
+                return False
+            try:
+                if os.path.getsize(path) != entry['size']:
+                    return False
+                return self.checksum(path) == entry['sha256']
+            except OSError:
+                return False
+
+        if len(paths) <= 1:
+            return [match(path, commit) for path, commit in zip(paths, commits)]
+        with ThreadPoolExecutor(max_workers=len(paths)) as pool:
+            return list(pool.map(match, paths, commits))
 
 
 class PristineTar(Command):
@@ -28,10 +319,31 @@ class PristineTar(Command):
 
     def __init__(self, repo):
         self.repo = repo
+        self._indexes = {}
+        self.manifest = PristineTarManifest(repo)
         super(PristineTar, self).__init__('pristine-tar',
                                           cwd=repo.path,
                                           capture_stderr=True)
 
+    def index(self, branch=None):
+        """
+        The index of the pristine-tar branch I{branch}
+
+        @param branch: the branch to index, defaults to the local
+            pristine-tar branch
+        @type branch: C{str}
+        @rtype: L{PristineTarIndex}
+        """
+        branch = branch or self.branch
+        if branch not in self._indexes:
+            self._indexes[branch] = PristineTarIndex(self.repo, branch)
+        return self._indexes[branch]
+
+    def _help(self):
+        """The usage message of pristine-tar"""
+        self.call(['--help'], quiet=True)  # There's no --help so we always exit 1
+        return self.stderr
+
     def _has_in_output(self, match):
         """
         Check if pristine_tar has a certain feature enabled.
@@ -41,9 +353,8 @@ class PristineTar(Command):
         @return: True if feature is supported
         @rtype: C{bool}
         """
-        self.call(['--help'], quiet=True)  # There's no --help so we always exit 1
         r = re.compile(match)
-        for line in self.stderr.splitlines():
+        for line in probe('pristine-tar', ['--help'], self._help).splitlines():
             if r.match(line):
                 return True
         return False
@@ -65,18 +376,6 @@ class PristineTar(Command):
         """
         return True if self.get_commit(archive_regexp)[0] else False
 
-    def _commit_contains_file(self, commit, regexp):
-        """Does the given commit contain a file with the given regex"""
-        files = self.repo.get_commit_info(commit)['files']
-        # CPython wants '+' (which is valid in source package names)
-        # escaped but git-grep doesn't so we do it that late:
-        cregex = re.compile(regexp.replace('+', '\\+'))
-        for _, v in files.items():
-            for f in v:
-                if cregex.match(f.decode()):
-                    return True
-        return False
-
     def get_commit(self, archive_regexp):
         """
         Get the pristine-tar commit of a package matching I{archive_regexp}.
@@ -91,13 +390,18 @@ class PristineTar(Command):
             return None, False
 
         regex = ('pristine-tar .* %s' % archive_regexp)
-        commits = self.repo.grep_log(regex, self.branch, merges=False)
-        if commits:
-            commit = commits[-1]
+        entry = self.index().find(regex)
+        if entry:
+            commit = entry['commit']
             gbp.log.debug("Found pristine-tar commit at '%s'" % commit)
-            return commit, self._commit_contains_file(commit, '%s.asc' % archive_regexp)
+            cregex = re.compile(bre_to_re('%s.asc' % archive_regexp))
+            return commit, any(cregex.match(f) for f in entry['files'])
         return None, False
 
+    def _archive_commit(self, archive):
+        """The pristine-tar commit of the tarball at I{archive}"""
+        return self.get_commit(bre_escape(os.path.basename(archive)))[0]
+
     def checkout(self, archive, quiet=False, signaturefile=None):
         """
         Checkout an orig archive from pristine-tar branch
@@ -110,6 +414,9 @@ class PristineTar(Command):
         if signaturefile and self.has_feature_sig():
             args += ['-s', signaturefile]
         self.__call__(args, quiet=quiet)
+        commit = self._archive_commit(archive)
+        if commit:
+            self.manifest.record(archive, commit)
 
     def commit(self, archive, upstream, quiet=False, signaturefile=None):
         """
@@ -133,3 +440,24 @@ class PristineTar(Command):
 
         self.run_error = 'Pristine-tar couldn\'t verify "%s": {stderr_or_reason}' % os.path.basename(archive)
         self.__call__(['verify', archive], quiet=quiet)
+        commit = self._archive_commit(archive)
+        if commit:
+            self.manifest.record(archive, commit)
+
+    def unverified(self, archives):
+        """
+        Filter out the archives whose checksum matches the one recorded
+        when they were last generated or verified from the same
+        pristine-tar commit
+
+        @param archives: the archives to check
+        @type archives: C{list} of C{str}
+        @return: the archives that still need to be verified
+        @rtype: C{list} of C{str}
+        """
+        commits = [self._archive_commit(archive) for archive in archives]
+        matches = self.manifest.matches(archives, commits)
+        for archive, match in zip(archives, matches):
+            if match:
+                gbp.log.debug("Checksum of %s matches pristine-tar manifest" % archive)
+        return [archive for archive, match in zip(archives, matches) if not match]
@@ -0,0 +1,278 @@
+# vim: set fileencoding=utf-8 :
+#
+# (C) 2026 The git-buildpackage developers
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, please see
+#    <http://www.gnu.org/licenses/>
+"""Cache generated upstream tarballs"""
+
+import errno
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import gbp.log
+from gbp.errors import GbpError
+
+# ioctl to share a file's extents on copy on write file systems
+FICLONE = 0x40049409
+
+
+def parse_size(size):
+    """
+    Parse a size with an optional binary unit suffix
+
+    >>> parse_size('512')
+    512
+    >>> parse_size('2k')
+    2048
+    >>> parse_size('1.5G')
+    1610612736
+    >>> parse_size('lots')
+    Traceback (most recent call last):
+    ...
+    gbp.errors.GbpError: Invalid size 'lots'
+    """
+    units = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+    value = str(size).strip().upper()
+    unit = value[-1:] if value[-1:] in units else ''
+    try:
+        return int(float(value[:len(value) - len(unit)]) * units[unit])
+    except ValueError:
+        raise GbpError("Invalid size '%s'" % size)
+
+
+def clone_file(src, dst, hardlink=True):
+    """
+    Make I{dst} have the same content as I{src} as cheaply as possible
+
+    Tries a reflink first, then (if allowed) a hardlink and copies the
+    data as a last resort.
+    """
+    try:
+        with open(src, 'rb') as s, open(dst, 'wb') as d:
+            import fcntl
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return 'reflink'
+    except (OSError, ImportError):
+        if os.path.exists(dst):
+            os.unlink(dst)
+    if hardlink:
+        try:
+            os.link(src, dst)
+            return 'hardlink'
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+    return 'copy'
+
+
+class TarballCache(object):
+    """
+    A content addressed store of generated upstream tarballs
+
+    Tarballs are indexed by everything that determines their content: the
+    tree and submodule commits they're generated from, the prefix, the
+    compressor and the archive format. Entries live below
+    I{$XDG_CACHE_HOME/git-buildpackage/tarballs} and the least recently
+    used ones are evicted once the cache grows beyond I{max_size}.
+    """
+    version = 1
+    _lock = threading.Lock()
+
+    def __init__(self, max_size, cache_dir=None):
+        """
+        @param max_size: maximum size of all entries in bytes
+        @type max_size: C{int}
+        @param cache_dir: where to store the tarballs
+        @type cache_dir: C{str}
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                                     os.path.expanduser('~/.cache'),
+                                     'git-buildpackage', 'tarballs')
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        self.stats_file = os.path.join(cache_dir, 'stats.json')
+        self.max_size = max_size
+
+    @classmethod
+    def key(cls, treeish, submodules, prefix, comp, format='tar'):
+        """
+        Compute the key of a tarball
+
+        >>> from gbp.pkg.compressor import Compressor
+        >>> k = TarballCache.key('a' * 40, [], 'foo-1.0', Compressor('gzip', '9'))
+        >>> k == TarballCache.key('a' * 40, [], 'foo-1.0', Compressor('gzip', '9'))
+        True
+        >>> k == TarballCache.key('a' * 40, [], 'foo-1.0', Compressor('gzip', '6'))
+        False
+
+        @param treeish: sha1 of the commit or tree to archive
+        @type treeish: C{str}
+        @param submodules: path and commit of all submodules to include
+        @type submodules: C{list} of C{tuple}
+        @param prefix: prefix of the archive members
+        @type prefix: C{str}
+        @param comp: compressor
+        @type comp: L{Compressor}
+        @param format: archive format
+        @type format: C{str}
+        @rtype: C{str}
+        """
+        data = json.dumps([cls.version, treeish, sorted(submodules), prefix, format,
+                           comp.type, comp.level, comp.threads > 1, comp.command()])
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.objects_dir, key)
+
+    def fetch(self, key, output):
+        """
+        Materialize a cached tarball
+
+        @param key: the tarball's key
+        @type key: C{str}
+        @param output: where to put the tarball
+        @type output: C{str}
+        @return: whether the tarball was found
+        @rtype: C{bool}
+        """
+        path = self._path(key)
+        if os.path.lexists(output):
+            os.unlink(output)
+        try:
+            how = clone_file(path, output)
+            # Mark as recently used
+            os.utime(path)
+        except OSError:
+            # Not there or evicted concurrently
+            if os.path.exists(output):
+                os.unlink(output)
+            self._count('misses')
+            return False
+        self._count('hits')
+        gbp.log.debug("Using cached tarball %s for %s (%s)" % (path, output, how))
+        return True
+
+    def store(self, key, output):
+        """
+        Add a tarball to the cache
+
+        Entries are never hardlinked to I{output} so modifying it can't
+        corrupt the cache. Failing to store is not an error.
+
+        @param key: the tarball's key
+        @type key: C{str}
+        @param output: the tarball to add
+        @type output: C{str}
+        """
+        tmp = None
+        try:
+            os.makedirs(self.objects_dir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix='.tmp', dir=self.objects_dir)
+            os.close(fd)
+            clone_file(output, tmp, hardlink=False)
+            os.replace(tmp, self._path(key))
+            tmp = None
+            self.evict()
+        except OSError as err:
+            gbp.log.debug("Failed to cache %s: %s" % (output, err))
+        finally:
+            if tmp:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+
+    def entries(self):
+        """
+        All cache entries, least recently used first
+
+        @return: path, size and last use of each entry
+        @rtype: C{list} of C{tuple}
+        """
+        entries = []
+        try:
+            names = os.listdir(self.objects_dir)
+        except OSError:
+            return entries
+        for name in names:
+            if name.startswith('.'):
+                continue
+            path = os.path.join(self.objects_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, st.st_size, st.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self):
+        """Remove the least recently used entries until we fit I{max_size}"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except OSError as err:
+                if err.errno != errno.ENOENT:
+                    continue
+            gbp.log.debug("Evicted %s from tarball cache" % path)
+            total -= size
+
+    def _read_stats(self):
+        try:
+            with open(self.stats_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _count(self, what):
+        with self._lock:
+            stats = self._read_stats()
+            stats[what] = stats.get(what, 0) + 1
+            tmp = None
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(prefix='.tmp', dir=self.cache_dir)
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(stats, f)
+                os.replace(tmp, self.stats_file)
+            except OSError:
+                if tmp:
+                    try:
+                        os.unlink(tmp)
+                    except OSError:
+                        pass
+
+    def stats(self):
+        """
+        Usage statistics
+
+        @return: number of entries, their total size, the maximum size and
+            the number of hits and misses
+        @rtype: C{dict}
+        """
+        entries = self.entries()
+        counts = self._read_stats()
+        return {'entries': len(entries),
+                'size': sum(size for _, size, _ in entries),
+                'max_size': self.max_size,
+                'hits': counts.get('hits', 0),
+                'misses': counts.get('misses', 0)}
@@ -0,0 +1,284 @@
+# vim: set fileencoding=utf-8 :
+#
+# (C) 2026 The git-buildpackage developers
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, please see
+#    <http://www.gnu.org/licenses/>
+"""Import tarballs into git without unpacking them"""
+
+import fnmatch
+import io
+import os
+import re
+import tarfile
+import tempfile
+
+import gbp.log
+from gbp.errors import GbpError
+from gbp.git.fastimport import FastImport
+
+
+class TarImportError(GbpError):
+    """The tarball can't be imported without unpacking it"""
+    pass
+
+
+def tar_excluded(name, filters):
+    """
+    Check if I{name} is excluded by I{filters} using the semantics of
+    GNU tar's I{--exclude}: patterns aren't anchored, wildcards match
+    '/' and excluding a directory excludes everything below it. I{name}
+    is the member name as stored in the archive so a leading I{./} has
+    to match just like with tar.
+
+    >>> tar_excluded('foo-1.0/debian/control', ['debian'])
+    True
+    >>> tar_excluded('foo-1.0/src/debian.c', ['debian'])
+    False
+    >>> tar_excluded('foo-1.0/src/a.pyc', ['*.pyc'])
+    True
+    >>> tar_excluded('foo-1.0/doc/html/index.html', ['doc/html'])
+    True
+    >>> tar_excluded('foo-1.0/doc/html/index.html', ['foo-1.0/*/index.html'])
+    True
+    >>> tar_excluded('foo-1.0/doc/html/index.html', ['html/index'])
+    False
+    >>> tar_excluded('foo-1.0/README', [])
+    False
+    >>> tar_excluded('./foo-1.0/a.pyc', ['./foo-1.0/a.pyc'])
+    True
+    >>> tar_excluded('./foo-1.0/a.pyc', ['foo-1.0/a.pyc'])
+    True
+    >>> tar_excluded('foo-1.0/a.pyc', ['./foo-1.0/a.pyc'])
+    False
+    """
+    return tar_exclude_matcher(filters)(name)
+
+
+def tar_exclude_matcher(filters):
+    """
+    Compile I{filters} once into a function checking names like
+    L{tar_excluded} does
+
+    >>> excluded = tar_exclude_matcher(['*.pyc', 'debian'])
+    >>> excluded('foo-1.0/debian/rules'), excluded('foo-1.0/setup.py')
+    (True, False)
+
+    @param filters: the exclude patterns
+    @type filters: C{list} of C{str}
+    @rtype: C{callable}
+    """
+    if not filters:
+        return lambda name: False
+    regex = re.compile('|'.join('(?:%s)' % fnmatch.translate(pattern)
+                                for pattern in filters))
+
+    def excluded(name):
+        parts = name.split('/')
+        for start in range(len(parts)):
+            for end in range(start + 1, len(parts) + 1):
+                if regex.match('/'.join(parts[start:end])):
+                    return True
+        return False
+    return excluded
+
+
+class TarImporter(object):
+    """
+    Stream the members of one or more tarballs into git via
+    I{git fast-import} and build a tree from them without ever writing
+    the files to disk.
+
+    The resulting tree matches what unpacking the tarballs with
+    L{gbp.pkg.UpstreamSource.unpack} and adding the unpacked tree would
+    give. Archives that need special treatment when unpacking (e.g. device
+    nodes, unsafe paths or unsupported compression) raise
+    L{TarImportError} so the caller can fall back to unpacking.
+    """
+
+    def __init__(self, repo):
+        """
+        @param repo: the repository to import into
+        @type repo: L{GitRepository}
+        """
+        self._repo = repo
+        self._marks_file = None
+        self._fastimport = None
+        self._entries = {}
+        # mark of inline content like symlink targets
+        self._blobs = {}
+
+    def _start(self):
+        if self._fastimport is None:
+            fd, self._marks_file = tempfile.mkstemp(prefix='gbp_marks_', dir=self._repo.git_dir)
+            os.close(fd)
+            self._fastimport = FastImport(self._repo, export_marks=self._marks_file)
+
+    def _blob(self, data):
+        """Add a blob from memory"""
+        if data not in self._blobs:
+            self._blobs[data] = self._fastimport.add_blob(io.BytesIO(data), len(data))
+        return self._blobs[data]
+
+    @staticmethod
+    def _name(member):
+        name = member.name
+        while name.startswith('./'):
+            name = name[2:]
+        # The archive's root directory as created by 'tar c .'
+        if name in ('', '.') and member.isdir():
+            return None
+        name = name.rstrip('/')
+        # Leave git metadata and unsafe paths to the unpack code path
+        if (not name or name.startswith('/') or
+                '..' in name.split('/') or '.git' in name.split('/')):
+            raise TarImportError("Unsupported member '%s'" % member.name)
+        return name
+
+    def _read(self, path, filters):
+        """
+        Read all members from tarball at I{path}
+
+        @return: the files by name and all top level names
+        @rtype: C{tuple} of C{dict} and C{dict}
+        """
+        files = {}
+        toplevel = {}
+        excluded = tar_exclude_matcher(filters)
+        try:
+            with tarfile.open(path, mode='r|*') as tar:
+                for member in tar:
+                    name = self._name(member)
+                    if name is None or excluded(member.name.rstrip('/')):
+                        continue
+
+                    top = name.split('/')[0]
+                    if top != name or member.isdir():
+                        toplevel[top] = 'dir'
+                    else:
+                        toplevel.setdefault(top, 'symlink' if member.issym() else 'file')
+
+                    if member.isdir():
+                        continue
+                    elif member.isreg():
+                        mode = '100755' if member.mode & 0o100 else '100644'
+                        mark = self._fastimport.add_blob(tar.extractfile(member), member.size)
+                        files[name] = (mode, mark)
+                    elif member.issym():
+                        files[name] = ('120000', self._blob(os.fsencode(member.linkname)))
+                    elif member.islnk():
+                        target = files.get(self._name(tarfile.TarInfo(member.linkname)))
+                        if target is None:
+                            raise TarImportError("Hard link '%s' points to missing '%s'" %
+                                                 (member.name, member.linkname))
+                        files[name] = target
+                    else:
+                        raise TarImportError("Unsupported type of member '%s'" % member.name)
+        except (tarfile.TarError, EOFError, OSError) as err:
+            raise TarImportError("Can't read '%s': %s" % (path, err))
+        return files, toplevel
+
+    def add_tarball(self, path, filters=None, subdir=None):
+        """
+        Add the contents of a tarball
+
+        A single toplevel directory is stripped like when unpacking.
+
+        @param path: the tarball
+        @type path: C{str}
+        @param filters: patterns of files to leave out
+        @type filters: C{list} of C{str}
+        @param subdir: put the contents into this directory, replacing
+            everything that was there before
+        @type subdir: C{str}
+        """
+        self._start()
+        files, toplevel = self._read(path, filters or [])
+
+        if len(toplevel) == 1:
+            top, kind = list(toplevel.items())[0]
+            if kind == 'symlink':
+                raise TarImportError("Toplevel of '%s' is a symlink" % path)
+            if kind == 'dir':
+                files = dict((name[len(top) + 1:], entry) for name, entry in files.items())
+        if subdir:
+            prefix = subdir + '/'
+            self._entries = dict((name, entry) for name, entry in self._entries.items()
+                                 if name != subdir and not name.startswith(prefix))
+            files = dict((prefix + name, entry) for name, entry in files.items())
+        self._entries.update(files)
+        gbp.log.debug("Streamed %d files from '%s'" % (len(files), path))
+
+    def _check_paths(self):
+        dirs = set()
+        for name in self._entries:
+            parts = name.split('/')
+            for i in range(1, len(parts)):
+                dirs.add('/'.join(parts[:i]))
+        for name in self._entries:
+            if name in dirs:
+                raise TarImportError("'%s' is both a file and a directory" % name)
+
+    def write_tree(self):
+        """
+        Write the tree of all added tarballs
+
+        @return: the tree's sha1
+        @rtype: C{str}
+        """
+        self._check_paths()
+        marks = self._finish()
+        entries = [(mode, marks[mark], name) for name, (mode, mark)
+                   in self._entries.items()]
+        index_file = os.path.join(self._repo.git_dir, 'gbp_index')
+        try:
+            os.unlink(index_file)
+        except OSError:
+            pass
+        self._repo.add_index_entries(entries, index_file)
+        return self._repo.write_tree(index_file)
+
+    def _finish(self):
+        """Terminate fast-import and return the marks it wrote"""
+        if self._fastimport is None:
+            return {}
+        fastimport, self._fastimport = self._fastimport, None
+        try:
+            if fastimport.close():
+                raise GbpError("git fast-import failed")
+            return FastImport.read_marks(self._marks_file)
+        finally:
+            self._cleanup()
+
+    def _cleanup(self):
+        if self._marks_file:
+            try:
+                os.unlink(self._marks_file)
+            except OSError:
+                pass
+            self._marks_file = None
+
+    def close(self):
+        """
+        Abort the import if L{write_tree} wasn't called yet
+        """
+        if self._fastimport is not None:
+            self._fastimport.close()
+            self._fastimport = None
+        self._cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,275 @@
+# vim: set fileencoding=utf-8 :
+#
+# (C) 2026 The git-buildpackage developers
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, please see
+#    <http://www.gnu.org/licenses/>
+"""Concatenate and filter tar archives while they're being read"""
+
+import os
+
+from gbp.errors import GbpError
+
+BLOCKSIZE = 512
+# Entry types that never have any data following their header
+_no_data_types = b'123456'
+# Entry types that extend the header of the following member
+_extension_types = b'xLK'
+
+
+class TarStreamError(GbpError):
+    """The tar stream is corrupt or truncated"""
+    pass
+
+
+class _BlockReader(object):
+    """Read exact amounts of data from an iterable of byte chunks"""
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buf = b''
+        self._pos = 0
+
+    def read(self, size):
+        """Read up to I{size} bytes, less only at the end of the stream"""
+        if len(self._buf) - self._pos < size:
+            parts = [self._buf[self._pos:]]
+            have = len(parts[0])
+            for chunk in self._chunks:
+                parts.append(chunk)
+                have += len(chunk)
+                if have >= size:
+                    break
+            self._buf = b''.join(parts)
+            self._pos = 0
+        data = self._buf[self._pos:self._pos + size]
+        self._pos += len(data)
+        return data
+
+    def skip(self, size):
+        """Skip I{size} bytes"""
+        while size:
+            data = self.read(min(size, 65536))
+            if not data:
+                raise TarStreamError("Unexpected end of tar stream")
+            size -= len(data)
+
+    def drain(self):
+        """Consume the rest of the stream"""
+        self._buf = b''
+        self._pos = 0
+        for _ in self._chunks:
+            pass
+
+
+def _parse_number(field):
+    """
+    Parse a numeric tar header field
+
+    >>> _parse_number(b'00000001750\\0')
+    1000
+    >>> _parse_number(b'\\x80' + (2 ** 34).to_bytes(11, 'big'))
+    17179869184
+    """
+    if field[0] & 0x80:
+        return int.from_bytes(field[1:], 'big')
+    field = field.split(b'\0', 1)[0].strip()
+    try:
+        return int(field, 8) if field else 0
+    except ValueError:
+        raise TarStreamError("Invalid number in tar header: %r" % field)
+
+
+def _pax_records(data):
+    """
+    Get the records of a pax extended header
+
+    >>> _pax_records(b'30 mtime=1500000000.123456789\\n18 size=123456789\\n')[b'size']
+    b'123456789'
+    >>> _pax_records(b'20 path=foo/bar.txt\\n')
+    {b'path': b'foo/bar.txt'}
+    """
+    records = {}
+    pos = 0
+    while pos < len(data):
+        length, _, rest = data[pos:].partition(b' ')
+        if not length.isdigit() or int(length) == 0:
+            break
+        record = rest[:int(length) - len(length) - 2]
+        key, _, value = record.partition(b'=')
+        records[key] = value
+        pos += int(length)
+    return records
+
+
+def _member_name(header):
+    """
+    The name of a member as stored in its (ustar or GNU) header
+
+    >>> _member_name(b'b.c'.ljust(257, b'\\0') + b'ustar\\x0000'.ljust(88, b'\\0') + b'a'.ljust(167, b'\\0'))
+    b'a/b.c'
+    """
+    name = header[:100].split(b'\0', 1)[0]
+    if header[257:263] == b'ustar\0':
+        prefix = header[345:500].split(b'\0', 1)[0]
+        if prefix:
+            name = prefix + b'/' + name
+    return name
+
+
+def _normalize(name):
+    """
+    Strip leading I{./} and trailing slashes from a member name
+
+    >>> _normalize(b'./foo-1.0/debian/')
+    'foo-1.0/debian'
+    """
+    name = os.fsdecode(name)
+    while name.startswith('./'):
+        name = name[2:]
+    return name.rstrip('/')
+
+
+def _check_header(header):
+    stored = _parse_number(header[148:156])
+    actual = sum(header[:148]) + 8 * ord(' ') + sum(header[156:])
+    if stored != actual:
+        raise TarStreamError("Invalid tar header checksum")
+
+
+class TarConcatenator(object):
+    """
+    Write the members of several tar streams into a single archive
+
+    This gives the same result as appending the archives with
+    I{tar --concatenate} but works on the archives' data as it's being
+    generated (e.g. by I{git archive}) and only keeps a few blocks in
+    memory. The end of archive markers of the individual streams are
+    dropped and a single one is written on L{close}.
+
+    Members can be left out by passing an I{exclude} function. Headers
+    of the members written are copied verbatim so the result is what
+    deleting the members with I{tar --delete} would give.
+    """
+    def __init__(self, out, record_size=20 * BLOCKSIZE, bufsize=65536, exclude=None):
+        """
+        @param out: where to write the archive to
+        @type out: binary file like object
+        @param record_size: the final archive is padded to a multiple of this
+        @type record_size: C{int}
+        @param bufsize: amount of member data to copy at once
+        @type bufsize: C{int}
+        @param exclude: called with each member's name as stored in the
+            archive (without trailing slashes), members it returns C{True}
+            for are left out
+        @type exclude: C{callable}
+        """
+        self._out = out
+        self._record_size = record_size
+        self._bufsize = bufsize
+        self._exclude = exclude
+        self._excluded = set()
+        self.written = 0
+
+    def _write(self, data):
+        self._out.write(data)
+        self.written += len(data)
+
+    def _copy(self, reader, size):
+        while size:
+            data = reader.read(min(size, self._bufsize))
+            if not data:
+                raise TarStreamError("Unexpected end of tar stream")
+            self._write(data)
+            size -= len(data)
+
+    def add(self, chunks):
+        """
+        Append all members of a tar stream
+
+        @param chunks: the tar archive's data
+        @type chunks: iterable of C{bytes}
+        """
+        reader = _BlockReader(chunks)
+        # Extension headers and what they say about the next member
+        extensions = []
+        ext = {}
+        while True:
+            header = reader.read(BLOCKSIZE)
+            if len(header) < BLOCKSIZE:
+                raise TarStreamError("Unexpected end of tar stream")
+            if not any(header):
+                # End of archive, discard the marker and any padding
+                reader.drain()
+                break
+            _check_header(header)
+
+            typeflag = header[156:157]
+            size = _parse_number(header[124:136]) if 'size' not in ext else ext['size']
+            if typeflag and typeflag in _no_data_types:
+                size = 0
+            padded = -(-size // BLOCKSIZE) * BLOCKSIZE
+
+            if typeflag and typeflag in _extension_types:
+                data = reader.read(padded)
+                if len(data) < padded:
+                    raise TarStreamError("Unexpected end of tar stream")
+                if typeflag == b'x':
+                    # A pax header can override size, name and link
+                    # target of the next member
+                    records = _pax_records(data[:size])
+                    if b'size' in records:
+                        ext['size'] = int(records[b'size'])
+                    if b'path' in records:
+                        ext['name'] = records[b'path']
+                    if b'linkpath' in records:
+                        ext['linkname'] = records[b'linkpath']
+                else:
+                    key = 'name' if typeflag == b'L' else 'linkname'
+                    ext.setdefault(key, data[:size].split(b'\0', 1)[0])
+                extensions.append(header + data)
+                continue
+
+            if self._exclude and self._excluded_member(header, typeflag, ext):
+                reader.skip(padded)
+            else:
+                for extension in extensions:
+                    self._write(extension)
+                self._write(header)
+                self._copy(reader, padded)
+            extensions = []
+            ext = {}
+
+    def _excluded_member(self, header, typeflag, ext):
+        stored = ext.get('name') or _member_name(header)
+        name = _normalize(stored)
+        if self._exclude(os.fsdecode(stored).rstrip('/')):
+            self._excluded.add(name)
+            return True
+        if typeflag == b'1':
+            target = _normalize(ext.get('linkname') or header[157:257].split(b'\0', 1)[0])
+            if target in self._excluded:
+                raise TarStreamError("Hard link '%s' points to excluded '%s'" % (name, target))
+        return False
+
+    def close(self):
+        """Write the end of archive marker"""
+        end = self.written + 2 * BLOCKSIZE
+        end = -(-end // self._record_size) * self._record_size
+        self._write(b'\0' * (end - self.written))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
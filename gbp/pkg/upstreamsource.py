@@ -15,13 +15,19 @@
 #    along with this program; if not, please see
 #    <http://www.gnu.org/licenses/>
 
+import bz2
 import glob
+import gzip
+import lzma
 import os
 
 import gbp.command_wrappers as gbpc
 
-from gbp.pkg.compressor import Compressor
+from gbp.pkg.archive import Archive
+from gbp.pkg.compressor import Compressor, CompressorError
 from gbp.pkg.pkgpolicy import PkgPolicy
+from gbp.pkg.tarimport import tar_exclude_matcher
+from gbp.pkg.tarstream import TarConcatenator, TarStreamError
 
 from gbp.errors import GbpError
 
@@ -199,6 +205,54 @@ class UpstreamSource(object):
             raise GbpError
         return type(self)(newarchive)
 
+    # How to read the compressed tarballs L{filter} handles
+    _decompressors = {None: open,
+                      'gzip': gzip.open,
+                      'bzip2': bz2.open,
+                      'lzma': lzma.open,
+                      'xz': lzma.open}
+
+    def filter(self, newarchive, filters):
+        """
+        Create a new archive from the current tarball leaving out the files
+        matching I{filters} without unpacking it
+
+        The members are copied from the decompressed tarball straight into
+        the compressor of the new archive, the compression is determined by
+        I{newarchive}'s extension. Filters have the semantics of I{tar
+        --exclude}.
+
+        @param newarchive: the name of the new archive
+        @type newarchive: C{str}
+        @param filters: tar filters to apply
+        @type filters: C{list} of C{str}
+        @return: the new upstream source
+        @rtype: L{UpstreamSource}
+        @raises GbpError: if the tarball can't be filtered this way
+        """
+        _, fmt, compression = Archive.parse_filename(self.path)
+        if not self.is_orig() or fmt != 'tar' or compression not in self._decompressors:
+            raise GbpError("Can only filter tar archives: %s" % self.path)
+        _, fmt, new_compression = Archive.parse_filename(newarchive)
+        if fmt != 'tar' or new_compression not in Compressor.Opts:
+            raise GbpError("Unsupported archive type: %s" % newarchive)
+
+        def chunks(f):
+            return iter(lambda: f.read(1024 * 1024), b'')
+
+        try:
+            with self._decompressors[compression](self.path, 'rb') as f, \
+                    open(newarchive, 'wb') as out:
+                with Compressor(new_compression).open(out) as compressed:
+                    with TarConcatenator(compressed,
+                                         exclude=tar_exclude_matcher(filters or [])) as tar:
+                        tar.add(chunks(f))
+        except (OSError, EOFError, lzma.LZMAError, TarStreamError, CompressorError) as err:
+            if os.path.exists(newarchive):
+                os.unlink(newarchive)
+            raise GbpError("Failed to filter '%s': %s" % (self.path, err))
+        return type(self)(newarchive)
+
     @staticmethod
     def known_compressions():
         return Compressor.Exts.values()
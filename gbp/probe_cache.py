@@ -0,0 +1,147 @@
+# vim: set fileencoding=utf-8 :
+#
+# (C) 2026 The git-buildpackage developers
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, please see
+#    <http://www.gnu.org/licenses/>
+"""Cache the results of probing external tools"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+
+class ProbeCache(object):
+    """
+    Remembers what we found out about external tools like the options
+    a git command supports or the architecture dpkg builds for.
+
+    A result is keyed by the tool and the probe run and is valid as long
+    as the tool's binary (found via I{PATH}), the files and environment
+    variables the probe depends on didn't change. Results are kept in
+    memory and in I{$XDG_CACHE_HOME/git-buildpackage/probes.json}.
+    """
+    version = 1
+    _memo = {}
+    _lock = threading.Lock()
+
+    def __init__(self, cache_dir=None):
+        """
+        @param cache_dir: where to store the cache file
+        @type cache_dir: C{str}
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                                     os.path.expanduser('~/.cache'),
+                                     'git-buildpackage')
+        self.filename = os.path.join(cache_dir, 'probes.json')
+
+    @staticmethod
+    def enabled():
+        """Whether caching is enabled (i.e. I{GBP_PROBE_CACHE} isn't 0)"""
+        return os.environ.get('GBP_PROBE_CACHE', '1') not in ['0', 'false', 'no']
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+            return [st.st_mtime_ns, st.st_size, st.st_ino]
+        except OSError:
+            return None
+
+    def _load(self):
+        try:
+            with open(self.filename) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != self.version:
+            return {}
+        return data['probes']
+
+    def _store(self, key, stamp, value):
+        tmp = None
+        try:
+            with self._lock:
+                probes = self._load()
+                probes[key] = {'stamp': stamp, 'value': value}
+                os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.filename))
+                with os.fdopen(fd, 'w') as f:
+                    json.dump({'version': self.version, 'probes': probes}, f,
+                              separators=(',', ':'))
+                os.replace(tmp, self.filename)
+        except OSError:
+            # Caching is best effort
+            if tmp:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+
+    def get(self, tool, probe, compute, files=(), env=()):
+        """
+        Get the result of a probe, running it if needed
+
+        Results aren't cached if the tool can't be found or the probe
+        raises an exception.
+
+        @param tool: the tool probed
+        @type tool: C{str}
+        @param probe: what to find out, e.g. the tool's arguments
+        @type probe: C{list} of C{str}
+        @param compute: run the probe
+        @type compute: C{callable} returning a JSON serializable value
+        @param files: additional files the result depends on
+        @type files: C{list} of C{str}
+        @param env: environment variables the result depends on
+        @type env: C{list} of C{str}
+        """
+        path = shutil.which(tool)
+        if path is None:
+            return compute()
+        key = json.dumps([tool] + list(probe))
+        stamp = ([os.path.realpath(path), self._stat(path)] +
+                 [[f, self._stat(f)] for f in files] +
+                 [os.environ.get(var) for var in env])
+
+        entry = self._memo.get(key)
+        if entry is None:
+            entry = self._load().get(key)
+        if entry is not None and entry['stamp'] == stamp:
+            self._memo[key] = entry
+            return entry['value']
+
+        value = compute()
+        stamp = json.loads(json.dumps(stamp))
+        self._memo[key] = {'stamp': stamp, 'value': value}
+        self._store(key, stamp, value)
+        return value
+
+    @classmethod
+    def clear(cls):
+        """Drop all in memory entries"""
+        cls._memo.clear()
+
+
+def probe(tool, args, compute, files=(), env=()):
+    """
+    Run I{compute} to probe I{tool} unless the result is cached already
+
+    See L{ProbeCache.get} for the arguments.
+    """
+    if not ProbeCache.enabled():
+        return compute()
+    return ProbeCache().get(tool, args, compute, files, env)
@@ -0,0 +1,229 @@
+# vim: set fileencoding=utf-8 :
+#
+# (C) 2026 The git-buildpackage developers
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, please see
+#    <http://www.gnu.org/licenses/>
+"""Record what child processes gbp spawns and how long they take"""
+
+import atexit
+import os
+import resource
+import sys
+import time
+from collections import namedtuple, OrderedDict
+
+ProcessRecord = namedtuple('ProcessRecord', ['argv', 'wall', 'cpu',
+                                             'bytes_in', 'bytes_out',
+                                             'returncode'])
+ProcessRecord.__doc__ = """A single child process run"""
+
+# Output formats of the --profile option
+formats = ['text', 'json']
+
+
+def _children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Profiler(object):
+    """
+    Collects a L{ProcessRecord} for every child process run through
+    L{gbp.git.GitRepository} and L{gbp.command_wrappers.Command}.
+
+    CPU time is taken from the resource usage of waited for children so
+    it's only accurate as long as processes don't overlap.
+
+    >>> p = Profiler()
+    >>> p.enabled
+    False
+    >>> p.start() is None
+    True
+    >>> p.enable()
+    >>> p.stop(p.start(), ['git', 'rev-parse', 'HEAD'], 0, bytes_out=41)
+    >>> p.stop(p.start(), ['git', 'rev-parse', 'HEAD~1'], 0, bytes_out=41)
+    >>> p.stop(p.start(), ['/usr/bin/tar', 'xf', 'foo.tar'], 2)
+    >>> summary = p.summary()
+    >>> sorted(summary.keys())
+    ['git rev-parse', 'tar']
+    >>> summary['git rev-parse']['calls'], summary['git rev-parse']['bytes_out']
+    (2, 82)
+    >>> summary['tar']['failed']
+    1
+    >>> import json
+    >>> data = json.loads(p.format('json'))
+    >>> data['total']['calls'], data['processes'][2]['argv']
+    (3, ['/usr/bin/tar', 'xf', 'foo.tar'])
+    >>> print(p.format('text').split('\\n')[0]) # doctest: +ELLIPSIS
+    gbp profile: 3 processes, ...
+    """
+    def __init__(self):
+        self.enabled = False
+        self.records = []
+        self._registered = False
+
+    def enable(self, report=None):
+        """
+        Start recording processes
+
+        @param report: format to print a report in at exit, one of
+            L{formats} or C{None} for no report
+        @type report: C{str}
+        """
+        self.enabled = True
+        if report:
+            self._report = report
+            if not self._registered:
+                atexit.register(self._print_report)
+                self._registered = True
+
+    def start(self):
+        """
+        Mark the start of a child process
+
+        @return: token to pass to L{stop} or C{None} if not profiling
+        """
+        if not self.enabled:
+            return None
+        return time.monotonic(), _children_cpu()
+
+    def stop(self, start, argv, returncode, bytes_in=0, bytes_out=0):
+        """
+        Record a finished child process
+
+        @param start: the token returned by L{start}
+        @param argv: the process' command line
+        @type argv: C{list} of C{str} or C{str}
+        @param returncode: the process' exit status
+        @type returncode: C{int}
+        @param bytes_in: number of bytes sent to the process
+        @type bytes_in: C{int}
+        @param bytes_out: number of bytes read from the process
+        @type bytes_out: C{int}
+        """
+        if start is None:
+            return
+        wall = time.monotonic() - start[0]
+        cpu = _children_cpu() - start[1]
+        if isinstance(argv, str):
+            argv = argv.split()
+        self.records.append(ProcessRecord(list(argv), wall, cpu, bytes_in,
+                                          bytes_out, returncode))
+
+    @staticmethod
+    def _key(argv):
+        """Group git by subcommand and everything else by program name"""
+        prog = os.path.basename(argv[0]) if argv else ''
+        if prog == 'git':
+            args = argv[1:]
+            while len(args) > 1 and args[0] == '-c':
+                args = args[2:]
+            if args:
+                return 'git %s' % args[0]
+        return prog
+
+    def summary(self):
+        """
+        Aggregate the records
+
+        @return: per command statistics, most expensive first
+        @rtype: C{OrderedDict} of C{str} to C{dict}
+        """
+        stats = {}
+        for record in self.records:
+            entry = stats.setdefault(self._key(record.argv),
+                                     {'calls': 0, 'failed': 0, 'wall': 0.0, 'cpu': 0.0,
+                                      'bytes_in': 0, 'bytes_out': 0})
+            entry['calls'] += 1
+            entry['failed'] += 1 if record.returncode else 0
+            entry['wall'] += record.wall
+            entry['cpu'] += record.cpu
+            entry['bytes_in'] += record.bytes_in
+            entry['bytes_out'] += record.bytes_out
+        return OrderedDict(sorted(stats.items(),
+                                  key=lambda item: (-item[1]['wall'], item[0])))
+
+    def format(self, fmt):
+        """
+        Format a report
+
+        @param fmt: one of L{formats}
+        @type fmt: C{str}
+        @rtype: C{str}
+        """
+        summary = self.summary()
+        total = {'calls': len(self.records),
+                 'wall': sum(r.wall for r in self.records),
+                 'cpu': sum(r.cpu for r in self.records)}
+        if fmt == 'json':
+            import json
+            return json.dumps({'total': total,
+                               'commands': summary,
+                               'processes': [r._asdict() for r in self.records]},
+                              indent=2)
+
+        lines = ["gbp profile: %d processes, %.3fs wall, %.3fs cpu" %
+                 (total['calls'], total['wall'], total['cpu'])]
+        if summary:
+            width = max(len(name) for name in summary)
+            lines.append("  %-*s %6s %6s %9s %9s %10s %10s" %
+                         (width, 'command', 'calls', 'failed', 'wall', 'cpu',
+                          'bytes in', 'bytes out'))
+            for name, entry in summary.items():
+                lines.append("  %-*s %6d %6d %9.3f %9.3f %10d %10d" %
+                             (width, name, entry['calls'], entry['failed'],
+                              entry['wall'], entry['cpu'],
+                              entry['bytes_in'], entry['bytes_out']))
+        return '\n'.join(lines)
+
+    def _print_report(self):
+        print(self.format(self._report), file=sys.stderr)
+
+
+def parse_profile_arg(arg, prefix=''):
+    """
+    Parse a I{--profile[=format]} command line argument
+
+    >>> parse_profile_arg('--profile')
+    'text'
+    >>> parse_profile_arg('--git-profile=json', prefix='git-')
+    'json'
+    >>> parse_profile_arg('--profile', prefix='git-') is None
+    True
+    >>> parse_profile_arg('--profile=xml')
+    Traceback (most recent call last):
+    ...
+    ValueError: Invalid profile format 'xml', must be one of text, json
+
+    @param arg: the command line argument
+    @type arg: C{str}
+    @param prefix: option prefix, like in L{gbp.config.GbpOptionParser}
+    @type prefix: C{str}
+    @return: the report format or C{None} if I{arg} isn't the profile option
+    @rtype: C{str}
+    @raises ValueError: on invalid report formats
+    """
+    opt = '--%sprofile' % prefix
+    if arg == opt:
+        return 'text'
+    if not arg.startswith(opt + '='):
+        return None
+    fmt = arg[len(opt) + 1:]
+    if fmt not in formats:
+        raise ValueError("Invalid profile format '%s', must be one of %s" %
+                         (fmt, ', '.join(formats)))
+    return fmt
+
+
+PROFILER = Profiler()
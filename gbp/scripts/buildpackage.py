@@ -19,7 +19,6 @@
 
 import errno
 import os
-import pipes
 import shutil
 import shlex
 import sys
@@ -41,6 +40,7 @@ from gbp.scripts.common.buildpackage import (index_name, wc_name,
                                              dump_tree,
                                              write_wc, drop_index)
 from gbp.scripts.common import ExitCodes
+from gbp.scripts.common.exportdir import IncrementalExport
 from gbp.scripts.common.hook import Hook
 
 from gbp.scripts.export_orig import prepare_upstream_tarballs, guess_comp_type
@@ -91,8 +91,36 @@ def export_source(repo, tree, source, options, dest_dir, tarball_dir):
         overlay_extract_origs(source, tarball_dir, dest_dir, options)
 
     gbp.log.info("Exporting '%s' to '%s'" % (options.export, dest_dir))
+    if is_incremental_export(options):
+        incremental = IncrementalExport(repo, dest_dir, options.with_submodules)
+        if incremental.update(tree):
+            return
+        move_old_export(dest_dir)
     if not dump_tree(repo, dest_dir, tree, options.with_submodules):
         raise GbpError
+    if is_incremental_export(options):
+        incremental.record(tree)
+
+
+def is_incremental_export(options):
+    """
+    Whether to update the export dir in place instead of exporting
+    everything to a new one. A postexport hook modifies the export dir
+    so it always gets a full export.
+
+    >>> from optparse import Values
+    >>> is_incremental_export(Values({'export_dir': '../build-area', 'incremental_export': True,
+    ...                                'overlay': False, 'postexport': ''}))
+    True
+    >>> is_incremental_export(Values({'export_dir': '../build-area', 'incremental_export': True,
+    ...                                'overlay': True, 'postexport': ''}))
+    False
+    >>> is_incremental_export(Values({'export_dir': '../build-area', 'incremental_export': True,
+    ...                                'overlay': False, 'postexport': 'true'}))
+    False
+    """
+    return bool(options.export_dir and getattr(options, 'incremental_export', False) and
+                not options.overlay and not getattr(options, 'postexport', None))
 
 
 def move_old_export(target):
@@ -398,6 +426,16 @@ def build_parser(name, prefix=None):
                                       help="Compression type, default is '%(compression)s'")
     orig_group.add_config_file_option(option_name="compression-level", dest="comp_level",
                                       help="Compression level, default is '%(compression-level)s'")
+    orig_group.add_config_file_option(option_name="compression-threads", dest="comp_threads", type="int",
+                                      help="Number of threads to compress with, 0 for one per CPU, "
+                                      "default is '%(compression-threads)s'")
+    orig_group.add_config_file_option(option_name="jobs", dest="jobs", type="int",
+                                      help="Number of tarballs to create in parallel, 0 for one per CPU, "
+                                      "default is '%(jobs)s'")
+    orig_group.add_boolean_config_file_option(option_name="tarball-cache", dest="tarball_cache")
+    orig_group.add_config_file_option(option_name="tarball-cache-size", dest="tarball_cache_size",
+                                      help="Maximum size of the tarball cache, "
+                                      "default is '%(tarball-cache-size)s'")
     orig_group.add_config_file_option(option_name="upstream-signatures", dest="upstream_signatures",
                                       help="use upstream signatures, default is auto", type='tristate')
     orig_group.add_config_file_option("component", action="append", metavar='COMPONENT',
@@ -443,6 +481,8 @@ def build_parser(name, prefix=None):
                                              "default is '%(export)s'", metavar="TREEISH")
     export_group.add_boolean_config_file_option(option_name="purge", dest="purge")
     export_group.add_boolean_config_file_option(option_name="overlay", dest="overlay")
+    export_group.add_boolean_config_file_option(option_name="incremental-export",
+                                                dest="incremental_export")
     return parser
 
 
@@ -542,6 +582,9 @@ def main(argv):
 
             # Export to another build dir if requested:
             if options.export_dir:
+                # An incremental export updates the export dir in place
+                if is_incremental_export(options):
+                    tmp_dir = export_dir
                 export_source(repo, tree, source, options, tmp_dir, tarball_dir)
 
                 # Run postexport hook
@@ -552,9 +595,10 @@ def main(argv):
                                             'GBP_TMP_DIR': tmp_dir})
                          )(dir=tmp_dir)
 
-                gbp.log.info("Moving '%s' to '%s'" % (tmp_dir, export_dir))
-                move_old_export(export_dir)
-                os.rename(tmp_dir, export_dir)
+                if tmp_dir != export_dir:
+                    gbp.log.info("Moving '%s' to '%s'" % (tmp_dir, export_dir))
+                    move_old_export(export_dir)
+                    os.rename(tmp_dir, export_dir)
 
                 # Delayed tarball creation in case a postexport hook is used:
                 if not source.is_native() and options.postexport:
@@ -570,7 +614,7 @@ def main(argv):
             # Finally build the package:
             gbp.log.info("Performing the build")
             RunAtCommand(options.builder,
-                         [pipes.quote(arg) for arg in dpkg_args],
+                         [shlex.quote(arg) for arg in dpkg_args],
                          shell=True,
                          extra_env=Hook.md(build_env,
                                            {'GBP_BUILD_DIR': build_dir})
@@ -602,7 +646,8 @@ def main(argv):
         drop_index(repo)
 
     if not options.tag_only:
-        if options.export_dir and options.purge and not retval:
+        # Keep the export dir around for the next incremental export
+        if options.export_dir and options.purge and not retval and not is_incremental_export(options):
             RemoveTree(export_dir)()
 
         if source:
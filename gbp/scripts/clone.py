@@ -31,11 +31,9 @@ from gbp.scripts.common import ExitCodes
 from gbp.scripts.common import repo_setup
 from gbp.scripts.common.hook import Hook
 from gbp.command_wrappers import Command, CommandExecFailed
-from gbp.deb import DpkgCompareVersions
+from gbp.deb import DebianVersion
 import gbp.log
 
-from functools import cmp_to_key
-
 
 def apt_showsrc(pkg):
     try:
@@ -74,7 +72,7 @@ def vcs_git_url(pkg):
         gbp.log.err("Can't find any vcs-git URL for '%s'" % pkg)
         return None
 
-    s = sorted(repos, key=cmp_to_key(DpkgCompareVersions()))
+    s = sorted(repos, key=DebianVersion)
     return repos[s[-1]]
 
 
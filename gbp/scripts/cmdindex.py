@@ -0,0 +1,37 @@
+# Generated by 'make cmdindex', don't edit
+"""Index of the gbp commands"""
+
+commands = {
+    'buildpackage': ('gbp.scripts.buildpackage',
+                     'Build a Debian package out of a Git repository'),
+    'clone': ('gbp.scripts.clone',
+              'Clone a Git repository and set it up for gbp'),
+    'config': ('gbp.scripts.config',
+               'Query and display config file values'),
+    'create-remote-repo': ('gbp.scripts.create_remote_repo',
+                           'Create a remote Git repository based on the current one'),
+    'dch': ('gbp.scripts.dch',
+            'Generate Debian changelog entries from Git commit messages'),
+    'export-orig': ('gbp.scripts.export_orig',
+                    'Create orig tarballs from git'),
+    'import-dsc': ('gbp.scripts.import_dsc',
+                   'Import a Debian source package into a Git repository'),
+    'import-dscs': ('gbp.scripts.import_dscs',
+                    'Import multiple dsc files into Git in one go'),
+    'import-orig': ('gbp.scripts.import_orig',
+                    'Import a new upstream version into a Git repository'),
+    'import-ref': ('gbp.scripts.import_ref',
+                   'Import a new upstream version from a git branch onto the Debian branch'),
+    'pq': ('gbp.scripts.pq',
+           'Manage Debian patches on a patch queue branch'),
+    'pristine-tar': ('gbp.scripts.pristine_tar',
+                     'Perform pristine-tar import into a Git repository'),
+    'pull': ('gbp.scripts.pull',
+             'Pull remote changes and fast forward debian, upstream and pristine-tar branch'),
+    'push': ('gbp.scripts.push',
+             'Push your changes to a remote'),
+    'setup-gitattributes': ('gbp.scripts.setup_gitattributes',
+                            'Setup Git attributes to incapacitate .gitattributes shipped by the upstream'),
+    'tag': ('gbp.scripts.tag',
+            'Create a Debian tag'),
+}
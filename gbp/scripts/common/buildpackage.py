@@ -20,7 +20,7 @@
 
 import os
 import os.path
-import pipes
+import subprocess
 from gbp.git import GitRepositoryError
 from gbp.pkg.git import PkgGitRepository
 from gbp.errors import GbpError
@@ -33,6 +33,22 @@ wc_name = "WC"
 
 
 #  Functions to handle export-dir
+def _archive_to_dir(prefix, treeish, output_dir, paths=None):
+    "unpack git archive's output for treeish into output_dir"
+    archive = subprocess.Popen(['git', 'archive', '--format=tar', '--prefix=%s' % prefix,
+                                treeish, '--'] + (paths or []), stdout=subprocess.PIPE)
+    tar = None
+    try:
+        tar = subprocess.Popen(['tar', '-C', output_dir, '-xf', '-'], stdin=archive.stdout)
+    finally:
+        archive.stdout.close()
+        if tar is None:
+            archive.wait()
+    tar_ret = tar.wait()
+    archive_ret = archive.wait()
+    return tar_ret or archive_ret
+
+
 def dump_tree(repo, export_dir, treeish, with_submodules, recursive=True):
     "dump a tree to output_dir"
     output_dir = os.path.dirname(export_dir)
@@ -40,16 +56,12 @@ def dump_tree(repo, export_dir, treeish, with_submodules, recursive=True):
     if recursive:
         paths = []
     else:
-        paths = ["'%s'" % nam.decode() for _mod, typ, _sha, nam in
+        paths = [nam.decode() for _mod, typ, _sha, nam in
                  repo.list_tree(treeish) if typ == 'blob']
 
-    pipe = pipes.Template()
-    pipe.prepend('git archive --format=tar --prefix=%s %s -- %s' %
-                 (prefix, treeish, ' '.join(paths)), '.-')
-    pipe.append('tar -C %s -xf -' % output_dir, '-.')
     top = os.path.abspath(os.path.curdir)
     try:
-        ret = pipe.copy('', '')
+        ret = _archive_to_dir(prefix, treeish, output_dir, paths)
         if ret:
             raise GbpError("Error in dump_tree archive pipe")
 
@@ -60,11 +72,7 @@ def dump_tree(repo, export_dir, treeish, with_submodules, recursive=True):
                 gbp.log.info("Processing submodule %s (%s)" % (subdir, commit[0:8]))
                 tarpath = [subdir, subdir[2:]][subdir.startswith("./")]
                 os.chdir(subdir)
-                pipe = pipes.Template()
-                pipe.prepend('git archive --format=tar --prefix=%s%s/ %s' %
-                             (prefix, tarpath, commit), '.-')
-                pipe.append('tar -C %s -xf -' % output_dir, '-.')
-                ret = pipe.copy('', '')
+                ret = _archive_to_dir('%s%s/' % (prefix, tarpath), commit, output_dir)
                 os.chdir(top)
                 if ret:
                     raise GbpError("Error in dump_tree archive pipe in submodule %s" % subdir)
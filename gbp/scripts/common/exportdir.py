@@ -0,0 +1,421 @@
+# vim: set fileencoding=utf-8 :
+#
+# (C) 2026 The git-buildpackage developers
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, please see
+#    <http://www.gnu.org/licenses/>
+"""Update an export dir incrementally between builds"""
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+import time
+
+from gbp.errors import GbpError
+from gbp.git import GitRepository, GitRepositoryError
+import gbp.log
+
+# Attributes that make git archive's output differ from the blobs
+_archive_attrs = set(['export-ignore', 'export-subst', 'filter', 'ident',
+                      'eol', 'crlf', 'working-tree-encoding'])
+
+
+def archive_attributes(data):
+    """
+    Check if an attributes file uses attributes that change what
+    I{git archive} exports
+
+    >>> archive_attributes(b'*.png binary\\n*.c diff=cpp\\n')
+    False
+    >>> archive_attributes(b'# export-ignore\\n/.travis.yml  export-ignore\\n')
+    True
+    >>> archive_attributes(b'*.bat eol=crlf\\n')
+    True
+    """
+    for line in data.splitlines():
+        fields = line.split()
+        if not fields or fields[0].startswith(b'#'):
+            continue
+        for attr in fields[1:]:
+            name = attr.lstrip(b'-!').split(b'=', 1)[0].decode('utf-8', 'replace')
+            if name in _archive_attrs:
+                return True
+    return False
+
+
+def blob_hash(path, algo):
+    """
+    Hash a file like I{git hash-object} would without any filters
+
+    @param path: the file to hash
+    @type path: C{str}
+    @param algo: the repository's hash algorithm
+    @type algo: C{str}
+    @return: mode and object id
+    @rtype: C{tuple} of C{str}
+    """
+    st = os.lstat(path)
+    if stat.S_ISLNK(st.st_mode):
+        data, mode = os.fsencode(os.readlink(path)), '120000'
+    elif stat.S_ISREG(st.st_mode):
+        with open(path, 'rb') as f:
+            data = f.read()
+        mode = '100755' if st.st_mode & stat.S_IXUSR else '100644'
+    else:
+        return None, None
+    h = hashlib.new(algo)
+    h.update(b'blob %d\0' % len(data))
+    h.update(data)
+    return mode, h.hexdigest()
+
+
+class IncrementalExport(object):
+    """
+    Keep an export dir in sync with a tree by only writing what changed
+
+    The tree (and submodule commits) exported last together with the
+    mode, object id and stat data of every exported file are kept in the
+    repository's I{gbp-export} directory. On the next export the files
+    are checked against this manifest, everything else left behind by
+    the last build is removed and only the paths that differ between the
+    old and the new tree are touched. If exported files were modified in
+    the meantime or the export dir can't be updated exactly as
+    I{git archive} would export it the caller has to do a full export.
+    """
+    version = 1
+    # Files modified that close to recording them might change unnoticed
+    _racy_slack = 2.0
+
+    def __init__(self, repo, export_dir, with_submodules):
+        """
+        @param repo: the repository to export from
+        @type repo: L{GitRepository}
+        @param export_dir: the directory to export to
+        @type export_dir: C{str}
+        @param with_submodules: whether to export submodules too
+        @type with_submodules: C{bool}
+        """
+        self.repo = repo
+        self.export_dir = os.path.abspath(export_dir)
+        self.with_submodules = with_submodules
+        name = hashlib.sha1(os.fsencode(self.export_dir)).hexdigest()
+        self.state_file = os.path.join(repo.git_dir, 'gbp-export', '%s.json' % name)
+        self._repos = {}
+
+    def _repo(self, subdir):
+        """The repository holding the objects below I{subdir}"""
+        if not subdir:
+            return self.repo
+        if subdir not in self._repos:
+            self._repos[subdir] = GitRepository(os.path.join(self.repo.path, subdir))
+        return self._repos[subdir]
+
+    def _submodules(self, tree):
+        if not self.with_submodules or not self.repo.has_submodules():
+            return {}
+        submodules = {}
+        for subdir, commit in self.repo.get_submodules(tree):
+            submodules[[subdir, subdir[2:]][subdir.startswith("./")]] = commit
+        return submodules
+
+    def _load(self):
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get('version') != self.version or state.get('export_dir') != self.export_dir:
+            return None
+        return state
+
+    def forget(self):
+        """Drop the recorded state so the next export is a full one"""
+        try:
+            os.unlink(self.state_file)
+        except OSError:
+            pass
+
+    def _save(self, tree, submodules, files):
+        state = {'version': self.version,
+                 'export_dir': self.export_dir,
+                 'tree': tree,
+                 'submodules': submodules,
+                 'recorded': time.time(),
+                 'files': files}
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        tmp = self.state_file + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f, separators=(',', ':'))
+        os.replace(tmp, self.state_file)
+
+    def _stamp(self, path):
+        st = os.lstat(os.path.join(self.export_dir, path))
+        return [st.st_mtime_ns, st.st_size]
+
+    def _config(self, name, default=None):
+        try:
+            return self.repo.get_config(name)
+        except KeyError:
+            return default
+
+    def _global_attributes(self):
+        """Whether attributes outside the tree affect the archive"""
+        if self._config('core.autocrlf', 'false') not in ['false', 'input']:
+            return True
+        paths = [os.path.join(self.repo.git_dir, 'info', 'attributes'),
+                 self._config('core.attributesfile') or
+                 os.path.join(os.environ.get('XDG_CONFIG_HOME') or
+                              os.path.expanduser('~/.config'), 'git', 'attributes')]
+        for path in paths:
+            try:
+                with open(os.path.expanduser(path), 'rb') as f:
+                    if archive_attributes(f.read()):
+                        return True
+            except OSError:
+                pass
+        return False
+
+    def _check_attributes(self, files):
+        """
+        Make sure no I{.gitattributes} file in I{files} changes what
+        I{git archive} exports
+        """
+        for path, (subdir, mode, sha1) in files.items():
+            if os.path.basename(path) == '.gitattributes':
+                if archive_attributes(self._repo(subdir).show(sha1)):
+                    raise GbpError("'%s' uses attributes that affect exporting" % path)
+
+    def _list(self, tree, submodules):
+        """All files of I{tree} and I{submodules} by path"""
+        files = {}
+        for subdir, treeish in [(None, tree)] + sorted(submodules.items()):
+            prefix = subdir + '/' if subdir else ''
+            for mode, typ, sha1, path in self._repo(subdir).list_tree(treeish, recurse=True):
+                if typ == 'blob':
+                    files[prefix + os.fsdecode(path)] = (subdir, mode, sha1)
+        return files
+
+    def _close(self):
+        for repo in self._repos.values():
+            repo.close()
+        self._repos = {}
+
+    def record(self, tree):
+        """
+        Remember that I{tree} was exported fully
+
+        @param tree: the exported treeish
+        @type tree: C{str}
+        """
+        try:
+            self._record(tree)
+        finally:
+            self._close()
+
+    def _record(self, tree):
+        self.forget()
+        try:
+            tree = self.repo.rev_parse('%s^{tree}' % tree)
+            if self._global_attributes():
+                return
+            submodules = self._submodules(tree)
+            files = self._list(tree, submodules)
+            self._check_attributes(files)
+            manifest = dict((path, [mode, sha1] + self._stamp(path))
+                            for path, (_, mode, sha1) in files.items())
+            self._save(tree, submodules, manifest)
+        except (OSError, GbpError, GitRepositoryError) as err:
+            gbp.log.debug("Not recording export of '%s': %s" % (tree, err))
+
+    def _verify(self, state):
+        """
+        Check that the export dir still matches the manifest
+
+        @return: the manifest with refreshed stat data or C{None}
+        """
+        files = state['files']
+        algo = 'sha256' if len(state['tree']) == 64 else 'sha1'
+        racy = (state['recorded'] - self._racy_slack) * 1e9
+        for path, entry in files.items():
+            try:
+                stamp = self._stamp(path)
+                if stamp == entry[2:] and stamp[0] < racy:
+                    continue
+                if blob_hash(os.path.join(self.export_dir, path), algo) != tuple(entry[:2]):
+                    gbp.log.debug("'%s' was modified in '%s'" % (path, self.export_dir))
+                    return None
+            except OSError:
+                gbp.log.debug("'%s' is missing in '%s'" % (path, self.export_dir))
+                return None
+            entry[2:] = stamp
+        return files
+
+    def _untracked(self, files):
+        """
+        Paths in the export dir that aren't part of the last export like
+        build results and stamp files
+
+        @param files: the manifest of the last export
+        @type files: C{dict}
+        @rtype: C{list} of C{str}
+        """
+        dirs = set()
+        for path in files:
+            path = os.path.dirname(path)
+            while path and path not in dirs:
+                dirs.add(path)
+                path = os.path.dirname(path)
+
+        untracked = []
+        for root, dirnames, filenames in os.walk(self.export_dir):
+            rel = os.path.relpath(root, self.export_dir)
+            prefix = '' if rel == '.' else rel + '/'
+            for name in dirnames[:]:
+                if prefix + name not in dirs:
+                    # Symlinks to directories are listed here too
+                    if prefix + name not in files:
+                        untracked.append(prefix + name)
+                    dirnames.remove(name)
+            untracked.extend(prefix + name for name in filenames
+                             if prefix + name not in files)
+        return untracked
+
+    def _clean(self, paths):
+        for path in paths:
+            full = os.path.join(self.export_dir, path)
+            if os.path.isdir(full) and not os.path.islink(full):
+                shutil.rmtree(full)
+            else:
+                os.unlink(full)
+
+    def _changes(self, state, tree, submodules):
+        """
+        Paths to remove and files to write to get from the exported
+        state to I{tree}
+        """
+        remove = set()
+        write = {}
+
+        def add(subdir, old, new):
+            prefix = subdir + '/' if subdir else ''
+            changes = self._repo(subdir).diff_tree(old, new) if old else \
+                (('000000', mode, None, sha1, 'A', path) for mode, typ, sha1, path
+                 in self._repo(subdir).list_tree(new, recurse=True) if typ == 'blob')
+            for old_mode, new_mode, _, new_sha1, _, path in changes:
+                path = prefix + os.fsdecode(path)
+                if old_mode not in ['000000', '160000']:
+                    remove.add(path)
+                if new_mode not in ['000000', '160000']:
+                    write[path] = (subdir, new_mode, new_sha1)
+
+        add(None, state['tree'], tree)
+        old_submodules = state['submodules']
+        for subdir, commit in submodules.items():
+            if old_submodules.get(subdir) != commit:
+                add(subdir, old_submodules.get(subdir), commit)
+        for subdir in old_submodules:
+            if subdir not in submodules:
+                prefix = subdir + '/'
+                remove.update(path for path in state['files'] if path.startswith(prefix))
+        return remove, write
+
+    def _remove(self, paths):
+        dirs = set()
+        for path in paths:
+            full = os.path.join(self.export_dir, path)
+            if os.path.lexists(full):
+                os.unlink(full)
+            dirs.add(os.path.dirname(path))
+        # Drop directories that became empty
+        for path in sorted(dirs, key=len, reverse=True):
+            while path:
+                try:
+                    os.rmdir(os.path.join(self.export_dir, path))
+                except OSError:
+                    break
+                path = os.path.dirname(path)
+
+    def _write(self, path, subdir, mode, sha1):
+        full = os.path.join(self.export_dir, path)
+        data = self._repo(subdir).show(sha1)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        if os.path.lexists(full):
+            os.unlink(full)
+        if mode == '120000':
+            os.symlink(data, os.fsencode(full))
+            return
+        fd = os.open(full, os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                     0o777 if mode == '100755' else 0o666)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+    def update(self, tree):
+        """
+        Update the export dir to I{tree}
+
+        @param tree: the treeish to export
+        @type tree: C{str}
+        @return: C{False} if a full export is needed
+        @rtype: C{bool}
+        """
+        try:
+            return self._update(tree)
+        finally:
+            self._close()
+
+    def _update(self, tree):
+        state = self._load()
+        if state is None or not os.path.isdir(self.export_dir):
+            return False
+        try:
+            tree = self.repo.rev_parse('%s^{tree}' % tree)
+            if self._global_attributes():
+                return False
+            files = self._verify(state)
+            if files is None:
+                gbp.log.info("'%s' was modified, doing a full export" % self.export_dir)
+                return False
+            untracked = self._untracked(files)
+            if self.with_submodules and self.repo.has_submodules():
+                self.repo.update_submodules()
+            submodules = self._submodules(tree)
+            remove, write = self._changes(state, tree, submodules)
+            self._check_attributes(write)
+        except (OSError, GbpError, GitRepositoryError) as err:
+            gbp.log.info("Can't export incrementally, doing a full export: %s" % err)
+            return False
+
+        # From here on the export dir doesn't match the state anymore
+        self.forget()
+        try:
+            self._clean(untracked)
+            self._remove(remove)
+            for path in remove:
+                files.pop(path, None)
+            for path, (subdir, mode, sha1) in sorted(write.items()):
+                self._write(path, subdir, mode, sha1)
+                files[path] = [mode, sha1] + self._stamp(path)
+        except (OSError, GbpError, GitRepositoryError) as err:
+            gbp.log.info("Incremental export failed, doing a full export: %s" % err)
+            return False
+        gbp.log.info("Updated %d and removed %d files in '%s'" %
+                     (len(write), len(remove - set(write)), self.export_dir))
+        if untracked:
+            gbp.log.info("Removed %d untracked paths from '%s'" % (len(untracked), self.export_dir))
+        try:
+            self._save(tree, submodules, files)
+        except OSError as err:
+            gbp.log.debug("Failed to record export of '%s': %s" % (tree, err))
+        return True
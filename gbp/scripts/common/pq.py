@@ -22,10 +22,6 @@ import re
 import os
 import datetime
 import time
-from email.message import Message
-from email.header import Header
-from email.charset import Charset, QP
-from email.policy import Compat32
 
 from gbp.git import GitRepositoryError
 from gbp.git.modifier import GitModifier, GitTz
@@ -138,6 +134,11 @@ def patch_path_filter(file_status, exclude_regex=None):
 
 def write_patch_file(filename, commit_info, diff):
     """Write patch file"""
+    from email.message import Message
+    from email.header import Header
+    from email.charset import Charset, QP
+    from email.policy import Compat32
+
     if not diff:
         gbp.log.debug("I won't generate empty diff %s" % filename)
         return None
@@ -202,9 +202,17 @@ def do_snapshot(changelog, repo, next_snapshot):
     return snapshot, commit, cp['MangledVersion']
 
 
-def parse_commit(repo, commitid, opts, last_commit=False):
-    """Parse a commit and return message, author, and author email"""
-    commit_info = repo.get_commit_info(commitid)
+def parse_commit(repo, commit, opts, last_commit=False):
+    """
+    Parse a commit and return message, author, and author email
+
+    @param commit: the commit id or its already looked up commit info
+    @type commit: C{str} or C{dict}
+    """
+    if isinstance(commit, dict):
+        commit_info = commit
+    else:
+        commit_info = repo.get_commit_info(commit)
     author = commit_info['author'].name
     email = commit_info['author'].email
     format_entry = user_customizations.get('format_changelog_entry')
@@ -503,9 +511,9 @@ def main(argv):
 
         if args:
             gbp.log.info("Only looking for changes on '%s'" % " ".join(args))
-        commits = repo.get_commits(since=since, until=until, paths=args,
-                                   options=options.git_log.split(" "))
-        commits.reverse()
+        commits = list(repo.iter_commit_info(since=since, until=until, paths=args,
+                                             options=options.git_log.split(" "),
+                                             reverse=True))
 
         add_section = False
         # add a new changelog section if:
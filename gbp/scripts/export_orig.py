@@ -19,6 +19,9 @@
 
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import gbp.deb as du
 from gbp.command_wrappers import CommandExecFailed
 from gbp.config import (GbpOptionParserDebian, GbpOptionGroup)
@@ -28,8 +31,9 @@ from gbp.errors import GbpError
 import gbp.log
 import gbp.notifications
 from gbp.scripts.common import ExitCodes
-from gbp.pkg import Compressor, Archive
+from gbp.pkg import Compressor
 from gbp.pkg.pkgpolicy import PkgPolicy
+from gbp.pkg.tarballcache import TarballCache, parse_size
 
 
 def prepare_upstream_tarballs(repo, source, options, tarball_dir, output_dir):
@@ -74,6 +78,109 @@ def prepare_upstream_tarballs(repo, source, options, tarball_dir, output_dir):
     pristine_tar_verify_origs(repo, source, options, output_dir, orig_files)
 
 
+def max_jobs(options):
+    """
+    Number of tarballs to build in parallel
+
+    >>> from optparse import Values
+    >>> max_jobs(Values({'jobs': 4}))
+    4
+    >>> max_jobs(Values({})) == 1
+    True
+    """
+    jobs = getattr(options, 'jobs', 1)
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    return max(jobs or 1, 1)
+
+
+def tarball_cache(options):
+    """
+    The cache of generated tarballs if enabled
+
+    >>> from optparse import Values
+    >>> tarball_cache(Values({})) is None
+    True
+    >>> tarball_cache(Values({'tarball_cache': True, 'tarball_cache_size': '1M'})).max_size
+    1048576
+
+    @rtype: L{TarballCache} or C{None}
+    """
+    if not getattr(options, 'tarball_cache', False):
+        return None
+    return TarballCache(parse_size(options.tarball_cache_size))
+
+
+def print_cache_stats(options):
+    """Print usage statistics of the tarball cache"""
+    cache = TarballCache(parse_size(options.tarball_cache_size))
+    stats = cache.stats()
+    lookups = stats['hits'] + stats['misses']
+    print("Cache directory: %s" % cache.cache_dir)
+    print("Enabled:         %s" % ("yes" if options.tarball_cache else "no"))
+    print("Entries:         %d" % stats['entries'])
+    print("Size:            %d of %d bytes" % (stats['size'], stats['max_size']))
+    print("Hits:            %d" % stats['hits'])
+    print("Misses:          %d" % stats['misses'])
+    if lookups:
+        print("Hit ratio:       %.1f%%" % (100.0 * stats['hits'] / lookups))
+
+
+def run_tarball_jobs(repo, jobs, options):
+    """
+    Run the jobs creating the individual tarballs
+
+    Jobs run in parallel if requested. Since repository objects keep
+    state (like the helper processes they talk to) every worker thread
+    uses a repository object of its own.
+
+    All jobs are run to completion. If any of them fail the error
+    messages of all failed jobs are combined into a single exception.
+
+    @param repo: the repository
+    @type repo: L{DebianGitRepository}
+    @param jobs: tarball names and the functions creating them
+    @type jobs: C{list} of C{tuple} of C{str} and C{callable}
+    @param options: the parsed options
+    """
+    workers = min(max_jobs(options), len(jobs))
+    if workers <= 1:
+        for _, job in jobs:
+            job(repo)
+        return
+
+    local = threading.local()
+    repos = []
+
+    def run(job):
+        if not hasattr(local, 'repo'):
+            local.repo = repo.__class__(repo.path)
+            repos.append(local.repo)
+        return job(local.repo)
+
+    gbp.log.debug("Creating %d tarballs using %d jobs" % (len(jobs), workers))
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [(name, pool.submit(run, job)) for name, job in jobs]
+    finally:
+        for worker_repo in repos:
+            worker_repo.close()
+
+    errors = [(name, future.exception()) for name, future in futures
+              if future.exception()]
+    if not errors:
+        return
+    for name, err in errors:
+        if not isinstance(err, GbpError):
+            raise err
+    if len(errors) == 1:
+        raise errors[0][1]
+    msg = "\n".join("%s: %s" % (name, err) for name, err in errors)
+    if all(isinstance(err, GitRepositoryError) for _, err in errors):
+        raise GitRepositoryError(msg)
+    raise GbpError(msg)
+
+
 def pristine_tar_prepare_orig_tree(repo, source, options):
     """
     Make sure the upstream tree exists
@@ -107,23 +214,23 @@ def pristine_tar_build_origs(repo, source, output_dir, options):
 
     comp = Compressor(options.comp_type)
     pristine_tar_prepare_orig_tree(repo, source, options)
-    try:
-        gbp.log.info("Creating %s" %
-                     os.path.abspath(os.path.join(output_dir,
-                                                  source.upstream_tarball_name(comp.type))))
-        repo.create_upstream_tarball_via_pristine_tar(source,
-                                                      output_dir,
-                                                      comp,
-                                                      options.upstream_signatures)
-        for component in options.components:
-            gbp.log.info("Creating %s" %
-                         os.path.abspath(os.path.join(output_dir,
-                                                      source.upstream_tarball_name(comp.type, component))))
+
+    def job(component):
+        def create(repo):
             repo.create_upstream_tarball_via_pristine_tar(source,
                                                           output_dir,
                                                           comp,
                                                           options.upstream_signatures,
                                                           component=component)
+        return create
+
+    jobs = []
+    for component in [None] + options.components:
+        name = source.upstream_tarball_name(comp.type, component)
+        gbp.log.info("Creating %s" % os.path.abspath(os.path.join(output_dir, name)))
+        jobs.append((name, job(component)))
+    try:
+        run_tarball_jobs(repo, jobs, options)
         return True
     except GitRepositoryError:
         if hasattr(options, 'pristine_tar_commit') and options.pristine_tar_commit:
@@ -138,19 +245,27 @@ def pristine_tar_verify_origs(repo, source, options, output_dir, orig_files):
     """
     Verify orig tarballs using pristine-tar
 
+    Tarballs matching the checksum recorded when they were last
+    generated or verified by pristine-tar are not verified again.
+
     @returns: C{True} if tarball was built, C{False} otherwise
     """
     if not options.pristine_tar:
         return True
 
+    archives = repo.pristine_tar.unverified([os.path.join(output_dir, f)
+                                             for f in orig_files])
+    if not archives:
+        return True
+
     if not repo.pristine_tar.has_feature_verify():
         gbp.log.warn("pristine-tar does not support verify. "
                      "Skipping verification.")
         return True
 
     pristine_tar_prepare_orig_tree(repo, source, options)
-    for f in orig_files:
-        repo.pristine_tar.verify(os.path.join(output_dir, f))
+    for archive in archives:
+        repo.pristine_tar.verify(archive)
     return True
 
 
@@ -205,23 +320,39 @@ def git_archive_build_origs(repo, source, output_dir, options):
     @param options: the parsed options
     @type options: C{dict} of options
     """
-    comp = Compressor(options.comp_type, options.comp_level)
+    comp = Compressor(options.comp_type, options.comp_level, options.comp_threads)
     upstream_tree = git_archive_get_upstream_tree(repo, source, options)
     gbp.log.info("Creating %s from '%s'" % (source.upstream_tarball_name(comp.type),
                                             upstream_tree))
     gbp.log.debug("Building upstream tarball with compression %s" % comp)
     tree = repo.tree_drop_dirs(upstream_tree, options.components) if options.components else upstream_tree
-    repo.create_upstream_tarball_via_git_archive(source, output_dir, tree, comp, options.with_submodules)
+
+    # Update submodules once up front instead of concurrently from each job
+    update_submodules = max_jobs(options) == 1
+    if options.with_submodules and not update_submodules:
+        repo.update_submodules()
+
+    cache = tarball_cache(options)
+
+    def job(tree, component):
+        def create(repo):
+            repo.create_upstream_tarball_via_git_archive(source, output_dir, tree, comp,
+                                                         options.with_submodules,
+                                                         component=component,
+                                                         update_submodules=update_submodules,
+                                                         cache=cache)
+        return create
+
+    jobs = [(source.upstream_tarball_name(comp.type), job(tree, None))]
     for component in options.components:
         subtree = repo.tree_get_dir(upstream_tree, component)
         if not subtree:
             raise GbpError("No tree for '%s' found in '%s' to create additional tarball from"
                            % (component, upstream_tree))
-        gbp.log.info("Creating additional tarball '%s' from '%s'"
-                     % (source.upstream_tarball_name(options.comp_type, component=component),
-                        subtree))
-        repo.create_upstream_tarball_via_git_archive(source, output_dir, subtree, comp,
-                                                     options.with_submodules, component=component)
+        name = source.upstream_tarball_name(options.comp_type, component=component)
+        gbp.log.info("Creating additional tarball '%s' from '%s'" % (name, subtree))
+        jobs.append((name, job(subtree, component)))
+    run_tarball_jobs(repo, jobs, options)
 
 
 def guess_comp_type(comp_type, source, repo, tarball_dir):
@@ -246,14 +377,14 @@ def guess_comp_type(comp_type, source, repo, tarball_dir):
 
         if branch is not None:
             regex = r'pristine-tar .* %s_%s\.orig.tar\.' % (source.name, source.upstream_version)
-            commits = repo.grep_log(regex, branch, merges=False)
-            if commits:
-                commit = commits[-1]
-                gbp.log.debug("Found pristine-tar commit at '%s'" % commit)
+            index = repo.pristine_tar.index(branch)
+            entry = index.find(regex)
+            if entry:
+                gbp.log.debug("Found pristine-tar commit at '%s'" % entry['commit'])
             else:
-                commit = branch
-            tarball = repo.get_commit_info(commit)['subject']
-            (base_name, archive_fmt, comp_type) = Archive.parse_filename(tarball)
+                entry = index.newest
+            tarball = entry['message'].split('\n', 1)[0] if entry else branch
+            comp_type = entry['compression'] if entry else None
             gbp.log.debug("Determined compression type '%s'" % comp_type)
             if not comp_type:
                 comp_type = 'gzip'
@@ -305,6 +436,18 @@ def build_parser(name):
                                       help="Compression type, default is '%(compression)s'")
     orig_group.add_config_file_option(option_name="compression-level", dest="comp_level",
                                       help="Compression level, default is '%(compression-level)s'")
+    orig_group.add_config_file_option(option_name="compression-threads", dest="comp_threads", type="int",
+                                      help="Number of threads to compress with, 0 for one per CPU, "
+                                      "default is '%(compression-threads)s'")
+    orig_group.add_config_file_option(option_name="jobs", dest="jobs", type="int",
+                                      help="Number of tarballs to create in parallel, 0 for one per CPU, "
+                                      "default is '%(jobs)s'")
+    orig_group.add_boolean_config_file_option(option_name="tarball-cache", dest="tarball_cache")
+    orig_group.add_config_file_option(option_name="tarball-cache-size", dest="tarball_cache_size",
+                                      help="Maximum size of the tarball cache, "
+                                      "default is '%(tarball-cache-size)s'")
+    orig_group.add_option("--cache-stats", action="store_true", dest="cache_stats", default=False,
+                          help="show tarball cache statistics and exit")
     orig_group.add_config_file_option(option_name="upstream-signatures", dest="upstream_signatures",
                                       help="use upstream signature, default is auto", type='tristate')
     orig_group.add_config_file_option("component", action="append", metavar='COMPONENT',
@@ -335,6 +478,14 @@ def main(argv):
     if args or not options:
         return ExitCodes.parse_error
 
+    if options.cache_stats:
+        try:
+            print_cache_stats(options)
+        except GbpError as err:
+            gbp.log.err(err)
+            return 1
+        return 0
+
     try:
         repo = DebianGitRepository(os.path.curdir, toplevel=False)
     except GitRepositoryError:
@@ -20,9 +20,9 @@ import sys
 import re
 import os
 import shutil
+import subprocess
 import tempfile
 import glob
-import pipes
 import time
 import gbp.command_wrappers as gbpc
 from gbp.deb.dscfile import DscFile
@@ -69,30 +69,53 @@ def download_source(pkg, dirs, unauth):
     return dsc
 
 
-def apply_patch(diff):
+def apply_patch(diff, dir='.'):
     "Apply patch to a source tree"
     patch_opts = ['-N', '-p1', '-F0', '-u', '-t',
                   '-Vnever', '-g0', '-z.gbp.orig',
                   '--quiet']
 
-    pipe = pipes.Template()
-    pipe.prepend('gunzip -c %s' % diff, '.-')
-    pipe.append('patch %s' % ' '.join(patch_opts), '-.')
-
     try:
-        ret = pipe.copy('', '')
+        gunzip = subprocess.Popen(['gunzip', '-c', diff], stdout=subprocess.PIPE)
+        patch = subprocess.Popen(['patch'] + patch_opts, stdin=gunzip.stdout, cwd=dir)
+        gunzip.stdout.close()
+        patch_ret = patch.wait()
+        gunzip_ret = gunzip.wait()
+        ret = patch_ret or gunzip_ret
         if ret:
             raise GbpError("Error import %s: %d" % (diff, ret))
     except OSError as err:
-        raise GbpError("Error importing %s: %s" % (diff, err[0]))
+        raise GbpError("Error importing %s: %s" % (diff, err))
 
 
-def apply_deb_tgz(deb_tgz, filters):
+def apply_deb_tgz(deb_tgz, filters, dir='.'):
     """Apply .debian.tar.gz (V3 source format)"""
     # Remove any existing data in debian/ as dpkg-source -x does
-    if os.path.isdir('debian'):
-        shutil.rmtree('debian')
-    gbpc.UnpackTarArchive(deb_tgz, ".", filters)()
+    debian = os.path.join(dir, 'debian')
+    if os.path.isdir(debian):
+        shutil.rmtree(debian)
+    gbpc.UnpackTarArchive(deb_tgz, dir, filters)()
+
+
+def apply_debian_changes(dsc, dir, filters):
+    """
+    Apply the Debian diff or tarball to the upstream sources unpacked
+    in I{dir}
+    """
+    if dsc.diff:
+        apply_patch(dsc.diff, dir)
+    elif dsc.deb_tgz:
+        apply_deb_tgz(dsc.deb_tgz, filters, dir)
+    else:
+        raise GbpError("Neither a Debian diff nor tarball found")
+
+    rules = os.path.join(dir, 'debian/rules')
+    if os.path.exists(rules):
+        if not os.path.islink(rules) and os.stat(rules).st_nlink > 1:
+            # Don't change the mode of the upstream sources' copy
+            shutil.copy2(rules, rules + '.gbp.tmp')
+            os.replace(rules + '.gbp.tmp', rules)
+        os.chmod(rules, 0o755)
 
 
 def get_changes(dir, repo, debian_branch):
@@ -159,18 +182,7 @@ def apply_debian_patch(repo, source, dsc, upstream_commit, options):
     """apply the debian patch and tag appropriately"""
 
     try:
-        os.chdir(source.unpacked)
-
-        if dsc.diff:
-            apply_patch(dsc.diff)
-        elif dsc.deb_tgz:
-            apply_deb_tgz(dsc.deb_tgz, options.filters)
-        else:
-            raise GbpError("Neither a Debian diff nor tarball found")
-
-        if os.path.exists('debian/rules'):
-            os.chmod('debian/rules', 0o755)
-        os.chdir(repo.path)
+        apply_debian_changes(dsc, source.unpacked, options.filters)
 
         parents = check_parents(repo, options.debian_branch, upstream_commit)
         author = get_author_from_changelog(source.unpacked)
@@ -195,8 +207,6 @@ def apply_debian_patch(repo, source, dsc, upstream_commit, options):
     except (gbpc.CommandExecFailed, GitRepositoryError) as err:
         msg = str(err) or 'Unknown error, please report a bug'
         raise GbpError("Failed to import Debian package: %s" % msg)
-    finally:
-        os.chdir(repo.path)
 
 
 def create_missing_branch(repo, branch, options, err_msg):
@@ -369,6 +379,8 @@ def build_parser(name):
                                                 dest="author_committer_date")
     import_group.add_boolean_config_file_option(option_name="allow-unauthenticated",
                                                 dest="allow_unauthenticated")
+    import_group.add_boolean_config_file_option(option_name="verify-checksums",
+                                                dest="verify_checksums")
 
     parser.add_config_file_option(option_name="repo-user", dest="repo_user",
                                   choices=['DEBIAN', 'GIT'])
@@ -473,6 +485,8 @@ def main(argv):
             raise GbpError("Importing %s source format not yet supported." % dsc.pkgformat)
         if options.verbose:
             print_dsc(dsc)
+        if options.verify_checksums:
+            dsc.verify()
 
         if needs_repo:
             target = target or dsc.pkg
@@ -17,51 +17,555 @@
 """Import multiple dsc files into Git in one go"""
 
 import glob
+import io
+import json
 import os
+import shutil
 import sys
 import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 import gbp.command_wrappers as gbpc
-from gbp.deb import DpkgCompareVersions
+from gbp.deb import DebianVersion
+from gbp.deb.changelog import ChangeLog
 from gbp.deb.dscfile import DscFile
+from gbp.deb.git import DebianGitRepository
+from gbp.deb.upstreamsource import (DebianUpstreamSource,
+                                    DebianAdditionalTarball)
 from gbp.errors import GbpError
 from gbp.git import GitRepository, GitRepositoryError
+from gbp.git.fastimport import FastImport
+from gbp.git.modifier import GitModifier
+from gbp.git.vfs import GitVfs
 from gbp.scripts import import_dsc
-from gbp.config import GbpOptionParser
+from gbp.scripts.common import repo_setup
+from gbp.config import (GbpOptionParser, no_debian_branch_msg,
+                        no_upstream_branch_msg)
 import gbp.log
 
 
-class DscCompareVersions(DpkgCompareVersions):
-    def __init__(self):
-        DpkgCompareVersions.__init__(self)
+def dsc_key(dsc):
+    """Sort key ordering source packages by version"""
+    return DebianVersion(dsc.version)
 
-    def __call__(self, dsc1, dsc2):
-        return DpkgCompareVersions.__call__(self, dsc1.version, dsc2.version)
 
+def without_crud(s):
+    """
+    Strip what git strips from names and email addresses
+
+    >>> without_crud(' "Joey Ramone" ')
+    'Joey Ramone'
+    >>> without_crud('<joey@example.com>')
+    'joey@example.com'
+    >>> without_crud('Joey <Ramone>')
+    'Joey Ramone'
+    """
+    crud = ''.join(chr(c) for c in range(33)) + ',:;<>"\\\''
+    return ''.join(c for c in s.strip(crud) if c not in '\n<>')
 
-def cmp_to_key(mycmp):
-    'Convert a cmp= function into a key= function'
-    class K(object):
-        def __init__(self, obj, *args):
-            self.obj = obj
-
-        def __lt__(self, other):
-            return mycmp(self.obj, other.obj) < 0
 
-        def __gt__(self, other):
-            return mycmp(self.obj, other.obj) > 0
+class ImportJournal(object):
+    """
+    Remembers which packages were imported and where downloaded packages
+    were kept so an interrupted import can be resumed. The journal is
+    kept in I{gbp-import-dscs/journal.json} in the git directory.
+    """
+    version = 1
+
+    def __init__(self, repo):
+        """
+        @param repo: the repository the packages are imported into
+        @type repo: L{GitRepository}
+        """
+        self.repo = repo
+        self.filename = os.path.join(repo.git_dir, 'gbp-import-dscs', 'journal.json')
+        self._data = self._load()
+
+    def _load(self):
+        try:
+            with open(self.filename) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if data.get('version') != self.version:
+            data = {'version': self.version}
+        data.setdefault('imports', {})
+        data.setdefault('downloads', {})
+        return data
+
+    def _store(self):
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.filename))
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self._data, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.filename)
+        except OSError:
+            os.unlink(tmp)
+            raise
 
-        def __eq__(self, other):
-            return mycmp(self.obj, other.obj) == 0
+    def record(self, imports):
+        """
+        Record imported packages
+
+        @param imports: the packages as (dsc, commit, tag, branch) where
+            the tag is C{None} if the commit wasn't tagged
+        @type imports: C{list} of C{tuple}
+        """
+        if not imports:
+            return
+        for dsc, commit, tag, branch in imports:
+            versions = self._data['imports'].setdefault(dsc.pkg, {})
+            versions[dsc.version] = {'commit': commit, 'tag': tag, 'branch': branch}
+        self._store()
+
+    def is_imported(self, dsc):
+        """
+        Whether I{dsc} got imported and its commit is still there
+
+        @param dsc: the source package
+        @type dsc: L{DscFile}
+        @rtype: C{bool}
+        """
+        entry = self._data['imports'].get(dsc.pkg, {}).get(dsc.version)
+        if not entry:
+            return False
+        try:
+            if entry['tag']:
+                return self.repo.rev_parse('%s^{commit}' % entry['tag']) == entry['commit']
+            return self.repo.branch_contains(entry['branch'], entry['commit'])
+        except GitRepositoryError:
+            return False
+
+    def record_downloads(self, pkg, dir):
+        """
+        Remember that the packages downloaded for I{pkg} were kept in I{dir}
+        """
+        self._data['downloads'][pkg] = {'dir': dir, 'files': sorted(os.listdir(dir))}
+        self._store()
+
+    def downloads(self, pkg):
+        """
+        Get the directory the packages downloaded for I{pkg} were kept in
+
+        @return: the directory or C{None} if it's gone or incomplete
+        @rtype: C{str}
+        """
+        entry = self._data['downloads'].get(pkg)
+        if not entry:
+            return None
+        for name in entry['files']:
+            if not os.path.exists(os.path.join(entry['dir'], name)):
+                return None
+        return entry['dir']
+
+    def forget_downloads(self, pkg):
+        if self._data['downloads'].pop(pkg, None):
+            self._store()
+
+
+class UnpackedDsc(object):
+    """
+    A source package unpacked into a temporary directory with the Debian
+    changes applied to a hard linked copy of the upstream sources so both
+    trees are available
+    """
+    def __init__(self, dsc, tmpdir, filters, verify=False):
+        """
+        @param dsc: the source package
+        @type dsc: L{DscFile}
+        @param tmpdir: where to create the temporary directory
+        @type tmpdir: C{str}
+        @param filters: files to leave out of the upstream sources
+        @type filters: C{list} of C{str}
+        @param verify: whether to verify the checksums before unpacking
+        @type verify: C{bool}
+        """
+        if verify:
+            dsc.verify()
+        self.dsc = dsc
+        self.dir = tempfile.mkdtemp(prefix='gbp_%s_' % dsc.version.replace(':', '_'),
+                                    dir=tmpdir)
+        # blob marks by inode
+        self.blobs = {}
+        self.debian = None
+        self.author = None
+        try:
+            self._unpack(filters)
+        except Exception:
+            self.cleanup()
+            raise
 
-        def __le__(self, other):
-            return mycmp(self.obj, other.obj) <= 0
+    def _unpack(self, filters):
+        dsc = self.dsc
+        sigfile = '{}.asc'.format(dsc.tgz)
+        sigfile = sigfile if sigfile in dsc.sigs else None
+        self.sources = [DebianUpstreamSource(dsc.tgz, sig=sigfile)]
+        for component, tarball in dsc.additional_tarballs.items():
+            self.sources.append(DebianAdditionalTarball(tarball, component))
+        unpack_dir = os.path.join(self.dir, 'upstream')
+        os.mkdir(unpack_dir)
+        self.sources[0].unpack(unpack_dir, filters)
+        for tarball in self.sources[1:]:
+            gbp.log.info("Found component tarball '%s'" % os.path.basename(tarball.path))
+            tarball.unpack(self.sources[0].unpacked, filters)
+        self.upstream = self.sources[0].unpacked
+
+        if dsc.native:
+            self.author = import_dsc.get_author_from_changelog(self.upstream)
+        elif dsc.diff or dsc.deb_tgz:
+            self.debian = os.path.join(self.dir, 'debian')
+            shutil.copytree(self.upstream, self.debian, symlinks=True,
+                            copy_function=os.link)
+            import_dsc.apply_debian_changes(dsc, self.debian, filters)
+            self.author = import_dsc.get_author_from_changelog(self.debian)
+
+    def cleanup(self):
+        gbpc.RemoveTree(self.dir)()
+
+
+class DscBulkImporter(object):
+    """
+    Import a series of source packages into an existing repository in
+    one go. Trees, commits and tags of all packages are streamed through
+    a single I{git fast-import} (so objects end up in a pack instead of
+    lots of loose objects) while the next package gets unpacked in a
+    worker thread. The resulting history is the same as importing the
+    packages one by one with L{gbp.scripts.import_dsc}.
+
+    Every L{checkpoint_interval} seconds fast-import is told to update
+    the refs and the imported packages are recorded in the
+    L{ImportJournal} so an interrupted import can be resumed.
+    """
+    checkpoint_interval = 60
+
+    def __init__(self, repo, options, journal):
+        """
+        @param repo: the repository to import into
+        @type repo: L{DebianGitRepository}
+        @param options: gbp import-dsc's options
+        @param journal: where to record imported packages
+        @type journal: L{ImportJournal}
+        """
+        self.repo = repo
+        self.options = options
+        self.journal = journal
+        self._fastimport = None
+        self._marks_file = None
+        self._last_checkpoint = time.time()
+        # packages imported since the last checkpoint
+        self._imported = []
+        # branch tips and the tags we created, as marks or sha1s
+        self._tips = {}
+        self._tags = {}
+        # upstream commits merged into the debian branch by us
+        self._merged = set()
+        self._changelog_version = None
+        self._pristine_tar = []
+        self._signed_tags = []
+        self._idents = {}
+        try:
+            self._head = repo.get_branch()
+        except GitRepositoryError:
+            self._head = None  # detached
 
-        def __ge__(self, other):
-            return mycmp(self.obj, other.obj) >= 0
+        # Do we need git's attribute machinery to add files?
+        self._defused = repo_setup.is_gitattributes_set_up(repo)
+        self._attributes = not self._defused and self._uses_attributes(repo)
 
-        def __ne__(self, other):
-            return mycmp(self.obj, other.obj) != 0
-    return K
+    @staticmethod
+    def _uses_attributes(repo):
+        try:
+            if repo.get_config('core.autocrlf').lower() in ['true', 'input', 'yes', 'on', '1']:
+                return True
+        except KeyError:
+            pass
+        files = [os.path.join(repo.git_dir, 'info', 'attributes')]
+        try:
+            files.append(os.path.expanduser(repo.get_config('core.attributesFile')))
+        except KeyError:
+            files.append(os.path.join(os.environ.get('XDG_CONFIG_HOME') or
+                                      os.path.expanduser('~/.config'), 'git', 'attributes'))
+        return any(os.path.exists(f) for f in files)
+
+    def _modifier(self, who, modifier=None):
+        """Fill in what git would use for I{who} (author or committer)"""
+        if who not in self._idents:
+            self._idents[who] = self.repo.get_ident(who)
+        ident = self._idents[who]
+        modifier = modifier or GitModifier()
+        if modifier.date:
+            date = modifier.date
+        elif 'GIT_%s_DATE' % who.upper() in os.environ:
+            date = ident.date
+        else:
+            date = "%d %s" % (time.time(), time.strftime("%z"))
+        return GitModifier(without_crud(modifier.name or '') or ident.name,
+                           without_crud(modifier.email or '') or ident.email,
+                           date)
+
+    def _tip(self, branch):
+        if branch not in self._tips:
+            ref = 'refs/heads/%s' % branch
+            self._tips[branch] = self.repo.rev_parse(ref) if self.repo.has_branch(branch) else None
+        return self._tips[branch]
+
+    def _create_missing_branch(self, branch, err_msg):
+        if self._tip(branch):
+            return
+        if not self.options.create_missing_branches:
+            raise GbpError(err_msg + "\n"
+                           "Also check the --create-missing-branches option.")
+        gbp.log.info("Creating missing branch '%s'" % branch)
+        self._tips[branch] = self._tip(self._head) if self._head else self.repo.rev_parse('HEAD')
+
+    def _tree(self, unpacked, top):
+        """Stream the files below I{top} into fast-import"""
+        files = None if self._attributes else self.repo._scan_dir(top)
+        if files is None or (not self._defused and
+                             any(os.path.basename(f[0]) == '.gitattributes' for f in files)):
+            # Leave nested repositories, special files and attributes to git
+            return self.repo.write_dir_tree(top)
+
+        entries = []
+        for path, mode, _ in files:
+            filename = os.path.join(top, path)
+            if mode == '120000':
+                target = os.readlink(os.fsencode(filename))
+                mark = self._fastimport.add_blob(io.BytesIO(target), len(target))
+            else:
+                st = os.stat(filename)
+                mark = unpacked.blobs.get((st.st_dev, st.st_ino))
+                if mark is None:
+                    with open(filename, 'rb') as f:
+                        mark = self._fastimport.add_blob(f, st.st_size)
+                    unpacked.blobs[(st.st_dev, st.st_ino)] = mark
+            entries.append((mode, mark, path))
+        return entries
+
+    def _commit(self, unpacked, top, branch, msg, parents, author=None, committer=None):
+        tree = self._tree(unpacked, top)
+        commit = self._fastimport.add_commit('refs/heads/%s' % branch, tree, msg,
+                                             committer=self._modifier('committer', committer),
+                                             author=self._modifier('author', author),
+                                             parents=[p for p in parents if p])
+        self._tips[branch] = commit
+        return commit
+
+    def _tag(self, name, msg, commit):
+        if self.options.sign_tags:
+            self._signed_tags.append((name, msg, commit))
+        else:
+            self._fastimport.add_tag(name, commit, self._modifier('committer'), msg + '\n')
+        self._tags[name] = commit
+
+    def _changes(self, top):
+        """The changelog entries since the last import onto the debian branch"""
+        if self._changelog_version is None:
+            tip = self._tip(self.options.debian_branch)
+            self._changelog_version = "0~"
+            if isinstance(tip, str):
+                try:
+                    with GitVfs(self.repo, tip).open('debian/changelog') as f:
+                        self._changelog_version = ChangeLog(contents=f.read()).version
+                except IOError:
+                    pass
+        cl = ChangeLog(filename=os.path.join(top, 'debian/changelog'))
+        changes = cl.get_changes(self._changelog_version)
+        self._changelog_version = cl.version
+        return changes
+
+    def _is_merged(self, commit):
+        """Whether I{commit} is already merged into the debian branch"""
+        if commit in self._merged:
+            return True
+        if isinstance(commit, int) or not self.repo.has_branch(self.options.debian_branch):
+            return False
+        return self.repo.branch_contains(self.options.debian_branch, commit)
+
+    def _import_native(self, unpacked):
+        dsc, options = unpacked.dsc, self.options
+        tag = self.repo.version_to_tag(options.debian_tag, dsc.upstream_version)
+        msg = "Debian version %s" % dsc.upstream_version
+
+        gbp.log.info("Tag %s not found, importing Debian tarball" % tag)
+        branch = options.debian_branch
+        self._create_missing_branch(branch, no_debian_branch_msg % branch)
+        committer = import_dsc.get_committer_from_author(unpacked.author, options)
+        commit_msg = "Import %s\n%s" % (msg, self._changes(unpacked.upstream))
+        commit = self._commit(unpacked, unpacked.upstream, branch, commit_msg,
+                              [self._tip(branch)], unpacked.author, committer)
+        if options.skip_debian_tag:
+            tag = None
+        else:
+            self._tag(tag, msg, commit)
+        self._imported.append((dsc, commit, tag, branch))
+
+    def _import_upstream(self, unpacked):
+        dsc, options = unpacked.dsc, self.options
+        tag = self.repo.version_to_tag(options.upstream_tag, dsc.upstream_version)
+        msg = "Upstream version %s" % dsc.upstream_version
+
+        branch = options.upstream_branch
+        self._create_missing_branch(branch, no_upstream_branch_msg % branch)
+        parents = [self._tip(branch)]
+        parents += self.repo.vcs_tag_parent(options.vcs_tag, dsc.upstream_version) or []
+        commit = self._commit(unpacked, unpacked.upstream, branch, "Import %s" % msg, parents)
+        self._tag(tag, msg, commit)
+        if options.pristine_tar:
+            self._pristine_tar.append((commit, unpacked.sources))
+        return commit
+
+    def _import_debian(self, unpacked, upstream_commit):
+        dsc, options = unpacked.dsc, self.options
+        branch = options.debian_branch
+        parents = [self._tip(branch)]
+        if not self._is_merged(upstream_commit):
+            gbp.log.debug("Upstream version %s not yet merged into '%s'"
+                          % (dsc.upstream_version, branch))
+            parents.append(upstream_commit)
+            self._merged.add(upstream_commit)
+        committer = import_dsc.get_committer_from_author(unpacked.author, options)
+        commit_msg = "Import Debian changes %s\n%s" % (dsc.version, self._changes(unpacked.debian))
+        commit = self._commit(unpacked, unpacked.debian, branch, commit_msg, parents,
+                              unpacked.author, committer)
+        tag = None
+        if not options.skip_debian_tag:
+            tag = self.repo.version_to_tag(options.debian_tag, dsc.version)
+            self._tag(tag, "Debian release %s" % dsc.version, commit)
+        self._imported.append((dsc, commit, tag, branch))
+
+    def _import(self, unpacked):
+        dsc, options = unpacked.dsc, self.options
+        if dsc.pkgformat not in ['1.0', '3.0']:
+            raise GbpError("Importing %s source format not yet supported." % dsc.pkgformat)
+        if options.verbose:
+            import_dsc.print_dsc(dsc)
+
+        tag = self.repo.version_to_tag(options.debian_tag, dsc.version)
+        if tag in self._tags or self.repo.find_version(options.debian_tag, dsc.version):
+            gbp.log.warn("Version %s already imported." % dsc.version)
+            return
+
+        if dsc.native:
+            self._import_native(unpacked)
+        else:
+            tag = self.repo.version_to_tag(options.upstream_tag, dsc.upstream_version)
+            commit = self._tags.get(tag)
+            if not commit:
+                commit = self.repo.find_version(options.upstream_tag, dsc.upstream_version)
+            if not commit:
+                commit = self._import_upstream(unpacked)
+
+            branch = options.debian_branch
+            if not self._tip(branch):
+                if not options.create_missing_branches:
+                    raise GbpError("Branch %s does not exist, use --create-missing-branches" %
+                                   branch)
+                self._tips[branch] = commit
+                self._merged.add(commit)
+                self._changelog_version = "0~"
+
+            if unpacked.debian:
+                self._import_debian(unpacked, commit)
+            else:
+                gbp.log.warn("Didn't find a diff to apply.")
+        gbp.log.info("Version '%s' imported under '%s'" % (dsc.version, self.repo.path))
+
+    def _flush(self):
+        """Do what fast-import can't do for us once the refs are there"""
+        marks = FastImport.read_marks(self._marks_file)
+
+        def sha1(commit):
+            return marks[commit] if isinstance(commit, int) else commit
+
+        for name, msg, commit in self._signed_tags:
+            self.repo.create_tag(name, msg=msg, commit=sha1(commit),
+                                 sign=True, keyid=self.options.keyid)
+        for commit, sources in self._pristine_tar:
+            self.repo.create_pristine_tar_commits(sha1(commit), sources)
+        self.journal.record([(dsc, sha1(commit), tag, branch)
+                             for dsc, commit, tag, branch in self._imported])
+        self._signed_tags, self._pristine_tar, self._imported = [], [], []
+        self._last_checkpoint = time.time()
+
+    def _checkpoint(self):
+        gbp.log.debug("Checkpointing import")
+        self._fastimport.checkpoint()
+        self._flush()
+
+    def _finish(self):
+        """Wait for fast-import and finish the import"""
+        fastimport, self._fastimport = self._fastimport, None
+        if fastimport.close():
+            raise GbpError("git fast-import failed")
+        self._flush()
+        if self._head == self.options.debian_branch:
+            # Update HEAD if we modified the checked out branch
+            self.repo.force_head(self.options.debian_branch, hard=True)
+
+    def run(self, dscs):
+        """
+        Import I{dscs} in the given order
+
+        Packages imported before a failure are kept.
+
+        @param dscs: the source packages to import
+        @type dscs: C{list} of L{DscFile}
+        @return: the package that failed to import or C{None}
+        @rtype: L{DscFile}
+        """
+        if not dscs:
+            return None
+        if self.repo.bare:
+            import_dsc.disable_pristine_tar(self.options, "Bare repository")
+        (clean, out) = self.repo.is_clean()
+        if not clean:
+            gbp.log.err("Repository has uncommitted changes, commit these first: %s" % out)
+            return dscs[0]
+
+        tmpdir = os.path.abspath(tempfile.mkdtemp(dir='..'))
+        fd, self._marks_file = tempfile.mkstemp(prefix='gbp_marks_', dir=self.repo.git_dir)
+        os.close(fd)
+        self._fastimport = FastImport(self.repo, export_marks=self._marks_file)
+        failed = None
+        try:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                def unpack(dsc):
+                    return executor.submit(UnpackedDsc, dsc, tmpdir, self.options.filters,
+                                           self.options.verify_checksums)
+
+                pending = unpack(dscs[0])
+                for i, dsc in enumerate(dscs):
+                    try:
+                        unpacked = pending.result()
+                    except gbpc.CommandExecFailed:
+                        failed = dsc  # command itself printed an error
+                        break
+                    except (GbpError, OSError) as err:
+                        gbp.log.err("Failed to unpack '%s': %s" % (dsc.dscfile, err))
+                        failed = dsc
+                        break
+                    # Unpack the next package while we import this one
+                    pending = unpack(dscs[i + 1]) if i + 1 < len(dscs) else None
+                    try:
+                        self._import(unpacked)
+                    except (GbpError, GitRepositoryError, gbpc.CommandExecFailed) as err:
+                        if str(err):
+                            gbp.log.err(err)
+                        failed = dsc
+                        break
+                    finally:
+                        unpacked.cleanup()
+                    if time.time() - self._last_checkpoint >= self.checkpoint_interval:
+                        self._checkpoint()
+            self._finish()
+        finally:
+            if self._fastimport:
+                self._fastimport.close()
+            os.unlink(self._marks_file)
+            gbpc.RemoveTree(tmpdir)()
+        return failed
 
 
 class GitImportDsc(object):
@@ -71,6 +575,58 @@ class GitImportDsc(object):
     def importdsc(self, dsc):
         return import_dsc.main(['import-dsc'] + self.args + [dsc.dscfile])
 
+    @staticmethod
+    def _record(repo, journal, options, dsc):
+        """Record I{dsc} in the journal if it got tagged"""
+        version = dsc.upstream_version if dsc.native else dsc.version
+        tag = repo.version_to_tag(options.debian_tag, version)
+        if repo.has_tag(tag):
+            journal.record([(dsc, repo.rev_parse('%s^{commit}' % tag), tag,
+                             options.debian_branch)])
+
+    def record(self, dsc):
+        """
+        Record I{dsc} imported via L{importdsc} into the repository in
+        the current directory in its L{ImportJournal}
+        """
+        options, args = import_dsc.parse_args(['import-dsc'] + self.args)
+        repo = DebianGitRepository('.')
+        self._record(repo, ImportJournal(repo), options, dsc)
+
+    def importdscs(self, dscs):
+        """
+        Import I{dscs} into the repository in the current directory,
+        in one go if the options allow for it
+
+        @return: the package that failed to import or C{None}
+        @rtype: L{DscFile}
+        """
+        options, args = import_dsc.parse_args(['import-dsc'] + self.args)
+        if not options:
+            return dscs[0] if dscs else None
+        try:
+            repo = DebianGitRepository('.')
+        except GitRepositoryError as err:
+            gbp.log.err(err)
+            return dscs[0] if dscs else None
+
+        journal = ImportJournal(repo)
+        if not options.allow_same_version:
+            pending = [dsc for dsc in dscs if not journal.is_imported(dsc)]
+            if len(pending) != len(dscs):
+                gbp.log.info("Skipping %d package(s) imported by a previous run"
+                             % (len(dscs) - len(pending)))
+            dscs = pending
+
+        if not args and not (options.allow_same_version or options.download):
+            return DscBulkImporter(repo, options, journal).run(dscs)
+
+        for dsc in dscs:
+            if self.importdsc(dsc):
+                return dsc
+            self._record(repo, journal, options, dsc)
+        return None
+
 
 def fetch_snapshots(pkg, downloaddir):
     "Fetch snapshots using debsnap from snapshots.debian.org"
@@ -97,6 +653,53 @@ def fetch_snapshots(pkg, downloaddir):
     return [os.path.join(downloaddir, dsc) for dsc in dscs]
 
 
+def find_repo(dirs, pkg):
+    """
+    Find the repository to import into: the one in the current
+    directory or the one a previous run created for I{pkg}
+
+    Sets I{dirs['pkg']} to the repository's path.
+
+    @return: the repository or C{None} if it doesn't exist yet
+    @rtype: L{GitRepository}
+    """
+    for path in [dirs['top'], os.path.join(dirs['top'], pkg)]:
+        try:
+            repo = GitRepository(path)
+        except GitRepositoryError:
+            continue
+        (clean, out) = repo.is_clean()
+        if not clean:
+            gbp.log.err("Repository has uncommitted changes, "
+                        "commit these first: ")
+            raise GbpError(out)
+        dirs['pkg'] = path
+        return repo
+    # no git repository there yet
+    dirs['pkg'] = os.path.join(dirs['top'], pkg)
+    return None
+
+
+def keep_downloads(dirs, pkg, done):
+    """
+    Remove the downloaded packages once everything got imported, keep
+    them around for the next run otherwise. They're recorded in the
+    journal as soon as the repository exists so even the packages
+    downloaded by a killed run get reused.
+    """
+    try:
+        journal = ImportJournal(GitRepository(dirs['pkg']))
+    except GitRepositoryError:
+        journal = None
+    if not done and journal:
+        gbp.log.info("Keeping downloaded packages in '%s', rerun to resume the import"
+                     % dirs['download'])
+        return
+    gbpc.RemoveTree(dirs['download'])()
+    if journal:
+        journal.forget_downloads(pkg)
+
+
 def set_gbp_conf_files():
     """
     Filter out all gbp.conf files that are local to the git repository and set
@@ -123,8 +726,8 @@ def main(argv):
     dirs = dict(top=os.path.abspath(os.curdir))
     dscs = []
     ret = 0
+    done = False
     verbose = False
-    dsc_key = cmp_to_key(DscCompareVersions())
     use_debsnap = False
 
     try:
@@ -157,33 +760,42 @@ def main(argv):
             print_help()
             raise GbpError
 
-        if use_debsnap:
-            dirs['tmp'] = os.path.abspath(tempfile.mkdtemp())
-            dscs = [DscFile.parse(f) for f in fetch_snapshots(pkg, dirs['tmp'])]
-
-        dscs.sort(key=dsc_key)
+        if not use_debsnap:
+            dscs.sort(key=dsc_key)
+            pkg = dscs[0].pkg
         importer = GitImportDsc(import_args)
 
-        try:
-            repo = GitRepository('.')
-            (clean, out) = repo.is_clean()
-            if not clean:
-                gbp.log.err("Repository has uncommitted changes, "
-                            "commit these first: ")
-                raise GbpError(out)
+        repo = find_repo(dirs, pkg)
+        journal = ImportJournal(repo) if repo else None
+        if use_debsnap:
+            dirs['download'] = journal.downloads(pkg) if journal else None
+            if dirs['download']:
+                gbp.log.info("Reusing snapshots of '%s' downloaded to '%s'" %
+                             (pkg, dirs['download']))
+                dscs = [DscFile.parse(f) for f in
+                        glob.glob(os.path.join(dirs['download'], '*.dsc'))]
             else:
-                dirs['pkg'] = dirs['top']
-        except GitRepositoryError:
-            # no git repository there yet
-            dirs['pkg'] = os.path.join(dirs['top'], dscs[0].pkg)
-
-        if importer.importdsc(dscs[0]):
-            raise GbpError("Failed to import '%s'" % dscs[0].dscfile)
-        os.chdir(dirs['pkg'])
-
-        for dsc in dscs[1:]:
-            if importer.importdsc(dsc):
+                dirs['download'] = os.path.abspath(tempfile.mkdtemp())
+                dscs = [DscFile.parse(f) for f in fetch_snapshots(pkg, dirs['download'])]
+                if journal:
+                    journal.record_downloads(pkg, dirs['download'])
+            dscs.sort(key=dsc_key)
+
+        if repo:
+            os.chdir(dirs['pkg'])
+        if not repo or repo.is_empty():
+            if importer.importdsc(dscs[0]):
                 raise GbpError("Failed to import '%s'" % dscs[0].dscfile)
+            os.chdir(dirs['pkg'])
+            if use_debsnap and not journal:
+                ImportJournal(GitRepository('.')).record_downloads(pkg, dirs['download'])
+            importer.record(dscs[0])
+            dscs = dscs[1:]
+
+        failed = importer.importdscs(dscs)
+        if failed:
+            raise GbpError("Failed to import '%s'" % failed.dscfile)
+        done = True
     except KeyboardInterrupt:
         ret = 1
         gbp.log.err("Interrupted. Aborting.")
@@ -192,9 +804,9 @@ def main(argv):
             gbp.log.err(err)
         ret = 1
     finally:
-        if 'tmp' in dirs:
-            gbpc.RemoveTree(dirs['tmp'])()
         os.chdir(dirs['top'])
+        if dirs.get('download'):
+            keep_downloads(dirs, pkg, done)
 
     if not ret:
         gbp.log.info('Everything imported under %s' % dirs['pkg'])
@@ -22,6 +22,7 @@ import shutil
 import sys
 import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
 import gbp.command_wrappers as gbpc
 from gbp.deb import (DebianPkgPolicy, parse_changelog_repo)
 from gbp.deb.format import DebianSourceFormat
@@ -34,10 +35,12 @@ from gbp.errors import GbpError
 from gbp.format import format_str
 from gbp.git.vfs import GitVfs
 import gbp.log
+from gbp.pkg.tarimport import TarImporter, TarImportError
 from gbp.scripts.common import ExitCodes, is_download, get_component_tarballs
 from gbp.scripts.common.import_orig import (orig_needs_repack, cleanup_tmp_tree,
                                             ask_package_name, ask_package_version,
-                                            repack_upstream, is_link_target, download_orig)
+                                            repack_upstream, repacked_tarball_name,
+                                            is_link_target, download_orig)
 from gbp.scripts.common.hook import Hook
 from gbp.deb.rollbackgit import RollbackDebianGitRepository
 
@@ -318,6 +321,60 @@ def unpack_tarballs(repo, name, sources, version, options):
     return (sources, tmpdir)
 
 
+def can_import_tarballs(sources, options):
+    """
+    Whether we can import the sources without unpacking them first
+    """
+    if options.postunpack:
+        return False
+    if orig_needs_repack(sources[0], options) and not sources[0].is_orig():
+        return False
+    for source in sources:
+        if source.is_dir() or os.path.splitext(source.path)[1] in ['.zip', '.xpi']:
+            return False
+    return True
+
+
+def import_tarballs(repo, name, sources, version, options):
+    """
+    Stream the tarballs into the repository
+
+    If the main tarball needs to be repacked to filter out files this
+    happens in parallel, streaming from the original tarball as well.
+
+    @return: the sources with the main tarball replaced by the repacked
+        one if needed and the imported tree or C{None} if the sources
+        need to be unpacked
+    @rtype: C{tuple}
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        repacked = None
+        if orig_needs_repack(sources[0], options):
+            gbp.log.debug("Filter pristine-tar: repacking '%s'" % sources[0].path)
+            repacked = executor.submit(sources[0].filter,
+                                       repacked_tarball_name(sources[0], name, version),
+                                       options.filters)
+        try:
+            with TarImporter(repo) as importer:
+                for source in sources:
+                    importer.add_tarball(source.path, options.filters,
+                                         subdir=getattr(source, 'component', None))
+                tree = importer.write_tree()
+        except TarImportError as err:
+            gbp.log.debug("Can't import tarballs directly: %s, unpacking" % err)
+            tree = None
+
+        if repacked:
+            try:
+                source = repacked.result()
+            except GbpError as err:
+                gbp.log.debug("%s, unpacking" % err)
+                return sources, None
+            if tree:
+                sources = [source] + sources[1:]
+    return sources, tree
+
+
 def set_bare_repo_options(options):
     """Modify options for import into a bare repository"""
     if options.pristine_tar or options.merge:
@@ -478,7 +535,11 @@ def main(argv):
         if repo.bare:
             set_bare_repo_options(options)
 
-        sources, tmpdir = unpack_tarballs(repo, name, sources, version, options)
+        tree = None
+        if can_import_tarballs(sources, options):
+            sources, tree = import_tarballs(repo, name, sources, version, options)
+        if not tree:
+            sources, tmpdir = unpack_tarballs(repo, name, sources, version, options)
 
         if options.verbose:
             for source in sources:
@@ -490,7 +551,7 @@ def main(argv):
 
         # Don't mess up our repo with git metadata from an upstream tarball
         try:
-            if os.path.isdir(os.path.join(sources[0].unpacked, '.git/')):
+            if not tree and os.path.isdir(os.path.join(sources[0].unpacked, '.git/')):
                 raise GbpError("The orig tarball contains .git metadata - giving up.")
         except OSError:
             pass
@@ -507,12 +568,20 @@ def main(argv):
 
             msg = upstream_import_commit_msg(options, version)
 
-            commit = repo.commit_dir(sources[0].unpacked,
-                                     msg=msg,
-                                     branch=import_branch,
-                                     other_parents=repo.vcs_tag_parent(options.vcs_tag, version),
-                                     create_missing_branch=is_empty,
-                                     )
+            other_parents = repo.vcs_tag_parent(options.vcs_tag, version)
+            if tree:
+                commit = repo.commit_tree_to_branch(tree,
+                                                    msg=msg,
+                                                    branch=import_branch,
+                                                    other_parents=other_parents,
+                                                    create_missing_branch=is_empty)
+            else:
+                commit = repo.commit_dir(sources[0].unpacked,
+                                         msg=msg,
+                                         branch=import_branch,
+                                         other_parents=other_parents,
+                                         create_missing_branch=is_empty,
+                                         )
 
             if options.pristine_tar:
                 if pristine_orig:
@@ -76,9 +76,7 @@ def generate_patches(repo, start, end, outdir, options):
             raise GbpError('%s not a valid tree-ish' % treeish)
 
     # Generate patches
-    rev_list = reversed(repo.get_commits(start, end))
-    for commit in rev_list:
-        info = repo.get_commit_info(commit)
+    for info in repo.iter_commit_info(start, end, reverse=True):
         # Parse 'gbp-pq-topic:'
         topic = parse_old_style_topic(info)
         cmds = {'topic': topic} if topic else {}
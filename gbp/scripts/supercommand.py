@@ -17,14 +17,15 @@
 #    <http://www.gnu.org/licenses/>
 """Supercommand for all gbp commands"""
 
-import glob
 import os
 import re
 import sys
 
-# Command is this module and common/ is shared code
-# so we don't allow these to be imported:
-invalid_modules = ['common', 'supercommand']
+import gbp.profiler
+
+# Command is this module, common/ is shared code and cmdindex is
+# the generated list of commands so we don't allow these to be imported:
+invalid_modules = ['common', 'supercommand', 'cmdindex']
 
 
 def sanitize(cmd):
@@ -38,7 +39,7 @@ def sanitize(cmd):
 def usage():
     print("""
 Usage:
-    gbp <command> [<args>]
+    gbp [--profile[=json]] <command> [<args>]
 
 The most commonly used commands are:
 
@@ -81,27 +82,86 @@ def pymod_to_cmd(mod):
 
 def get_available_commands(path):
     cmds = []
-    for f in glob.glob(os.path.join(path, '*.py')):
-        if os.path.basename(f) in ['__init__.py', 'supercommand.py']:
+    for f in os.listdir(path):
+        if (not f.endswith('.py') or
+                f[:-3] in invalid_modules or f == '__init__.py'):
             continue
-        cmds.append((pymod_to_cmd(f), f))
+        cmds.append((pymod_to_cmd(f), os.path.join(path, f)))
     return cmds
 
 
-def list_available_commands():
+def scripts_dir():
     mod = __import__('gbp.scripts', fromlist='main', level=0)
-    path = os.path.dirname(mod.__file__)
-    maxlen = 0
+    return os.path.dirname(mod.__file__)
+
+
+def scan_commands(path):
+    """
+    Find the commands in I{path} without importing them
+
+    @param path: directory containing the command modules
+    @type path: C{str}
+    @return: command names mapped to the module name and its docstring
+    @rtype: C{dict} of C{str} to C{tuple}
+    """
+    import ast
+
+    cmds = {}
+    for cmd, filename in get_available_commands(path):
+        with open(filename, encoding='utf-8') as f:
+            doc = ast.get_docstring(ast.parse(f.read(), filename), clean=False)
+        cmds[cmd] = ('gbp.scripts.%s' % sanitize(cmd), doc)
+    return cmds
+
+
+def write_command_index(filename=None):
+    """
+    Generate the command index used by L{get_command_index}
+
+    @param filename: file to write, defaults to I{gbp/scripts/cmdindex.py}
+    @type filename: C{str}
+    """
+    path = scripts_dir()
+    filename = filename or os.path.join(path, 'cmdindex.py')
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write("# Generated by 'make cmdindex', don't edit\n")
+        f.write('"""Index of the gbp commands"""\n\n')
+        f.write('commands = {\n')
+        for cmd, (module, doc) in sorted(scan_commands(path).items()):
+            f.write('    %r: (%r,\n' % (cmd, module))
+            f.write('%s%r),\n' % (' ' * (len(repr(cmd)) + 7), doc))
+        f.write('}\n')
+
+
+def get_command_index():
+    """
+    Get all commands without importing their modules
+
+    The index is the checked in L{gbp.scripts.cmdindex} module that
+    I{make cmdindex} regenerates, if it's missing or outdated we look
+    at the modules' sources.
+
+    @return: command names mapped to the module name and its docstring
+    @rtype: C{dict} of C{str} to C{tuple}
+    """
+    path = scripts_dir()
+    try:
+        from gbp.scripts.cmdindex import commands
+    except ImportError:
+        return scan_commands(path)
+    if set(commands) != set(cmd for cmd, _ in get_available_commands(path)):
+        return scan_commands(path)
+    return commands
+
+
+def list_available_commands():
+    path = scripts_dir()
+    cmds = sorted(get_command_index().items())
+    maxlen = max([len(cmd) for cmd, _ in cmds] or [0])
 
     print("Available commands in %s\n" % path)
-    cmds = sorted(get_available_commands(path))
-    for cmd in cmds:
-        if len(cmd[0]) > maxlen:
-            maxlen = len(cmd[0])
-    for cmd in cmds:
-        mod = import_command(cmd[0])
-        doc = mod.__doc__
-        print("    %s - %s" % (cmd[0].rjust(maxlen), doc))
+    for cmd, (_, doc) in cmds:
+        print("    %s - %s" % (cmd.rjust(maxlen), doc))
     print('')
 
 
@@ -112,6 +172,18 @@ def supercommand(argv=None):
         usage()
         return 1
 
+    try:
+        profile = gbp.profiler.parse_profile_arg(argv[1])
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if profile:
+        gbp.profiler.PROFILER.enable(report=profile)
+        argv = argv[:1] + argv[2:]
+        if len(argv) < 2:
+            usage()
+            return 1
+
     prg, cmd = argv[0:2]
     args = argv[1:]
 
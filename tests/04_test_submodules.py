@@ -18,6 +18,7 @@ from gbp.deb.git import DebianGitRepository
 from gbp.pkg import Compressor
 
 from gbp.scripts import buildpackage
+from gbp.scripts.common.exportdir import IncrementalExport
 from tests.testutils import ls_zip
 
 REPO = None
@@ -127,6 +128,19 @@ def test_dump_tree():
     ok_(not os.path.exists(os.path.join(dumpdir, SUBMODULES[0].name)))
 
 
+def test_incremental_export():
+    """Update an export dir incrementally across adding a submodule"""
+    dumpdir = TMPDIR.join("incremental")
+    os.mkdir(dumpdir)
+    ok_(buildpackage.dump_tree(REPO, dumpdir, "master^", True))
+    IncrementalExport(REPO, dumpdir, True).record("master^")
+    ok_(not os.path.exists(os.path.join(dumpdir, SUBMODULES[0].name)))
+    ok_(IncrementalExport(REPO, dumpdir, True).update("master"))
+    ok_(os.path.exists(os.path.join(dumpdir, SUBMODULES[0].name, TESTFILE_NAME)))
+    ok_(IncrementalExport(REPO, dumpdir, True).update("master^"))
+    ok_(not os.path.exists(os.path.join(dumpdir, SUBMODULES[0].name)))
+
+
 def test_create_tarballs():
     """Create an upstream tarball"""
     class MockedSource:
@@ -148,6 +162,11 @@ def test_create_tarballs():
     s = MockedSource('0.2')
     ok_(REPO.create_upstream_tarball_via_git_archive(s, str(TMPDIR), "HEAD", comp,
                                                      with_submodules=False))
+    # Tarball with submodules compressed using several threads
+    s = MockedSource('0.3')
+    ok_(REPO.create_upstream_tarball_via_git_archive(s, str(TMPDIR), "HEAD",
+                                                     Compressor('gzip', threads=4),
+                                                     with_submodules=True))
 
 
 def test_create_zip_archives():
@@ -176,6 +195,11 @@ def test_check_tarfiles():
     files = tarobj.getmembers()
     ok_(("test-0.2/%s" % TESTFILE_NAME) in [f.name for f in files])
     eq_(len(files), 6)
+    # Check threaded tarball with submodules
+    tarobj = tarfile.open(TMPDIR.join("test_0.3.orig.tar.gz"), 'r:*')
+    files = tarobj.getmembers()
+    ok_("test-0.3/.gitmodules" in [f.name for f in files])
+    eq_(len(files), 10)
 
 
 def test_add_whitespace_submodule():
@@ -11,12 +11,25 @@ from gbp.deb.source import DebianSource
 from gbp.scripts import export_orig
 from gbp.deb import DebianPkgPolicy
 from gbp.errors import GbpError
+from gbp.pkg import Archive
+
+
+class MockPristineTarIndex:
+    def __init__(self, subject):
+        self.newest = {'commit': 'abcdef',
+                       'message': subject,
+                       'files': [],
+                       'compression': Archive.parse_filename(subject)[2]}
+
+    def find(self, regexp):
+        return None
 
 
 class MockGitRepository:
     def __init__(self, with_branch=False, subject=None):
         self.with_branch = with_branch
         self.subject = subject
+        self.pristine_tar = self
 
     def has_pristine_tar_branch(self):
         return self.with_branch
@@ -27,11 +40,8 @@ class MockGitRepository:
     def pristine_tar_branch(self):
         'pristine-tar'
 
-    def grep_log(self, regex, branch, merges=True):
-        return None
-
-    def get_commit_info(self, commit):
-        return {'subject': self.subject}
+    def index(self, branch=None):
+        return MockPristineTarIndex(self.subject)
 
 
 class MockedSource(DebianSource):
@@ -10,6 +10,7 @@ import tarfile
 import unittest
 import zipfile
 
+from gbp.errors import GbpError
 from gbp.pkg import UpstreamSource
 
 
@@ -72,6 +73,22 @@ class TestTar(unittest.TestCase):
         self._check_tar(repacked, ["gbp/errors.py"],
                                   ["gbp/__init__.py"])
 
+    def test_filter(self):
+        """Check if filtering a tarball without unpacking it works"""
+        orig = self.source.pack(self.tmpdir.join("gbp_0.1.tar.bz2"))
+        target = self.tmpdir.join("gbp_0.1.gbp.tar.bz2")
+        filtered = orig.filter(target, ["__init__.py", "scripts"])
+        self.assertEqual(filtered.path, target)
+        self.assertEqual(filtered.is_orig(), True)
+        self._check_tar(filtered, ["gbp/errors.py"],
+                                  ["gbp/__init__.py", "gbp/scripts/buildpackage.py"])
+
+    def test_filter_unsupported(self):
+        """Check that only tarballs can be filtered"""
+        with self.assertRaises(GbpError):
+            self.source.filter(self.tmpdir.join("gbp_0.1.tar.bz2"), [])
+        self.assertFalse(os.path.exists(self.tmpdir.join("gbp_0.1.tar.bz2")))
+
 
 class TestZip(unittest.TestCase):
     """Test if unpacking zip archives works"""
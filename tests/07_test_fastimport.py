@@ -4,10 +4,12 @@
 
 from . import context
 
+import io
 import os
 
 import gbp.log
 import gbp.git
+from gbp.git.modifier import GitModifier
 
 repo = None
 fastimport = None
@@ -64,3 +66,35 @@ def test_result():
     assert os.path.exists(testfile), "%s doesn't exist" % testfile
     assert os.path.lexists(testlink), "%s doesn't exist" % testlink
     assert os.readlink(testlink) == tf_name
+
+
+def test_add_commit():
+    """Add commits and a tag by mark via fastimport"""
+    ident = GitModifier('Joey Ramone', 'joey@example.com', '1 +0000')
+    parent = repo.rev_parse('master')
+    fi = gbp.git.FastImport(repo)
+    blob = fi.add_blob(io.BytesIO(b'content'), 7)
+    first = fi.add_commit('refs/heads/other', [('100644', blob, '"quoted')],
+                          "first", ident, parents=[parent])
+    fi.add_commit('refs/heads/other', [('100755', blob, 'dir/exec')],
+                  "second", ident, parents=[first])
+    fi.add_tag('other-tag', first, ident, "a tag\n")
+    assert fi.close() == 0
+
+    assert repo.get_commit_info('other')['subject'] == 'second'
+    assert repo.rev_parse('other~2') == parent
+    assert [(e[0], e[3]) for e in repo.list_tree('other', recurse=True)] == [('100755', b'dir/exec')]
+    assert [e[3] for e in repo.list_tree('other-tag')] == [b'"quoted']
+    assert repo.get_obj_type('other-tag') == 'tag'
+    assert repo.rev_parse('other-tag^{}') == repo.rev_parse('other~1')
+
+
+def test_checkpoint():
+    """Refs get updated on checkpoint"""
+    ident = GitModifier('Joey Ramone', 'joey@example.com', '1 +0000')
+    fi = gbp.git.FastImport(repo)
+    fi.add_commit('refs/heads/checkpointed', repo.rev_parse('master^{tree}'),
+                  "checkpointed", ident)
+    fi.checkpoint()
+    assert repo.has_branch('checkpointed')
+    assert fi.close() == 0
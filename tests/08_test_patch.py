@@ -2,12 +2,15 @@
 
 """Test L{Patch} class"""
 
-from . import context  # noqa: 401
+from . import context
 
 import os
 import unittest
+from unittest import mock
 
-from gbp.patch_series import Patch, Dep3Patch
+from gbp.errors import GbpError
+from gbp.git.mailinfo import mailinfo
+from gbp.patch_series import Patch, Dep3Patch, PatchSeries
 
 
 class TestPatch(unittest.TestCase):
@@ -133,3 +136,69 @@ class TestMarkerOnly(unittest.TestCase):
         self.assertTrue(os.path.exists(patchfile))
         p = Dep3Patch(patchfile)
         self.assertEqual("916545", p.subject)
+
+
+class TestMailInfo(unittest.TestCase):
+    data_dir = os.path.splitext(__file__)[0] + '_data'
+
+    def setUp(self):
+        self.tmpdir = context.new_tmpdir(__name__)
+
+    def tearDown(self):
+        context.teardown()
+
+    def _write(self, name, data):
+        path = self.tmpdir.join(name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_native(self):
+        """Native header parsing gives the same result as git mailinfo"""
+        headers = [Patch(os.path.join(self.data_dir, name))._read_header()
+                   for name in sorted(os.listdir(self.data_dir))]
+        headers += [b'From: "Doe, John" <jd@example.com> (x)\n'
+                    b'Subject: [PATCH] =?iso-8859-1?q?B=E4r?= =?utf-8?b?w6Q=?=\n'
+                    b' folded\n'
+                    b'Content-Type: text/plain; charset=iso-8859-1\n\n'
+                    b'From: In Body <ib@example.com>\n\n'
+                    b'B\xe4r\n',
+                    b'From: foo@example.com\n'
+                    b'Content-Transfer-Encoding: quoted-printable\n\n'
+                    b'a=3Db=\nc\r\n--- a/foo\n',
+                    b'Description: no mail header\n'
+                    b'Date: 1 Jan 2000\n']
+        for header in headers:
+            if header.strip():
+                self.assertEqual(mailinfo(header),
+                                 Patch('foo')._read_git_mailinfo(header))
+
+    def test_fallback(self):
+        """Encodings the native parser can't handle are left to git mailinfo"""
+        path = self._write('koi8.patch', b'From: =?koi8-r?b?8NLJ18XU?= <p@example.com>\n'
+                                         b'Subject: foo\n\nbar\n')
+        p = Patch(path)
+        with mock.patch.object(p, '_read_git_mailinfo',
+                               wraps=p._read_git_mailinfo) as git_mailinfo:
+            self.assertEqual('Привет', p.author)
+        git_mailinfo.assert_called_once()
+        self.assertEqual('foo', p.subject)
+        self.assertEqual('bar\n', p.long_desc)
+
+    def test_series(self):
+        """Headers of a series are read upfront"""
+        for i in range(10):
+            self._write('%d.patch' % i, b'From: foo <foo@example.com>\n'
+                                        b'Subject: Patch %d\n\nDesc\n---\n' % i)
+        self._write('broken.patch', b'Subject: =?x-unknown?q?a?=\n\n')
+        series = self._write('series', b''.join(b'%d.patch\n' % i for i in range(10)) +
+                             b'broken.patch\nmissing.patch\n')
+        queue = PatchSeries.read_series_file(series)
+        self.assertEqual(['Patch %d' % i for i in range(10)],
+                         [p.info['subject'] for p in queue[:10]])
+        self.assertEqual('Desc\n', queue[9].long_desc)
+        self.assertIsNone(queue[10].info)
+        with self.assertRaises(GbpError):
+            queue[10].subject
+        self.assertEqual({}, queue[11].info)
+        self.assertEqual('missing', queue[11].subject)
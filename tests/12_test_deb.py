@@ -5,7 +5,9 @@
 from . import context  # noqa: 401
 from . import testutils
 
+import hashlib
 import os
+import shutil
 import tempfile
 import platform
 import unittest
@@ -14,6 +16,7 @@ import gbp.deb
 
 from gbp.deb.dscfile import DscFile
 from gbp.command_wrappers import CommandExecFailed
+from gbp.errors import GbpError
 
 
 class Test30DscFile(unittest.TestCase):
@@ -135,6 +138,61 @@ Files:
         self.assertEqual(dsc.additional_tarballs, {}),
         self.assertEquals(dsc.sigs, [])
 
+    def test_dscfile_checksums(self):
+        """Test parsing the checksums of a dsc file"""
+        dsc = DscFile.parse(self.dscfile.name)
+        fromdir = os.path.dirname(self.dscfile.name)
+        self.assertEqual(sorted(dsc.files), [os.path.join(fromdir, 'latencytop_0.5.diff.gz'),
+                                             os.path.join(fromdir, 'latencytop_0.5.orig.tar.gz')])
+        size, checksums = dsc.files[os.path.join(fromdir, 'latencytop_0.5.diff.gz')]
+        self.assertEqual(size, 1978)
+        self.assertEqual(checksums, {
+            'md5': 'bf7afb3e0d68b0e33e5abf4f1542af71',
+            'sha1': '1fa907254c61c73679fd173c828327e9a2273c31',
+            'sha256': '66342c4d55ae31e529bdcdf88d41a7d114b355f438b0d10efb107f3aef1a0db6'})
+
+
+class TestDscFileVerify(unittest.TestCase):
+    """Test L{gbp.deb.DscFile.verify}"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.files = {'foo_1.0.orig.tar.gz': b'upstream',
+                      'foo_1.0-1.debian.tar.xz': b'debian'}
+        for name, data in self.files.items():
+            with open(os.path.join(self.tmpdir, name), 'wb') as f:
+                f.write(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _dsc(self, files):
+        content = "Format: 3.0 (quilt)\nSource: foo\nVersion: 1.0-1\nChecksums-Sha256:\n"
+        for name, data in files.items():
+            content += " %s %d %s\n" % (hashlib.sha256(data).hexdigest(), len(data), name)
+        content += "Files:\n"
+        for name, data in files.items():
+            content += " %s %d %s\n" % (hashlib.md5(data).hexdigest(), len(data), name)
+        filename = os.path.join(self.tmpdir, 'foo_1.0-1.dsc')
+        with open(filename, 'w') as f:
+            f.write(content)
+        return DscFile.parse(filename)
+
+    def test_verify(self):
+        """Test verifying intact files"""
+        self._dsc(self.files).verify()
+
+    def test_verify_mismatch(self):
+        """Test verifying modified and missing files"""
+        dsc = self._dsc(dict(self.files, **{'foo_1.0-1.debian.tar.xz': b'Debian',
+                                            'foo_1.0.orig-bar.tar.gz': b'bar'}))
+        with self.assertRaises(GbpError) as cm:
+            dsc.verify()
+        self.assertIn("SHA256 checksum of '%s/foo_1.0-1.debian.tar.xz' doesn't match" % self.tmpdir,
+                      str(cm.exception))
+        self.assertIn("Can't read '%s/foo_1.0.orig-bar.tar.gz'" % self.tmpdir, str(cm.exception))
+        self.assertNotIn("orig.tar.gz'", str(cm.exception))
+
 
 @testutils.skip_without_cmd('dpkg')
 class TestDpkgCompareVersions(unittest.TestCase):
@@ -41,12 +41,22 @@ class StubGitImportDsc(object):
         """
         return 1 if dsc.filename == self.failfile else 0
 
+    def record(self, dsc):
+        pass
+
+    def importdscs(self, dscs):
+        for dsc in dscs:
+            if self.importdsc(dsc):
+                return dsc
+        return None
+
 
 class DscStub(object):
     def __init__(self, filename, version):
         self.filename = filename
         self.version = version
         self.dscfile = filename
+        self.pkg = 'pkg'
 
     @classmethod
     def parse(cls, filename):
@@ -16,6 +16,7 @@
 """Test L{gbp} command wrapper"""
 
 import unittest
+from unittest import mock
 import gbp.scripts.supercommand
 
 from tests.testutils import capture_stdout, capture_stderr
@@ -57,3 +58,13 @@ class TestSuperCommand(unittest.TestCase):
     def test_missing_arg(self):
         self.assertEqual(gbp.scripts.supercommand.supercommand(
                          ['argv0']), 1)
+
+    def test_profile(self):
+        """Test the global profile option"""
+        with capture_stderr():
+            self.assertEqual(gbp.scripts.supercommand.supercommand(
+                             ['argv0', '--profile=xml', 'pq']), 1)
+        with mock.patch('gbp.profiler.PROFILER.enable') as enable:
+            self.assertEqual(gbp.scripts.supercommand.supercommand(
+                             ['argv0', '--profile']), 1)
+            enable.assert_called_once_with(report='text')
@@ -1,8 +1,12 @@
 # vim: set fileencoding=utf-8 :
 
 import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 from gbp.config import GbpOptionParser, GbpOptionGroup
+from gbp.config_cache import ConfigCache
 from .testutils import GbpLogTester
 
 
@@ -132,3 +136,89 @@ class TestConfigParser(unittest.TestCase, GbpLogTester):
         self.assertEquals(len(parser.valid_options), 1)
         self.assertTrue(parser.has_option("--withshort"))
         self.assertTrue(parser.has_option("-S"))
+
+    def test_profile_option(self):
+        """The profile option's format is optional"""
+        parser = GbpOptionParser('cmd', prefix='git-')
+        with mock.patch('gbp.profiler.PROFILER.enable') as enable:
+            options, args = parser.parse_args(['--git-profile', 'foo'])
+            enable.assert_called_once_with(report='text')
+            self.assertEqual(args, ['foo'])
+        with mock.patch('gbp.profiler.PROFILER.enable') as enable:
+            parser.parse_args(['--git-profile=json'])
+            enable.assert_called_once_with(report='json')
+        with mock.patch('gbp.profiler.PROFILER.enable') as enable:
+            options, args = parser.parse_args(['--', '--git-profile'])
+            enable.assert_not_called()
+
+
+class TestConfigCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='gbp_%s_' % __name__)
+        self.confname = os.path.join(self.tmpdir, 'gbp.conf')
+        self._write_conf('foo')
+        self.env = mock.patch.dict(os.environ,
+                                   {'GBP_CONF_FILES': self.confname,
+                                    'XDG_CACHE_HOME': self.tmpdir,
+                                    'GBP_CONFIG_CACHE': '1'})
+        self.env.start()
+        ConfigCache.clear()
+
+    def tearDown(self):
+        self.env.stop()
+        ConfigCache.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def _write_conf(self, value):
+        with open(self.confname, 'w') as f:
+            f.write("[DEFAULT]\ndefault_option = %s\n" % value)
+        # Make sure the file isn't considered too new to be cached
+        os.utime(self.confname, (1000000000, 1000000000))
+
+    def test_cache_hit(self):
+        """A cached config doesn't need to look up the repository"""
+        parser = GbpOptionParser('cmd')
+        self.assertEqual(parser.config['default_option'], 'foo')
+        self.assertEqual(len(os.listdir(os.path.join(self.tmpdir, 'git-buildpackage', 'config'))), 1)
+
+        # From memory and from the cache file
+        for clear in [False, True]:
+            if clear:
+                ConfigCache.clear()
+            with mock.patch('gbp.config.GitRepository') as repo:
+                parser = GbpOptionParser('cmd')
+                repo.assert_not_called()
+            self.assertEqual(parser.config['default_option'], 'foo')
+
+    def test_percent_sign(self):
+        """Values that can't be interpolated are read from cache as well"""
+        self._write_conf('date +%s')
+        for clear in [False, True]:
+            if clear:
+                ConfigCache.clear()
+            parser = GbpOptionParser('cmd')
+            self.assertEqual(parser.config['default_option'], 'date +%s')
+
+    def test_prune(self):
+        """Only the newest cache files are kept"""
+        cache_dir = os.path.join(self.tmpdir, 'git-buildpackage', 'config')
+        with mock.patch.object(ConfigCache, 'max_entries', 2):
+            for i in range(4):
+                subdir = os.path.join(self.tmpdir, str(i))
+                os.mkdir(subdir)
+                with mock.patch('os.getcwd', return_value=subdir):
+                    GbpOptionParser('cmd')
+        self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+    def test_cache_invalidation(self):
+        """Changing a config file invalidates the cache"""
+        GbpOptionParser('cmd')
+        self._write_conf('barbaz')
+        parser = GbpOptionParser('cmd')
+        self.assertEqual(parser.config['default_option'], 'barbaz')
+
+    def test_cache_disabled(self):
+        """The cache can be disabled"""
+        os.environ['GBP_CONFIG_CACHE'] = '0'
+        GbpOptionParser('cmd')
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, 'git-buildpackage')))
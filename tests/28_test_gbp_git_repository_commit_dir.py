@@ -40,3 +40,68 @@ class TestGitRepositoryCommitDir(DebianGitTestRepo):
         out, dummy, ret = self.repo._git_inout('reflog', [])
         self.assertEquals(ret, 0)
         self.assertIn(b'HEAD@{0}: gbp: foo\n', out)
+
+    def _add_tree(self, index_file, parallel):
+        try:
+            os.unlink(index_file)
+        except OSError:
+            pass
+        if parallel:
+            self.assertTrue(self.repo._index_dir(self.content, index_file, jobs=3))
+        else:
+            self.repo.add_files('.', force=True, index_file=index_file,
+                                work_tree=self.content)
+        return self.repo.write_tree(index_file)
+
+    def test_parallel_index(self):
+        """Hashing in parallel must result in the same tree as git add"""
+        os.makedirs(os.path.join(self.content, 'sub', 'dir'))
+        os.mkdir(os.path.join(self.content, 'empty'))
+        for i in range(10):
+            with open(os.path.join(self.content, 'sub', 'file%d' % i), 'w') as f:
+                f.write('content%d\n' % i * i)
+        with open(os.path.join(self.content, 'sub', 'dir', 'script'), 'w') as f:
+            f.write('#!/bin/sh\n')
+        os.chmod(os.path.join(self.content, 'sub', 'dir', 'script'), 0o755)
+        with open(os.path.join(self.content, '.gitignore'), 'w') as f:
+            f.write('*\n')
+        os.symlink('sub/dir', os.path.join(self.content, 'link'))
+        os.symlink('doesnotexist', os.path.join(self.content, 'sub', 'dangling'))
+        with open(os.path.join(self.content, b'\xe4'.decode(errors='surrogateescape')), 'w') as f:
+            f.write('latin1 name')
+
+        index_file = os.path.join(self.repo.git_dir, 'test_index')
+        self.repo._hash_min_files = 2
+        self.assertEqual(self._add_tree(index_file, True),
+                         self._add_tree(index_file, False))
+
+    def test_nested_repo(self):
+        """Nested git repositories are left to git add"""
+        os.mkdir(os.path.join(self.content, '.git'))
+        index_file = os.path.join(self.repo.git_dir, 'test_index')
+        self.assertFalse(self.repo._index_dir(self.content, index_file))
+
+    def test_quoted_name(self):
+        """Names git would C-unquote are left to git add"""
+        with open(os.path.join(self.content, '"quoted"'), 'w') as f:
+            f.write('quoted')
+        index_file = os.path.join(self.repo.git_dir, 'test_index')
+        self.assertFalse(self.repo._index_dir(self.content, index_file))
+        self.repo.commit_dir(self.content,
+                             'quoted',
+                             'master',
+                             create_missing_branch=True)
+        self.assertEquals(self.repo.show('master:"quoted"'), b'quoted')
+
+    def test_relative_dir(self):
+        """Directories relative to the current one work as well"""
+        cwd = os.getcwd()
+        os.chdir(str(self.tmpdir))
+        try:
+            self.repo.commit_dir(os.path.join('..', os.path.basename(str(self.tmpdir)), 'new'),
+                                 'relative',
+                                 'master',
+                                 create_missing_branch=True)
+        finally:
+            os.chdir(cwd)
+        self.assertEquals(self.repo.show('master:file1'), b'content1')
@@ -9,10 +9,12 @@ also make up the API documentation.
 
 from . import context  # noqa: 401
 from . testutils import skip_without_cmd
+import email
 import os
 import unittest
+from unittest import mock
 
-from gbp.deb.changelog import ChangeLog
+from gbp.deb.changelog import ChangeLog, parse_first_section
 from gbp.command_wrappers import CommandExecFailed
 
 
@@ -45,6 +47,73 @@ class TestEncoding(unittest.TestCase):
         self.assertEquals('\0' in cl.get_changes(), False)
 
 
+CHANGELOG = """foo (1.0-2) unstable  experimental; urgency=MEDIUM (high)
+
+  * Second upload (Closes: #12, bug#3)
+    closes:#9
+\t
+  * More
+   \n
+ -- J\u00f6rg  Doe <jd@example.com>  Tue, 18 Oct 2011 10:15:22 -0130
+
+foo (1.0-1) unstable; urgency=low
+
+  * Initial release
+
+ -- J\u00f6rg Doe <jd@example.com>  Mon, 17 Oct 2011 10:15:22 +0200
+"""
+
+
+@skip_without_cmd('dpkg-parsechangelog')
+class TestNativeParser(unittest.TestCase):
+    """Test the native changelog parser against dpkg-parsechangelog"""
+    def _dpkg_fields(self, contents):
+        cl = ChangeLog(contents)
+        cp = email.message_from_string(cl._run_parsechangelog())
+        return {k: v.lstrip('\n') for k, v in cp.items()}
+
+    def _check(self, contents):
+        fields = parse_first_section(contents)
+        self.assertIsNotNone(fields)
+        self.assertEqual(dict(fields), self._dpkg_fields(contents))
+
+    def test_changelog(self):
+        """Fields match the ones dpkg-parsechangelog outputs"""
+        self._check(CHANGELOG)
+        self._check(CHANGELOG.replace('\n', '\r\n'))
+        self._check(CHANGELOG.replace('; urgency=MEDIUM (high)', ';'))
+
+    def test_own_changelog(self):
+        """Our own long changelog"""
+        changelog = os.path.join(context.projectdir, 'debian', 'changelog')
+        if not os.path.exists(changelog):
+            self.skipTest("No changelog found")
+        with open(changelog, encoding='utf-8') as f:
+            self._check(f.read())
+
+    def test_fallback(self):
+        """Unusual changelogs are handled by dpkg-parsechangelog"""
+        for contents in [CHANGELOG.replace('urgency=MEDIUM (high)', 'urgency=low, binary-only=yes'),
+                         CHANGELOG.replace('  * More', '\t* More'),
+                         CHANGELOG.replace('Tue, 18 Oct', 'Tue, 31 Feb'),
+                         CHANGELOG.replace('Oct', 'Okt')]:
+            self.assertIsNone(parse_first_section(contents))
+            cl = ChangeLog(contents)
+            self.assertEqual(cl.version, '1.0-2')
+            self.assertEqual(cl.email, 'jd@example.com')
+
+    def test_no_fork(self):
+        """Well formed changelogs are parsed in process"""
+        with mock.patch.object(ChangeLog, '_run_parsechangelog') as run:
+            cl = ChangeLog(CHANGELOG)
+            self.assertEqual(cl.version, '1.0-2')
+            self.assertEqual(cl.upstream_version, '1.0')
+            self.assertEqual(cl.author, 'J\u00f6rg Doe')
+            self.assertEqual(cl['Closes'], '3 9 12')
+            self.assertEqual([s.version for s in cl.sections], ['1.0-2', '1.0-1'])
+        run.assert_not_called()
+
+
 @skip_without_cmd('debchange')
 class Test(unittest.TestCase):
     def setUp(self):
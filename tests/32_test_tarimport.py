@@ -0,0 +1,129 @@
+# vim: set fileencoding=utf-8 :
+
+"""Test the L{TarImporter} class"""
+
+from . import context
+
+import io
+import os
+import shutil
+import tarfile
+import unittest
+
+import gbp.git
+from gbp.deb.upstreamsource import DebianUpstreamSource, DebianAdditionalTarball
+from gbp.pkg.tarimport import TarImporter, TarImportError
+
+
+class TestTarImporter(unittest.TestCase):
+    """Importing tarballs must give the same tree as unpacking them"""
+    def setUp(self):
+        self.tmpdir = context.new_tmpdir(__name__)
+        self.repo = gbp.git.GitRepository.create(self.tmpdir.join('repo'))
+
+    def tearDown(self):
+        context.teardown()
+
+    def _add(self, tar, name, type=tarfile.REGTYPE, data=b'', mode=0o644, linkname=''):
+        info = tarfile.TarInfo(name)
+        info.type = type
+        info.mode = mode
+        info.linkname = linkname
+        info.size = len(data) if type == tarfile.REGTYPE else 0
+        tar.addfile(info, io.BytesIO(data) if info.size else None)
+
+    def _tarball(self, name, toplevel, extra=[], root=None):
+        path = self.tmpdir.join(name)
+        with tarfile.open(path, 'w:gz') as tar:
+            if root:
+                self._add(tar, root, tarfile.DIRTYPE, mode=0o755)
+            self._add(tar, toplevel, tarfile.DIRTYPE, mode=0o755)
+            self._add(tar, toplevel + '/README', data=b'readme\n')
+            self._add(tar, toplevel + '/configure', data=b'#!/bin/sh\n', mode=0o755)
+            self._add(tar, toplevel + '/src/main.c', data=b'int main() {}\n')
+            self._add(tar, toplevel + '/src/main.o', data=b'\x7fELF')
+            self._add(tar, toplevel + '/empty', tarfile.DIRTYPE, mode=0o755)
+            self._add(tar, toplevel + '/link', tarfile.SYMTYPE, linkname='src/main.c')
+            self._add(tar, toplevel + '/hardlink', tarfile.LNKTYPE,
+                      linkname=toplevel + '/README')
+            for member in extra:
+                self._add(tar, *member)
+        return path
+
+    def _unpacked_tree(self, sources, filters):
+        unpack_dir = self.tmpdir.join('unpack')
+        os.mkdir(unpack_dir)
+        sources[0].unpack(unpack_dir, filters)
+        for source in sources[1:]:
+            source.unpack(sources[0].unpacked, filters)
+        index_file = os.path.join(self.repo.git_dir, 'test_index')
+        self.repo.add_files('.', force=True, index_file=index_file,
+                            work_tree=sources[0].unpacked)
+        return self.repo.write_tree(index_file)
+
+    def _imported_tree(self, sources, filters):
+        with TarImporter(self.repo) as importer:
+            for source in sources:
+                importer.add_tarball(source.path, filters,
+                                     subdir=getattr(source, 'component', None))
+            return importer.write_tree()
+
+    def _check(self, sources, filters=[]):
+        self.assertEqual(self._imported_tree(sources, filters),
+                         self._unpacked_tree(sources, filters))
+
+    def test_tarball(self):
+        """Import a single tarball"""
+        self._check([DebianUpstreamSource(self._tarball('foo_1.0.orig.tar.gz', 'foo-1.0'))])
+
+    def test_filters(self):
+        """Import with filters"""
+        self._check([DebianUpstreamSource(self._tarball('foo_1.0.orig.tar.gz', 'foo-1.0'))],
+                    ['*.o', 'empty', 'src'])
+
+    def test_filters_dot_prefix(self):
+        """Filters match member names as stored, including a leading './'"""
+        source = DebianUpstreamSource(self._tarball('foo_1.0.orig.tar.gz', './foo-1.0'))
+        for filters in (['./foo-1.0/configure'], ['./*.o'], ['foo-1.0/empty'],
+                        ['./configure'], ['foo-1.0/./empty']):
+            with self.subTest(filters=filters):
+                self._check([source], filters)
+            shutil.rmtree(self.tmpdir.join('unpack'))
+            os.unlink(os.path.join(self.repo.git_dir, 'test_index'))
+
+    def test_root_member(self):
+        """The archive's './' root member doesn't count as toplevel dir"""
+        for root in ['./', '.']:
+            with self.subTest(root=root):
+                tarball = self._tarball('foo_1.0.orig.tar.gz', './foo-1.0', root=root)
+                with TarImporter(self.repo) as importer:
+                    importer.add_tarball(tarball)
+                    tree = importer.write_tree()
+                self.assertIn('README', [name.decode() for _, _, _, name
+                                         in self.repo.list_tree(tree)])
+                self._check([DebianUpstreamSource(tarball)])
+            shutil.rmtree(self.tmpdir.join('unpack'))
+            os.unlink(os.path.join(self.repo.git_dir, 'test_index'))
+
+    def test_no_toplevel(self):
+        """Tarballs without a single toplevel dir are imported as is"""
+        path = self._tarball('foo_1.0.orig.tar.gz', 'foo-1.0',
+                             [('other', tarfile.DIRTYPE, b'', 0o755)])
+        self._check([DebianUpstreamSource(path)])
+
+    def test_components(self):
+        """Import with a component tarball"""
+        main = self._tarball('foo_1.0.orig.tar.gz', 'foo-1.0',
+                             [('foo-1.0/comp/old', tarfile.REGTYPE, b'old')])
+        comp = self._tarball('foo_1.0.orig-comp.tar.gz', 'comp-1.0')
+        self._check([DebianUpstreamSource(main),
+                     DebianAdditionalTarball(comp, 'comp')])
+
+    def test_unsupported(self):
+        """Special files and git metadata are left to unpacking"""
+        for extra in [('foo-1.0/fifo', tarfile.FIFOTYPE),
+                      ('foo-1.0/.git/config', tarfile.REGTYPE),
+                      ('../escape', tarfile.REGTYPE)]:
+            path = self._tarball('foo_1.0.orig.tar.gz', 'foo-1.0', [extra])
+            with self.assertRaises(TarImportError):
+                self._imported_tree([DebianUpstreamSource(path)], [])
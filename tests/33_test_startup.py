@@ -0,0 +1,60 @@
+# vim: set fileencoding=utf-8 :
+
+"""Test that L{gbp} starts up quickly"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+import gbp.scripts.supercommand
+from gbp.scripts.cmdindex import commands
+
+topdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that are expensive to import and only needed for some
+# operations
+heavy_modules = ['email.message', 'email.utils', 'dateutil.parser']
+
+
+def run_gbp(args, code=''):
+    """Run gbp in a fresh interpreter and execute I{code} afterwards"""
+    script = ("import sys\n"
+              "from gbp.scripts.supercommand import supercommand\n"
+              "try:\n"
+              "    supercommand(['gbp'] + sys.argv[1:])\n"
+              "except SystemExit:\n"
+              "    pass\n" + code)
+    env = dict(os.environ, PYTHONPATH=topdir, GBP_CONFIG_CACHE='0')
+    return subprocess.run([sys.executable, '-c', script] + args,
+                          stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                          env=env, check=True).stdout
+
+
+def loaded_modules(args):
+    out = run_gbp(args, "print('@@' + ' '.join(sys.modules))\n")
+    return out.decode().rsplit('@@', 1)[1].split()
+
+
+class TestStartup(unittest.TestCase):
+    def test_command_index(self):
+        """The generated command index is up to date (run 'make cmdindex')"""
+        path = gbp.scripts.supercommand.scripts_dir()
+        self.assertEqual(commands, gbp.scripts.supercommand.scan_commands(path))
+
+    def test_trivial_commands(self):
+        """Listing commands doesn't import any command modules"""
+        modules = loaded_modules(['--list-cmds'])
+        for mod in modules:
+            self.assertFalse(mod.startswith('gbp.scripts.') and
+                             mod not in ['gbp.scripts.supercommand',
+                                         'gbp.scripts.cmdindex'], mod)
+        for mod in heavy_modules + ['gbp.config', 'gbp.git', 'glob', 'json', 'tempfile']:
+            self.assertNotIn(mod, modules)
+
+    def test_help(self):
+        """Heavy modules are imported lazily"""
+        for cmd in ['buildpackage', 'pq', 'import-orig']:
+            modules = loaded_modules([cmd, '--help'])
+            for mod in heavy_modules:
+                self.assertNotIn(mod, modules, "%s imported by %s" % (mod, cmd))
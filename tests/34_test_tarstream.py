@@ -0,0 +1,112 @@
+# vim: set fileencoding=utf-8 :
+
+"""Test the L{TarConcatenator} class"""
+
+import io
+import tarfile
+import unittest
+
+from gbp.pkg.tarimport import tar_exclude_matcher
+from gbp.pkg.tarstream import TarConcatenator, TarStreamError
+
+
+def make_tar(files, format=tarfile.PAX_FORMAT):
+    out = io.BytesIO()
+    with tarfile.open(fileobj=out, mode='w', format=format) as tar:
+        for name, data in files:
+            info = tarfile.TarInfo(name)
+            if data is None:
+                info.type = tarfile.DIRTYPE
+                tar.addfile(info)
+            else:
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+    return out.getvalue()
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def read_tar(data):
+    with tarfile.open(fileobj=io.BytesIO(data), mode='r:') as tar:
+        return [(m.name, tar.extractfile(m).read() if m.isreg() else None)
+                for m in tar]
+
+
+class TestTarConcatenator(unittest.TestCase):
+    first = [('foo', None),
+             ('foo/a', b'a' * 1000),
+             ('foo/' + 'long/' * 30 + 'name', b'long'),
+             ('foo/empty', b'')]
+    second = [('foo/sub', None),
+              ('foo/sub/ä', b'b' * 512),
+              ('foo/sub/c', b'c' * 70000)]
+
+    def test_concatenate(self):
+        """All members end up in a single archive"""
+        for format in [tarfile.PAX_FORMAT, tarfile.GNU_FORMAT]:
+            for size in [1, 511, 512, 4096, 100000]:
+                out = io.BytesIO()
+                with TarConcatenator(out, bufsize=1000) as tar:
+                    tar.add(chunked(make_tar(self.first, format), size))
+                    tar.add(chunked(make_tar(self.second, format), size))
+                data = out.getvalue()
+                self.assertEqual(len(data) % 10240, 0)
+                self.assertEqual(len(data), tar.written)
+                self.assertEqual(read_tar(data), self.first + self.second)
+
+    def test_empty(self):
+        """Concatenating nothing gives an empty archive"""
+        out = io.BytesIO()
+        with TarConcatenator(out) as tar:
+            tar.add([make_tar([])])
+        self.assertEqual(read_tar(out.getvalue()), [])
+
+    def test_truncated(self):
+        """Truncated streams are detected"""
+        data = make_tar(self.second)
+        for length in [100, 1024, 1536]:
+            with self.assertRaises(TarStreamError):
+                TarConcatenator(io.BytesIO()).add([data[:length]])
+
+    def test_corrupt(self):
+        """Corrupt headers are detected"""
+        data = bytearray(make_tar(self.first, tarfile.GNU_FORMAT))
+        data[0] ^= 1
+        with self.assertRaises(TarStreamError):
+            TarConcatenator(io.BytesIO()).add([bytes(data)])
+
+    def test_exclude(self):
+        """Excluded members and their extended headers are left out"""
+        members = self.first + [('foo/' + 'long/' * 30 + 'skip.pyc', b'x' * 600),
+                                ('foo/' + 'long/' * 30 + 'keep.py', b'keep')]
+        for format in [tarfile.PAX_FORMAT, tarfile.GNU_FORMAT]:
+            out = io.BytesIO()
+            with TarConcatenator(out, exclude=tar_exclude_matcher(['*.pyc', 'empty'])) as tar:
+                tar.add(chunked(make_tar(members, format), 700))
+            self.assertEqual(read_tar(out.getvalue()),
+                             self.first[:3] + [members[-1]])
+
+    def test_exclude_dot_prefix(self):
+        """Excludes match member names as stored, including a leading './'"""
+        members = [('./foo', None), ('./foo/a.pyc', b'a'), ('./foo/b', b'b'),
+                   ('./foo/c', b'c'), ('./foo/d.pyc', b'd')]
+        out = io.BytesIO()
+        exclude = tar_exclude_matcher(['./foo/a.pyc', 'foo/b', './c', 'foo/./d.pyc'])
+        with TarConcatenator(out, exclude=exclude) as tar:
+            tar.add([make_tar(members)])
+        self.assertEqual(read_tar(out.getvalue()), [members[0], members[3], members[4]])
+
+    def test_exclude_link_target(self):
+        """Hard links to excluded members are detected"""
+        data = io.BytesIO()
+        with tarfile.open(fileobj=data, mode='w') as tar:
+            info = tarfile.TarInfo('foo/a.pyc')
+            tar.addfile(info, io.BytesIO(b''))
+            info = tarfile.TarInfo('foo/b')
+            info.type = tarfile.LNKTYPE
+            info.linkname = 'foo/a.pyc'
+            tar.addfile(info)
+        with self.assertRaises(TarStreamError):
+            TarConcatenator(io.BytesIO(), exclude=tar_exclude_matcher(['*.pyc'])).add([data.getvalue()])
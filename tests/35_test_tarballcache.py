@@ -0,0 +1,83 @@
+# vim: set fileencoding=utf-8 :
+
+"""Test the L{TarballCache} class"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from gbp.deb.git import DebianGitRepository
+from gbp.pkg.compressor import Compressor
+from gbp.pkg.tarballcache import TarballCache
+
+
+class TestTarballCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='gbp_tarballcache_')
+        self.cache = TarballCache(3000, os.path.join(self.tmpdir, 'cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _tarball(self, name, size):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'wb') as f:
+            f.write(name.encode()[:1] * size)
+        return path
+
+    def test_store_fetch(self):
+        """Stored tarballs can be fetched"""
+        self.cache.store('a', self._tarball('a.tar.gz', 100))
+        out = os.path.join(self.tmpdir, 'out.tar.gz')
+        self._tarball('out.tar.gz', 10)
+        self.assertTrue(self.cache.fetch('a', out))
+        self.assertFalse(self.cache.fetch('b', out + '.missing'))
+        with open(out, 'rb') as f:
+            self.assertEqual(f.read(), b'a' * 100)
+        stats = self.cache.stats()
+        self.assertEqual((stats['entries'], stats['size']), (1, 100))
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_evict(self):
+        """Least recently used entries are evicted"""
+        for n, name in enumerate(['a', 'b', 'c']):
+            self.cache.store(name, self._tarball(name, 1000))
+            os.utime(self.cache._path(name), (n, n))
+        # Using 'a' makes 'b' the least recently used entry
+        self.assertTrue(self.cache.fetch('a', os.path.join(self.tmpdir, 'out')))
+        self.cache.store('d', self._tarball('d', 1000))
+        self.assertEqual(sorted(os.listdir(self.cache.objects_dir)), ['a', 'c', 'd'])
+
+    def test_same_tree(self):
+        """Commits sharing a tree don't share a tarball"""
+        repo = DebianGitRepository.create(os.path.join(self.tmpdir, 'repo'))
+        with open(os.path.join(repo.path, 'foo'), 'w') as f:
+            f.write('foo')
+        repo.add_files(['foo'])
+        env = {'GIT_AUTHOR_NAME': 'foo', 'GIT_AUTHOR_EMAIL': 'foo@example.com',
+               'GIT_COMMITTER_NAME': 'foo', 'GIT_COMMITTER_EMAIL': 'foo@example.com'}
+        with mock.patch.dict(os.environ, dict(env, GIT_COMMITTER_DATE='1500000000 +0000')):
+            repo.commit_all('first')
+        first = repo.rev_parse('HEAD')
+        tree = repo.rev_parse('HEAD^{tree}')
+        with mock.patch.dict(os.environ, dict(env, GIT_COMMITTER_DATE='1600000000 +0000')):
+            second = repo.commit_tree(tree, 'second', [first])
+
+        source = SimpleNamespace(name='foo', upstream_version='1.0',
+                                 upstream_tarball_name=lambda comp, component: 'foo_1.0.orig.tar.gz')
+        tarballs = {}
+        for treeish in [first, second, second, tree]:
+            outdir = os.path.join(self.tmpdir, 'out', treeish)
+            os.makedirs(outdir, exist_ok=True)
+            repo.create_upstream_tarball_via_git_archive(source, outdir, treeish,
+                                                         Compressor('gzip', '9'), False,
+                                                         cache=self.cache)
+            with open(os.path.join(outdir, 'foo_1.0.orig.tar.gz'), 'rb') as f:
+                tarballs.setdefault(treeish, set()).add(f.read())
+        self.assertEqual(len(tarballs[second]), 1)
+        self.assertEqual(len(set.union(*tarballs.values())), 3)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 3))
@@ -0,0 +1,133 @@
+# vim: set fileencoding=utf-8 :
+
+"""Test the L{IncrementalExport} class"""
+
+from . import context  # noqa: F401
+from .testutils import DebianGitTestRepo
+
+import os
+import shutil
+import subprocess
+from unittest import mock
+
+from gbp.scripts.common.buildpackage import dump_tree
+from gbp.scripts.common.exportdir import IncrementalExport
+
+
+def snapshot(top):
+    """Type, executable bit and content of everything below top"""
+    result = {}
+    for root, dirs, files in os.walk(top):
+        for name in dirs + files:
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, top)
+            if os.path.islink(path):
+                result[rel] = ('link', os.readlink(path))
+            elif os.path.isdir(path):
+                result[rel] = ('dir',)
+            else:
+                with open(path, 'rb') as f:
+                    result[rel] = ('file', os.access(path, os.X_OK), f.read())
+    return result
+
+
+class TestIncrementalExport(DebianGitTestRepo):
+    def setUp(self):
+        DebianGitTestRepo.setUp(self)
+        self.cwd = os.getcwd()
+        os.chdir(self.repo.path)
+        self.export_dir = os.path.join(str(self.tmpdir), 'export', 'pkg-1.0')
+        os.makedirs(self.export_dir)
+        self.add_file('a', 'a')
+        self.add_file('dir/b', 'b')
+        self.add_file('gone/c', 'c')
+        self.add_file('script', '#!/bin/sh\n')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        DebianGitTestRepo.tearDown(self)
+
+    def _full_export(self, treeish):
+        reference = os.path.join(str(self.tmpdir), 'reference', 'pkg-1.0')
+        if os.path.exists(reference):
+            shutil.rmtree(reference)
+        os.makedirs(reference)
+        self.assertTrue(dump_tree(self.repo, reference, treeish, False))
+        return snapshot(reference)
+
+    def _export(self):
+        self.assertTrue(dump_tree(self.repo, self.export_dir, 'HEAD', False))
+        IncrementalExport(self.repo, self.export_dir, False).record('HEAD')
+
+    def _change(self):
+        self.add_file('a', 'modified')
+        self.add_file('new/d', 'd')
+        os.chmod('script', 0o755)
+        os.symlink('a', 'link')
+        self.repo.add_files(['script', 'link'], force=True)
+        self.repo.remove_files(['gone/c'])
+        self.repo.commit_all('Change things')
+
+    def test_dump_tree_failure(self):
+        """Both ends of the archive pipe are waited for if tar fails"""
+        procs = []
+        real_popen = subprocess.Popen
+
+        def popen(*args, **kwargs):
+            procs.append(real_popen(*args, **kwargs))
+            return procs[-1]
+
+        missing = os.path.join(str(self.tmpdir), 'missing', 'pkg-1.0')
+        with mock.patch('gbp.scripts.common.buildpackage.subprocess.Popen', side_effect=popen):
+            self.assertFalse(dump_tree(self.repo, missing, 'HEAD', False))
+        self.assertEqual(len(procs), 2)
+        for proc in procs:
+            self.assertIsNotNone(proc.returncode)
+
+    def test_update(self):
+        """Only changed files are written and the result matches a full export"""
+        self._export()
+        stat_b = os.stat(os.path.join(self.export_dir, 'dir', 'b'))
+        self._change()
+        self.assertTrue(IncrementalExport(self.repo, self.export_dir, False).update('HEAD'))
+        self.assertEqual(snapshot(self.export_dir), self._full_export('HEAD'))
+        self.assertEqual(os.stat(os.path.join(self.export_dir, 'dir', 'b')), stat_b)
+        # And back again
+        self.assertTrue(IncrementalExport(self.repo, self.export_dir, False).update('HEAD^^^'))
+        self.assertEqual(snapshot(self.export_dir), self._full_export('HEAD^^^'))
+
+    def test_untracked(self):
+        """Files left behind by a build are removed"""
+        self._export()
+        self._change()
+        os.makedirs(os.path.join(self.export_dir, 'debian', '.debhelper', 'generated'))
+        for path in ['debian/debhelper-build-stamp', 'dir/b.o', 'debian/.debhelper/generated/x']:
+            with open(os.path.join(self.export_dir, path), 'w') as f:
+                f.write('built')
+        os.symlink('dir', os.path.join(self.export_dir, 'dirlink'))
+        self.assertTrue(IncrementalExport(self.repo, self.export_dir, False).update('HEAD'))
+        self.assertEqual(snapshot(self.export_dir), self._full_export('HEAD'))
+
+    def test_modified(self):
+        """A modified export dir needs a full export"""
+        self._export()
+        self._change()
+        with open(os.path.join(self.export_dir, 'dir', 'b'), 'w') as f:
+            f.write('changed')
+        self.assertFalse(IncrementalExport(self.repo, self.export_dir, False).update('HEAD'))
+
+    def test_unmodified(self):
+        """Touching files without changing them doesn't force a full export"""
+        self._export()
+        os.utime(os.path.join(self.export_dir, 'a'))
+        self.assertTrue(IncrementalExport(self.repo, self.export_dir, False).update('HEAD'))
+
+    def test_no_state(self):
+        """Without a recorded export a full one is needed"""
+        self.assertFalse(IncrementalExport(self.repo, self.export_dir, False).update('HEAD'))
+
+    def test_export_attributes(self):
+        """Attributes affecting git archive force a full export"""
+        self._export()
+        self.add_file('.gitattributes', 'a export-ignore\n')
+        self.assertFalse(IncrementalExport(self.repo, self.export_dir, False).update('HEAD'))
@@ -0,0 +1,103 @@
+# vim: set fileencoding=utf-8 :
+
+"""Test the L{PristineTarIndex} and L{PristineTarManifest} classes"""
+
+from . import context  # noqa: F401
+from .testutils import DebianGitTestRepo
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from gbp.pkg.pristinetar import PristineTarIndex
+
+
+class PristineTarTestRepo(DebianGitTestRepo):
+    def setUp(self):
+        DebianGitTestRepo.setUp(self)
+        self.data = os.path.join(str(self.tmpdir), 'data')
+        os.mkdir(self.data)
+
+    def _commit(self, tarball, sig=False):
+        """Fake a pristine-tar commit for tarball"""
+        for ext in ['delta', 'id'] + (['asc'] if sig else []):
+            with open(os.path.join(self.data, '%s.%s' % (tarball, ext)), 'w') as f:
+                f.write(tarball)
+        return self.repo.commit_dir(self.data, 'pristine-tar data for %s' % tarball,
+                                    'pristine-tar', create_missing_branch=True)
+
+
+class TestPristineTarIndex(PristineTarTestRepo):
+    def test_lookup(self):
+        """Tarballs are found in the pristine-tar branch"""
+        self.add_file('foo', 'bar')
+        self.assertFalse(self.repo.pristine_tar.has_commit('foo', '1.0'))
+        c1 = self._commit('foo_1.0.orig.tar.gz', sig=True)
+        c2 = self._commit('foo_2.0.orig.tar.xz')
+        self.assertTrue(self.repo.pristine_tar.has_commit('foo', '1.0', 'gzip'))
+        self.assertFalse(self.repo.pristine_tar.has_commit('foo', '1.0', 'xz'))
+        self.assertTrue(self.repo.pristine_tar.has_commit('foo', '2.0'))
+        self.assertEqual(self.repo.pristine_tar.get_commit(r'foo_1\.0\.orig\.tar\..*'), (c1, True))
+        self.assertEqual(self.repo.pristine_tar.get_commit(r'foo_2\.0\.orig\.tar\..*'), (c2, False))
+        self.assertEqual(self.repo.pristine_tar.index().newest['compression'], 'xz')
+
+    def test_incremental(self):
+        """The index follows the branch"""
+        self.add_file('foo', 'bar')
+        c1 = self._commit('foo_1.0.orig.tar.gz')
+        index = PristineTarIndex(self.repo, 'pristine-tar')
+        self.assertEqual(index.find('foo_1.0')['commit'], c1)
+        c2 = self._commit('foo_2.0.orig.tar.gz')
+        # A fresh index picks up the stored one and adds the new commit
+        index = PristineTarIndex(self.repo, 'pristine-tar')
+        self.assertEqual(index.find('foo_2.0')['commit'], c2)
+        self.assertEqual([e['commit'] for e in index._entries], [c1, c2])
+        # Rewriting the branch rebuilds the index
+        self.repo.update_ref('refs/heads/pristine-tar', c1)
+        self._commit('foo_3.0.orig.tar.bz2')
+        self.assertIsNone(index.find('foo_2.0'))
+        self.assertEqual(index.find('foo_3.0')['compression'], 'bzip2')
+
+    def test_concurrent_save(self):
+        """Indexes saved from several threads don't clobber each other"""
+        self.add_file('foo', 'bar')
+        self._commit('foo_1.0.orig.tar.gz')
+
+        def save(n):
+            index = PristineTarIndex(self.repo, 'pristine-tar')
+            index.find('foo_1.0')
+            for i in range(50):
+                index._save()
+
+        with mock.patch('gbp.log.debug') as debug:
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                list(pool.map(save, range(8)))
+        self.assertEqual([c for c in debug.call_args_list if "Can't store" in c[0][0]], [])
+        index_dir = os.path.dirname(PristineTarIndex(self.repo, 'pristine-tar').filename)
+        self.assertEqual(os.listdir(index_dir), ['pristine-tar.json'])
+
+
+class TestPristineTarManifest(PristineTarTestRepo):
+    def test_unverified(self):
+        """Tarballs matching the manifest need no verification"""
+        self.add_file('foo', 'bar')
+        c1 = self._commit('foo_1.0.orig.tar.gz')
+        self._commit('bar_1.0.orig.tar.gz')
+        tarballs = []
+        for name in ['foo_1.0.orig.tar.gz', 'bar_1.0.orig.tar.gz']:
+            tarballs.append(os.path.join(str(self.tmpdir), name))
+            with open(tarballs[-1], 'w') as f:
+                f.write(name)
+        pt = self.repo.pristine_tar
+        self.assertEqual(pt.unverified(tarballs), tarballs)
+        pt.manifest.record(tarballs[0], c1)
+        self.assertEqual(pt.unverified(tarballs), tarballs[1:])
+        # Modified tarball
+        with open(tarballs[0], 'w') as f:
+            f.write('modified')
+        self.assertEqual(pt.unverified(tarballs), tarballs)
+        pt.manifest.record(tarballs[0], c1)
+        self.assertEqual(pt.unverified(tarballs), tarballs[1:])
+        # New pristine-tar commit for the tarball
+        self._commit('foo_1.0.orig.tar.gz', sig=True)
+        self.assertEqual(pt.unverified(tarballs), tarballs)
@@ -0,0 +1,73 @@
+# vim: set fileencoding=utf-8 :
+
+"""Test the L{ProbeCache} class"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from gbp.probe_cache import ProbeCache
+
+
+class TestProbeCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='gbp_probecache_')
+        self.tool = os.path.join(self.tmpdir, 'gbp-test-tool')
+        with open(self.tool, 'w') as f:
+            f.write('#!/bin/sh\n')
+        os.chmod(self.tool, 0o755)
+        self.env = mock.patch.dict(os.environ, {'PATH': self.tmpdir})
+        self.env.start()
+        self.cache = ProbeCache(os.path.join(self.tmpdir, 'cache'))
+        self.calls = 0
+        ProbeCache.clear()
+
+    def tearDown(self):
+        self.env.stop()
+        ProbeCache.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def _compute(self):
+        self.calls += 1
+        return 'result %d' % self.calls
+
+    def _get(self, **kwargs):
+        return self.cache.get('gbp-test-tool', ['--probe'], self._compute, **kwargs)
+
+    def test_cached(self):
+        """Probes only run once"""
+        self.assertEqual(self._get(), 'result 1')
+        self.assertEqual(self._get(), 'result 1')
+        # Persisted across processes
+        ProbeCache.clear()
+        self.assertEqual(self._get(), 'result 1')
+        self.assertEqual(self.calls, 1)
+
+    def test_tool_changed(self):
+        """A changed tool is probed again"""
+        self._get()
+        with open(self.tool, 'a') as f:
+            f.write('exit 0\n')
+        self.assertEqual(self._get(), 'result 2')
+        ProbeCache.clear()
+        self.assertEqual(self._get(), 'result 2')
+
+    def test_dependencies(self):
+        """Files and environment variables the probe depends on are checked"""
+        dep = os.path.join(self.tmpdir, 'dep')
+        self.assertEqual(self._get(files=[dep], env=['GBP_TEST_VAR']), 'result 1')
+        with open(dep, 'w') as f:
+            f.write('changed')
+        self.assertEqual(self._get(files=[dep], env=['GBP_TEST_VAR']), 'result 2')
+        with mock.patch.dict(os.environ, {'GBP_TEST_VAR': 'set'}):
+            self.assertEqual(self._get(files=[dep], env=['GBP_TEST_VAR']), 'result 3')
+
+    def test_missing_tool(self):
+        """Probes of tools not in PATH aren't cached"""
+        os.unlink(self.tool)
+        self._get()
+        self._get()
+        self.assertEqual(self.calls, 2)
+        self.assertFalse(os.path.exists(self.cache.filename))
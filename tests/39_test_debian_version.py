@@ -0,0 +1,118 @@
+# vim: set fileencoding=utf-8 :
+
+"""Test L{gbp.deb.version.DebianVersion} against dpkg"""
+
+from . import context  # noqa: F401
+from . import testutils
+
+import itertools
+import subprocess
+import unittest
+
+from gbp.deb import compare_versions
+from gbp.deb.version import DebianVersion, DebianVersionError
+
+# (version1, expected result, version2) mostly taken from dpkg's test suite
+KNOWN = [
+    ('1.0', 0, '1.0'),
+    ('1.0', 0, '0:1.0'),
+    ('1.0', 0, '1.0-0'),
+    ('1.0', 0, '01.0'),
+    ('1.0-1', -1, '1.0-2'),
+    ('1.0-1', -1, '1:0.1-1'),
+    ('1.0~rc1', -1, '1.0'),
+    ('1.0~rc1', -1, '1.0~rc1+dfsg'),
+    ('1.0~~', -1, '1.0~~a'),
+    ('1.0~~a', -1, '1.0~'),
+    ('1.0~', -1, '1.0'),
+    ('1.0', -1, '1.0a'),
+    ('1.0a', -1, '1.0+'),
+    ('1.0+', -1, '1.0.1'),
+    ('1.0.1', -1, '1.0.10'),
+    ('1.0.9', -1, '1.0.10'),
+    ('1.0-1', -1, '1.0-1.1'),
+    ('1.0-1+b1', 1, '1.0-1'),
+    ('1.0-1~bpo1', -1, '1.0-1'),
+    ('2:1.0', 1, '1:9.9'),
+    ('1.2.3-4-5', 1, '1.2.3-4'),
+    ('1:1.0:1-1', 1, '1:1.0-1'),
+    ('1.0', 1, ''),
+    ('0~', 1, ''),
+    ('<unknown>', 0, ''),
+    ('A', -1, 'a'),
+    ('1.0-1', -1, '1.0-a'),
+    ('99999999999999999999', 1, '99999999999999999998'),
+]
+
+INVALID = ['1.0 1', '1:', 'a:1.0', '1a:1.0', '-1:1.0', '1.0-', '1:-1',
+           '4294967296:1.0', '-1', ':1.0']
+
+WARNINGS = ['a1', '_', '1_0', '1.0-1_1', '1.0-a%b', ' 1.0', '1.0\t']
+
+
+def dpkg_compare(version1, op, version2):
+    ret = subprocess.call(['dpkg', '--compare-versions', version1, op, version2],
+                          stderr=subprocess.DEVNULL)
+    if ret not in [0, 1]:
+        raise ValueError("dpkg failed to compare %s and %s" % (version1, version2))
+    return ret == 0
+
+
+class TestDebianVersion(unittest.TestCase):
+    def test_known(self):
+        """Known version comparisons"""
+        for version1, result, version2 in KNOWN:
+            self.assertEqual(compare_versions(version1, version2), result,
+                             "%s vs %s" % (version1, version2))
+            self.assertEqual(compare_versions(version2, version1), -result,
+                             "%s vs %s" % (version2, version1))
+
+    def test_invalid(self):
+        """Versions rejected by dpkg raise an error"""
+        for version in INVALID:
+            with self.assertRaises(DebianVersionError, msg=version):
+                DebianVersion(version)
+
+    def test_warnings(self):
+        """Versions dpkg only warns about are accepted"""
+        for version in WARNINGS:
+            DebianVersion(version)
+
+    def test_parts(self):
+        """Versions are split like dpkg does"""
+        version = DebianVersion('2:1.0-rc1-3')
+        self.assertEqual((version.epoch, version.upstream, version.revision),
+                         (2, '1.0-rc1', '3'))
+        self.assertEqual(str(version), '2:1.0-rc1-3')
+
+
+@testutils.skip_without_cmd('dpkg')
+class TestDebianVersionConformance(unittest.TestCase):
+    """Check L{DebianVersion} against I{dpkg --compare-versions}"""
+
+    @staticmethod
+    def _versions():
+        """All upstream versions of up to three characters of an alphabet
+        covering all character classes plus a range of full versions"""
+        alphabet = ['0', '1', '9', 'a', 'Z', '.', '+', '~', '\xe4']
+        versions = []
+        for length in range(1, 4):
+            versions += [''.join(p) for p in itertools.product(alphabet, repeat=length)]
+        for epoch, revision in itertools.product(['', '1:'], ['', '-0', '-1', '-1~', '-a']):
+            versions += ['%s1.0%s' % (epoch, revision), '%s1.0~%s' % (epoch, revision)]
+        return versions + [v for v, _, _ in KNOWN] + [v for _, _, v in KNOWN] + WARNINGS
+
+    def test_order(self):
+        """Sorting gives the order dpkg imposes"""
+        versions = sorted(set(self._versions()), key=DebianVersion)
+        for version1, version2 in zip(versions, versions[1:]):
+            op = 'eq' if DebianVersion(version1) == DebianVersion(version2) else 'lt'
+            self.assertTrue(dpkg_compare(version1, op, version2),
+                            "%s %s %s" % (version1, op, version2))
+
+    def test_invalid(self):
+        """We reject the versions dpkg rejects"""
+        for version in INVALID:
+            self.assertRaises(ValueError, dpkg_compare, version, 'eq', '1')
+        for version in WARNINGS:
+            dpkg_compare(version, 'eq', '1')
@@ -18,3 +18,10 @@
 """Unit tests for git-buildpackage"""
 
 # vim:et:ts=4:sw=4:et:sts=4:ai:set list listchars=tab\:»·,trail\:·:
+
+import os
+
+# Don't fill the user's cache directory with entries for test repos
+# and tools
+os.environ['GBP_CONFIG_CACHE'] = '0'
+os.environ['GBP_PROBE_CACHE'] = '0'
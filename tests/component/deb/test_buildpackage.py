@@ -177,6 +177,29 @@ class TestBuildpackage(ComponentTestBase):
         self._test_buildpackage(repo, ['--git-export-dir=../foo/bar'])
         ok_(os.path.exists('../foo/bar'))
 
+    @RepoFixtures.quilt30()
+    def test_export_dir_incremental(self, repo):
+        """Test that an incremental export only updates changed files"""
+        export_dir = '../foo/bar/hello-debhelper-2.8'
+        self._test_buildpackage(repo, ['--git-export-dir=../foo/bar',
+                                       '--git-incremental-export'])
+        ok_(os.path.exists(os.path.join(export_dir, 'configure')))
+        st = os.stat(os.path.join(export_dir, 'configure'))
+        self.add_file(repo, 'foo.txt')
+        repo.remove_files(['debian/rules-dh'])
+        repo.commit_all('Remove rules-dh')
+        stamp = os.path.join(export_dir, 'debian/debhelper-build-stamp')
+        with open(stamp, 'w') as f:
+            f.write('hello-debhelper\n')
+        self._test_buildpackage(repo, ['--git-export-dir=../foo/bar',
+                                       '--git-incremental-export'])
+        ok_(not os.path.exists(stamp))
+        ok_(os.path.exists(os.path.join(export_dir, 'foo.txt')))
+        ok_(not os.path.exists(os.path.join(export_dir, 'debian/rules-dh')))
+        new = os.stat(os.path.join(export_dir, 'configure'))
+        eq_((st.st_ino, st.st_mtime_ns), (new.st_ino, new.st_mtime_ns))
+        eq_(glob.glob('../foo/bar/*.obsolete.*'), [])
+
     @RepoFixtures.quilt30_additional_tarball()
     def test_export_dir_additional_tar(self, repo):
         """Test that building with a export dir and additional tarball works"""
@@ -16,7 +16,11 @@
 #    along with this program; if not, please see
 #    <http://www.gnu.org/licenses/>
 
+import hashlib
 import os
+import tarfile
+
+from unittest import mock
 
 from tests.component import (ComponentTestBase,
                              ComponentTestGitRepository)
@@ -28,6 +32,7 @@ from nose.tools import ok_, assert_false, assert_true
 from gbp.scripts.clone import main as clone
 from gbp.scripts.import_dsc import main as import_dsc
 from gbp.scripts.export_orig import main as export_orig
+from gbp.pkg.tarballcache import TarballCache
 
 
 class TestExportOrig(ComponentTestBase):
@@ -59,6 +64,76 @@ class TestExportOrig(ComponentTestBase):
         for t in tarballs:
             self.assertTrue(os.path.exists(t), "Tarball %s not found" % t)
 
+    @staticmethod
+    def _tar_checksum(tarball):
+        """
+        Checksum of a tarball's members ignoring their mtime since
+        archives of a bare tree get stamped with the current time
+        """
+        sha256 = hashlib.sha256()
+        with tarfile.open(tarball) as tar:
+            for member in tar:
+                sha256.update(repr((member.name, member.type, member.mode,
+                                    member.linkname)).encode())
+                if member.isfile():
+                    sha256.update(tar.extractfile(member).read())
+        return sha256.hexdigest()
+
+    def test_component_generation_parallel(self):
+        """Test that generating tarballs in parallel gives the same tarballs"""
+        pkg = 'hello-debhelper'
+        dsc = self._dsc_name(pkg, '2.8-1', 'dsc-3.0-additional-tarballs')
+        tarballs = ["../%s_2.8.orig-foo.tar.gz" % pkg,
+                    "../%s_2.8.orig.tar.gz" % pkg]
+
+        assert import_dsc(['arg0', '--no-pristine-tar', dsc]) == 0
+        os.chdir(pkg)
+        checksums = {}
+        for jobs in ['1', '2']:
+            for t in tarballs:
+                if os.path.exists(t):
+                    os.unlink(t)
+            ret = export_orig(['arg0',
+                               '--component=foo',
+                               '--no-pristine-tar',
+                               '--jobs=%s' % jobs])
+            ok_(ret == 0, "Exporting tarballs failed")
+            for t in tarballs:
+                checksums.setdefault(t, set()).add(self._tar_checksum(t))
+        for t in tarballs:
+            self.assertEqual(len(checksums[t]), 1, "Tarball %s differs" % t)
+
+    def test_tarball_cache(self):
+        """Test that cached tarballs are reused"""
+        pkg = 'hello-debhelper'
+        dsc = self._dsc_name(pkg, '2.8-1', 'dsc-3.0-additional-tarballs')
+        tarballs = ["../%s_2.8.orig-foo.tar.gz" % pkg,
+                    "../%s_2.8.orig.tar.gz" % pkg]
+        cache_dir = os.path.join(self._tmpdir, 'cache')
+
+        assert import_dsc(['arg0', '--no-pristine-tar', dsc]) == 0
+        os.chdir(pkg)
+        checksums = {}
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': cache_dir}):
+            for _ in range(2):
+                for t in tarballs:
+                    if os.path.exists(t):
+                        os.unlink(t)
+                ret = export_orig(['arg0',
+                                   '--component=foo',
+                                   '--no-pristine-tar',
+                                   '--tarball-cache'])
+                ok_(ret == 0, "Exporting tarballs failed")
+                for t in tarballs:
+                    with open(t, 'rb') as f:
+                        checksums.setdefault(t, set()).add(hashlib.sha256(f.read()).hexdigest())
+            stats = TarballCache(0).stats()
+            self.assertEqual(export_orig(['arg0', '--cache-stats']), 0)
+        for t in tarballs:
+            self.assertEqual(len(checksums[t]), 1, "Tarball %s differs" % t)
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+
     def test_pristinetar_component_generation(self):
         """Test that generating tarball and additional tarball works with pristine-tar"""
         pkg = 'hello-debhelper'
@@ -384,3 +384,16 @@ class TestImportDsc(ComponentTestBase):
         eq_(repo.ls_tree('pristine-tar'), {b'hello-debhelper_2.8.orig.tar.gz.delta',
                                            b'hello-debhelper_2.8.orig.tar.gz.id',
                                            b'hello-debhelper_2.8.orig.tar.gz.asc'})
+
+    def test_verify_checksums(self):
+        """Test that files not matching the dsc aren't imported"""
+        eq_(import_dsc(['arg0', '--verify-checksums', '--no-pristine-tar',
+                        self._dsc30('2.6-2')]), 0)
+        dscfile = os.path.join(DEB_TEST_DATA_DIR,
+                               'dsc-3.0-additional-tarballs',
+                               'hello-debhelper_2.8-1.dsc')
+        os.chdir('hello-debhelper')
+        eq_(import_dsc(['arg0', '--verify-checksums', '--no-pristine-tar', dscfile]), 1)
+        self._check_log(0, "gbp:error: Failed to verify '%s': Size of" % dscfile)
+        repo = ComponentTestGitRepository('.')
+        self.check_tags(repo, ['debian/2.6-2', 'upstream/2.6'])
@@ -17,13 +17,18 @@
 #    <http://www.gnu.org/licenses/>
 
 import os
+import shutil
+from unittest import mock
 
 from tests.component import (ComponentTestBase,
                              ComponentTestGitRepository)
 from tests.component.deb import DEB_TEST_DATA_DIR
-from nose.tools import ok_
+from nose.tools import ok_, eq_
 
+from gbp.deb.dscfile import DscFile
+from gbp.scripts.import_dsc import main as import_dsc
 from gbp.scripts.import_dscs import main as import_dscs
+from gbp.scripts.import_dscs import ImportJournal, UnpackedDsc
 
 
 class TestImportDscs(ComponentTestBase):
@@ -44,3 +49,90 @@ class TestImportDscs(ComponentTestBase):
         assert len(repo.get_commits()) == 2
         commitmsg = repo.get_commit_info('HEAD')['body']
         ok_("git-buildpackage (0.4.15) unstable; urgency=low" in commitmsg)
+
+    def test_import_bulk(self):
+        """Test that importing in one go gives the same history as one by one"""
+        def _dsc(version):
+            return os.path.join(DEB_TEST_DATA_DIR,
+                                'dsc-3.0',
+                                'hello-debhelper_%s.dsc' % version)
+
+        dscs = [_dsc('2.6-1'), _dsc('2.6-2'), _dsc('2.8-1')]
+        # Make commits and tags reproducible
+        with mock.patch.dict(os.environ, {'GIT_COMMITTER_DATE': '1500000000 +0200',
+                                          'GIT_AUTHOR_DATE': '1500000000 +0200'}):
+            os.mkdir('single')
+            os.chdir('single')
+            for dsc in dscs:
+                eq_(import_dsc(['arg0', '--no-pristine-tar', dsc]), 0)
+                os.chdir(os.path.join(self._tmpdir, 'single', 'hello-debhelper'))
+            single = ComponentTestGitRepository('.')
+
+            os.chdir(self._tmpdir)
+            eq_(import_dscs(['arg0', '--no-pristine-tar'] + dscs[::-1]), 0)
+            repo = ComponentTestGitRepository('hello-debhelper')
+
+        self._check_repo_state(repo, 'master', ['master', 'upstream'])
+        self.check_tags(repo, ['debian/2.6-1', 'debian/2.6-2', 'debian/2.8-1',
+                               'upstream/2.6', 'upstream/2.8'])
+        for ref in ['master', 'upstream'] + repo.tags:
+            eq_(repo.rev_parse(ref), single.rev_parse(ref), ref)
+        # Upstream 2.8 got merged
+        eq_(repo.get_commits(options=['--min-parents=2']), [repo.rev_parse('debian/2.8-1^{}')])
+
+    def test_import_resume(self):
+        """Test that a rerun skips packages imported before a failure"""
+        srcdir = os.path.join(DEB_TEST_DATA_DIR, 'dsc-3.0')
+        os.mkdir('dl')
+        missing = 'hello-debhelper_2.8-1.debian.tar.gz'
+        for name in os.listdir(srcdir):
+            if name != missing:
+                shutil.copy(os.path.join(srcdir, name), 'dl')
+        dscs = [os.path.join('dl', 'hello-debhelper_%s.dsc' % version)
+                for version in ['2.6-1', '2.6-2', '2.8-1']]
+
+        eq_(import_dscs(['arg0', '--no-pristine-tar'] + dscs), 1)
+        repo = ComponentTestGitRepository('hello-debhelper')
+        self.check_tags(repo, ['debian/2.6-1', 'debian/2.6-2', 'upstream/2.6'])
+        journal = ImportJournal(repo)
+        for dsc in dscs[:2]:
+            ok_(journal.is_imported(DscFile.parse(dsc)))
+
+        shutil.copy(os.path.join(srcdir, missing), 'dl')
+        with mock.patch('gbp.scripts.import_dscs.UnpackedDsc',
+                        wraps=UnpackedDsc) as unpacked:
+            eq_(import_dscs(['arg0', '--no-pristine-tar'] + dscs), 0)
+        eq_([c[0][0].version for c in unpacked.call_args_list], ['2.8-1'])
+        self._check_repo_state(repo, 'master', ['master', 'upstream'])
+        self.check_tags(repo, ['debian/2.6-1', 'debian/2.6-2', 'debian/2.8-1',
+                               'upstream/2.6', 'upstream/2.8'])
+        ok_(ImportJournal(repo).is_imported(DscFile.parse(dscs[2])))
+
+    def test_keep_downloads(self):
+        """Test that downloads are kept when the import dies"""
+        srcdir = os.path.join(DEB_TEST_DATA_DIR, 'dsc-3.0')
+
+        def fetch_snapshots(pkg, downloaddir):
+            for name in os.listdir(srcdir):
+                if name.startswith('hello-debhelper_'):
+                    shutil.copy(os.path.join(srcdir, name), downloaddir)
+            return [os.path.join(downloaddir, 'hello-debhelper_%s.dsc' % version)
+                    for version in ['2.6-1', '2.6-2', '2.8-1']]
+
+        with mock.patch('gbp.scripts.import_dscs.fetch_snapshots',
+                        side_effect=fetch_snapshots):
+            with mock.patch('gbp.scripts.import_dscs.GitImportDsc.importdscs',
+                            side_effect=OSError('killed')):
+                with self.assertRaises(OSError):
+                    import_dscs(['arg0', '--no-pristine-tar', '--debsnap', 'hello-debhelper'])
+        repo = ComponentTestGitRepository('hello-debhelper')
+        download = ImportJournal(repo).downloads('hello-debhelper')
+        ok_(download and os.path.isdir(download))
+
+        with mock.patch('gbp.scripts.import_dscs.fetch_snapshots') as fetch:
+            eq_(import_dscs(['arg0', '--no-pristine-tar', '--debsnap', 'hello-debhelper']), 0)
+        ok_(not fetch.called)
+        self.check_tags(repo, ['debian/2.6-1', 'debian/2.6-2', 'debian/2.8-1',
+                               'upstream/2.6', 'upstream/2.8'])
+        ok_(not os.path.exists(download))
+        eq_(ImportJournal(repo).downloads('hello-debhelper'), None)
@@ -443,6 +443,92 @@ def test_get_obj_type():
     """
 
 
+def test_cat_file():
+    """
+    Look up objects via the persistent git cat-file processes
+
+    Methods tested:
+         - L{gbp.git.GitRepository.show}
+         - L{gbp.git.GitRepository.has_treeish}
+         - L{gbp.git.GitRepository.get_obj_type}
+         - L{gbp.git.GitRepository.close}
+
+    >>> import gbp.git
+    >>> repo = gbp.git.GitRepository(dirs['repo'])
+    >>> repo.show('HEAD:testfile') == open(dirs['repo'] + '/testfile', 'rb').read()
+    True
+    >>> repo.has_treeish('HEAD'), repo.has_treeish('HEAD:testfile'), repo.has_treeish('doesnotexist')
+    (True, False, False)
+    >>> repo.get_obj_type('doesnotexist')
+    Traceback (most recent call last):
+    ...
+    gbp.git.repository.GitRepositoryError: Not a Git repository object: 'doesnotexist'
+    >>> repo.show('HEAD:doesnotexist')  # doctest:+IGNORE_EXCEPTION_DETAIL
+    Traceback (most recent call last):
+    ...
+    gbp.git.repository.GitRepositoryError: can't get HEAD:doesnotexist: fatal: path 'doesnotexist' does not exist in 'HEAD'
+    >>> repo._cat_file_check._proc.kill()
+    >>> repo.get_obj_type('HEAD')
+    'commit'
+    >>> repo.close()
+    >>> repo._cat_file_batch.running, repo._cat_file_check.running
+    (False, False)
+    >>> repo.get_obj_type('HEAD:testfile')
+    'blob'
+    >>> repo = gbp.git.GitRepository(dirs['repo'], batch_objects=False)
+    >>> repo.get_obj_type('HEAD:testfile'), repo.has_treeish('HEAD')
+    ('blob', True)
+    """
+
+
+def test_ref_snapshot():
+    """
+    Answer ref queries from the ref snapshot
+
+    Methods tested:
+         - L{gbp.git.GitRepository.has_branch}
+         - L{gbp.git.GitRepository.has_tag}
+         - L{gbp.git.GitRepository.get_tags}
+         - L{gbp.git.GitRepository.get_local_branches}
+         - L{gbp.git.GitRepository.rev_parse}
+
+    >>> import gbp.git, subprocess
+    >>> repo = gbp.git.GitRepository(dirs['repo'])
+    >>> uncached = gbp.git.GitRepository(dirs['repo'], cache_refs=False)
+    >>> repo._refs._racy_slack = -3600  # trust the snapshot right away
+    >>> repo.create_tag('foo', msg='annotated tag')
+    >>> repo.create_tag('snap/1.0')
+    >>> repo.create_branch('heads/bar', 'master')
+    >>> repo.get_tags() == uncached.get_tags()
+    True
+    >>> repo.get_tags('snap/*')
+    ['snap/1.0']
+    >>> import warnings
+    >>> with warnings.catch_warnings():
+    ...     warnings.simplefilter('error')
+    ...     repo.get_tags('snap/[0-9]*')
+    ['snap/1.0']
+    >>> repo.get_local_branches() == uncached.get_local_branches()
+    True
+    >>> repo.has_tag('foo'), repo.has_tag('bar'), repo.has_branch('heads/bar')
+    (True, False, True)
+    >>> repo.rev_parse('foo') == uncached.rev_parse('foo')
+    True
+    >>> repo.rev_parse('foo^0') == uncached.rev_parse('foo^0') == repo.rev_parse('heads/foo')
+    True
+    >>> _ = subprocess.check_call(['git', 'branch', 'external', 'master'], cwd=repo.path)
+    >>> repo.has_branch('external')
+    True
+    >>> _ = subprocess.check_call(['git', 'branch', '-D', '-q', 'external', 'heads/bar'], cwd=repo.path)
+    >>> repo.has_branch('external'), repo.has_branch('heads/bar')
+    (False, False)
+    >>> repo.delete_tag('foo')
+    >>> repo.delete_tag('snap/1.0')
+    >>> repo.get_tags('snap/*')
+    []
+    """
+
+
 def test_list_files():
     """
     List files in the index
@@ -555,6 +641,63 @@ def test_get_commit_info():
     """
 
 
+def test_iter_commit_info():
+    """
+    Test inspecting a range of commits at once
+
+    Methods tested:
+         - L{gbp.git.GitRepository.iter_commit_info}
+
+    >>> import gbp.git
+    >>> repo = gbp.git.GitRepository(dirs['repo'])
+    >>> infos = list(repo.iter_commit_info())
+    >>> [info['id'] for info in infos] == repo.get_commits()
+    True
+    >>> info, expected = infos[0], repo.get_commit_info('HEAD')
+    >>> [info[key] == expected[key] for key in ['subject', 'patchname', 'body', 'files']]
+    [True, True, True, True]
+    >>> info['author'].get_author_env() == expected['author'].get_author_env()
+    True
+    >>> [info['id'] for info in repo.iter_commit_info(reverse=True)] == repo.get_commits()[::-1]
+    True
+    >>> [info['id'] for info in repo.iter_commit_info(since='HEAD~1')] == repo.get_commits(since='HEAD~1')
+    True
+    >>> list(repo.iter_commit_info(paths=['foo', 'bar']))
+    []
+    >>> list(repo.iter_commit_info(until='doesnotexist'))
+    Traceback (most recent call last):
+    ...
+    gbp.git.repository.GitRepositoryError: Error getting commits None..doesnotexist
+    """
+
+
+def test_git_stream():
+    """
+    Test streaming git's output
+
+    Methods tested:
+         - L{gbp.git.GitRepository._git_stream}
+
+    >>> import gbp.git
+    >>> repo = gbp.git.GitRepository(dirs['repo'])
+    >>> repo._stream_bufsize = 3
+    >>> records = list(repo._git_stream('ls-tree', ['-z', '--name-only', 'HEAD']))
+    >>> records == [entry[3] for entry in repo.list_tree('HEAD')]
+    True
+    >>> [rec.decode() for rec in repo._git_stream('log', ['-1', '--format=%H'], sep=b'\\n')] == [repo.rev_parse('HEAD')]
+    True
+    >>> stream = repo._git_stream('rev-list', ['HEAD'], sep=b'\\n')
+    >>> next(stream).decode() == repo.rev_parse('HEAD')
+    True
+    >>> stream.close()
+    >>> try:
+    ...     list(repo._git_stream('rev-list', ['doesnotexist'], capture_stderr=True))
+    ... except gbp.git.repository.GitStreamError as err:
+    ...     err.returncode, b'doesnotexist' in err.stderr
+    (128, True)
+    """
+
+
 def test_diff():
     """
     Test git-diff
@@ -591,6 +734,21 @@ def test_diff_status():
     """
 
 
+def test_diff_tree():
+    """
+    Methods tested:
+        - L{gbp.git.GitRepository.diff_tree}
+
+    >>> import gbp.git
+    >>> repo = gbp.git.GitRepository(dirs['repo'])
+    >>> list(repo.diff_tree("HEAD", "HEAD"))
+    []
+    >>> [(new_mode, status, path) for _, new_mode, _, _, status, path
+    ...  in repo.diff_tree("HEAD~1", "HEAD")]
+    [('100644', 'M', b'testfile')]
+    """
+
+
 def test_mirror_clone():
     """
     Mirror a repository
@@ -114,3 +114,82 @@ def test_content_manager():
     >>> data
     ['al pha\\n', 'a\\n', 'b\\n', 'c']
     """
+
+
+def test_ranges():
+    """
+    Read parts of a file
+
+    Methods tested:
+         - L{gbp.git.GitVfs._File.seek}
+         - L{gbp.git.GitVfs._File.tell}
+         - L{gbp.git.GitVfs._File.read}
+         - L{gbp.git.GitVfs._File.getbuffer}
+
+    >>> import gbp.git.vfs
+    >>> (repo, content) = setup_repo()
+    >>> vfs = gbp.git.vfs.GitVfs(repo, 'HEAD')
+    >>> gf = vfs.open('foo.txt', 'rb')
+    >>> gf.read(3)
+    b'al '
+    >>> gf.seek(-3, 2)
+    9
+    >>> gf.read()
+    b'b\\nc'
+    >>> gf.seek(1)
+    1
+    >>> gf.read(2), gf.tell()
+    (b'l ', 3)
+    >>> bytes(gf.getbuffer()) == content
+    True
+    >>> gf.close()
+    >>> vfs.open('foo.txt').seek(1)
+    Traceback (most recent call last):
+    ...
+    io.UnsupportedOperation: Can only seek in binary mode
+    >>> vfs._inline_size = 4
+    >>> with vfs.open('foo.txt', 'rb') as gf:
+    ...     gf.seek(7)
+    ...     gf.read(2)
+    ...     gf.seek(0)
+    ...     gf.read(3)
+    ...     gf.read() == content[3:]
+    7
+    b'a\\n'
+    0
+    b'al '
+    True
+    >>> with vfs.open('foo.txt') as gf:
+    ...     list(gf)
+    ['al pha\\n', 'a\\n', 'b\\n', 'c']
+    >>> context.teardown()
+    """
+
+
+def test_latin1():
+    """
+    Read a file that isn't UTF-8
+
+    Methods tested:
+         - L{gbp.git.GitVfs._File.readline}
+         - L{gbp.git.GitVfs._File.read}
+
+    >>> import gbp.git.vfs
+    >>> repo_dir = context.new_tmpdir(__name__)
+    >>> repo = gbp.git.GitRepository.create(str(repo_dir))
+    >>> content = 'ascii\\nGünther\\n'.encode('iso-8859-1')
+    >>> with open(os.path.join(repo.path, 'latin1.txt'), 'wb') as f:
+    ...     _ = f.write(content)
+    >>> repo.add_files(repo.path, force=True)
+    >>> repo.commit_all(msg="latin1")
+    >>> vfs = gbp.git.vfs.GitVfs(repo, 'HEAD')
+    >>> vfs.open('latin1.txt').read() == content.decode('iso-8859-1')
+    True
+    >>> gf = vfs.open('latin1.txt')
+    >>> gf.readline()
+    'ascii\\n'
+    >>> gf.readline() == 'Günther\\n'
+    True
+    >>> gf.close()
+    >>> context.teardown()
+    """